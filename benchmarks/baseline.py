@@ -0,0 +1,45 @@
+"""
+บันทึก / เทียบผล benchmark กับ baseline (ใช้ร่วมกันทุกสคริปต์ใน benchmarks/)
+
+ผลอยู่ในรูป {ชื่อกลุ่ม: {metric: ค่า}} เช่น {"product_service": {"import_ms": 480.2}}
+"""
+
+import json
+
+# ทิศทางของ metric: "lower" = ยิ่งน้อยยิ่งดี (latency), "higher" = ยิ่งมากยิ่งดี (rps)
+LOWER_IS_BETTER = "lower"
+HIGHER_IS_BETTER = "higher"
+
+
+def save_baseline(path: str, results: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(
+    results: dict, baseline: dict, gated: dict[str, str], max_regression: float
+) -> list[str]:
+    """
+    คืนรายการ metric ที่แย่ลงเกิน max_regression (%) เทียบกับ baseline
+    gated = {metric: LOWER_IS_BETTER | HIGHER_IS_BETTER} (metric อื่นแสดงผลอย่างเดียว)
+    """
+    failures = []
+    for group, metrics in results.items():
+        for metric, direction in gated.items():
+            before = baseline.get(group, {}).get(metric)
+            after = metrics.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = change if direction == LOWER_IS_BETTER else -change
+            if worse > max_regression:
+                failures.append(
+                    f"{group}.{metric}: {before} -> {after} ({change:+.1f}%)"
+                )
+    return failures
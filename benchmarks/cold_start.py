@@ -0,0 +1,253 @@
+"""
+วัด Cold Start ของแต่ละ Service (เหมือนตอน Lambda เริ่ม container ใหม่)
+
+แต่ละรอบจะรันใน process ใหม่เสมอ แล้ววัด:
+- import_ms:        เวลา import app.main (ช่วง INIT ของ Lambda)
+- first_request_ms: เวลาของ request แรกผ่าน Mangum handler (รวมสร้าง DynamoDB client)
+- rss_import_mb:    หน่วยความจำสูงสุดหลัง import (ru_maxrss)
+- rss_mb:           หน่วยความจำสูงสุดหลัง request แรก
+  (โหมด moto ในเครื่อง ตัวเลขนี้รวม moto ด้วย -> ใช้ --endpoint-url เพื่อดูค่าจริง)
+
+ตัวอย่าง (รันจาก root ของ repo):
+    python benchmarks/cold_start.py --trials 5
+    python benchmarks/cold_start.py --save-baseline benchmarks/cold_start_baseline.json
+    python benchmarks/cold_start.py --baseline benchmarks/cold_start_baseline.json \\
+        --max-regression 20   # ช้าลงเกิน 20% -> exit 1 (ใช้ใน CI)
+    python benchmarks/cold_start.py --endpoint-url http://localhost:8000  # DynamoDB Local
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from baseline import LOWER_IS_BETTER, compare, load_baseline, save_baseline
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SHARED_DIR = os.path.join(REPO_ROOT, "services", "shared")
+
+# (service, path ของ request แรก, Table ที่ต้องมี)
+SERVICES = {
+    "product_service": {
+        "path": "/products",
+        "query": "limit=10",
+        "tables": {"DYNAMO_TABLE_NAME": ("BenchProducts", "ProductID", None)},
+    },
+    "order_service": {
+        "path": "/orders",
+        "query": "limit=10",
+        "tables": {
+            "DYNAMO_TABLE_NAME": ("BenchOrders", "UserID", "OrderID"),
+            "PRODUCTS_TABLE_NAME": ("BenchProducts", "ProductID", None),
+        },
+    },
+    "user_service": {
+        "path": "/profile",
+        "query": "",
+        "tables": {"DYNAMO_TABLE_NAME": ("BenchUsers", "UserID", None)},
+    },
+    # ทั้ง 3 Service ใน process เดียว (services/gateway) เทียบกับ cold start แยก 3 ตัว
+    "gateway": {
+        "path": "/products",
+        "query": "limit=10",
+        "tables": {
+            "PRODUCTS_TABLE_NAME": ("BenchProducts", "ProductID", None),
+            "ORDERS_TABLE_NAME": ("BenchOrders", "UserID", "OrderID"),
+            "USERS_TABLE_NAME": ("BenchUsers", "UserID", None),
+        },
+        # Gateway deploy ทั้งโฟลเดอร์ services/ (CodeUri: services/)
+        "code_dir": "services",
+        "module": "gateway.app.main",
+    },
+}
+
+METRICS = ("import_ms", "first_request_ms", "rss_import_mb", "rss_mb")
+# ตัวที่ใช้ตัดสินว่า "ช้าลง" (RSS ดูประกอบ แต่ไม่ fail)
+GATED_METRICS = {"import_ms": LOWER_IS_BETTER, "first_request_ms": LOWER_IS_BETTER}
+
+
+def api_gateway_event(path: str, query: str) -> dict:
+    """Event แบบ HTTP API (payload v2) พร้อม JWT claims เหมือนผ่าน Cognito Authorizer"""
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": {"host": "localhost", "user-agent": "cold-start-bench"},
+        "requestContext": {
+            "accountId": "123456789012",
+            "apiId": "bench",
+            "domainName": "localhost",
+            "domainPrefix": "bench",
+            "requestId": "bench-request",
+            "routeKey": "$default",
+            "stage": "$default",
+            "time": "01/Jan/2025:00:00:00 +0000",
+            "timeEpoch": 0,
+            "http": {
+                "method": "GET",
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "127.0.0.1",
+                "userAgent": "cold-start-bench",
+            },
+            "authorizer": {
+                "jwt": {"claims": {"sub": "bench-user", "email": "bench@example.com"}}
+            },
+        },
+        "isBase64Encoded": False,
+    }
+
+
+def _max_rss_mb() -> float:
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux ให้หน่วย KB, macOS ให้หน่วย bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _create_tables(tables: dict):
+    """สร้าง Table ที่ Service ต้องใช้ (ใช้ client แยก ไม่ให้ไปอุ่น client ของ app)"""
+    import botocore.session
+
+    client = botocore.session.get_session().create_client("dynamodb")
+    for name, hash_key, range_key in tables.values():
+        key_schema = [{"AttributeName": hash_key, "KeyType": "HASH"}]
+        attributes = [{"AttributeName": hash_key, "AttributeType": "S"}]
+        if range_key:
+            key_schema.append({"AttributeName": range_key, "KeyType": "RANGE"})
+            attributes.append({"AttributeName": range_key, "AttributeType": "S"})
+        try:
+            client.create_table(
+                TableName=name,
+                KeySchema=key_schema,
+                AttributeDefinitions=attributes,
+                BillingMode="PAY_PER_REQUEST",
+            )
+        except client.exceptions.ResourceInUseException:
+            pass
+
+
+def run_child(service: str, use_moto: bool) -> dict:
+    """(รันใน process ใหม่) วัด 1 รอบแล้ว print ผลเป็น JSON"""
+    import importlib
+    import time
+
+    config = SERVICES[service]
+
+    start = time.perf_counter()
+    # (นี่คือสิ่งที่เราวัด)
+    handler = importlib.import_module(config.get("module", "app.main")).handler
+
+    import_ms = (time.perf_counter() - start) * 1000
+    rss_import_mb = _max_rss_mb()
+
+    if use_moto:
+        from moto import mock_aws
+
+        mock = mock_aws()
+        mock.start()
+    _create_tables(config["tables"])
+
+    context = type("Context", (), {"aws_request_id": "bench", "function_name": service})
+    event = api_gateway_event(config["path"], config["query"])
+
+    start = time.perf_counter()
+    response = handler(event, context())
+    first_request_ms = (time.perf_counter() - start) * 1000
+
+    if response["statusCode"] >= 500:
+        raise SystemExit(f"{service}: first request failed: {response}")
+
+    return {
+        "import_ms": round(import_ms, 2),
+        "first_request_ms": round(first_request_ms, 2),
+        "rss_import_mb": round(rss_import_mb, 2),
+        "rss_mb": round(_max_rss_mb(), 2),
+        "status_code": response["statusCode"],
+    }
+
+
+def measure(service: str, trials: int, endpoint_url: str | None) -> dict:
+    """รัน `trials` รอบ (process ใหม่ทุกรอบ) แล้วคืนค่า median ของแต่ละ metric"""
+    code_dir = os.path.join(
+        REPO_ROOT, SERVICES[service].get("code_dir", os.path.join("services", service))
+    )
+    env = {
+        **os.environ,
+        # cwd = โฟลเดอร์ของ Service (เหมือน /var/task) + Shared Layer (เหมือน /opt/python)
+        "PYTHONPATH": os.pathsep.join([code_dir, SHARED_DIR]),
+        "AWS_ACCESS_KEY_ID": os.environ.get("AWS_ACCESS_KEY_ID", "testing"),
+        "AWS_SECRET_ACCESS_KEY": os.environ.get("AWS_SECRET_ACCESS_KEY", "testing"),
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "ap-southeast-1"),
+    }
+    for env_name, (table_name, _, _) in SERVICES[service]["tables"].items():
+        env[env_name] = table_name
+    if endpoint_url:
+        env["AWS_ENDPOINT_URL_DYNAMODB"] = endpoint_url
+
+    args = [sys.executable, os.path.abspath(__file__), "--child", service]
+    if not endpoint_url:
+        args.append("--moto")
+
+    runs = []
+    for _ in range(trials):
+        result = subprocess.run(
+            args,
+            cwd=code_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise SystemExit(f"{service} failed:\n{result.stderr}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    return {
+        metric: round(statistics.median(run[metric] for run in runs), 2)
+        for metric in METRICS
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Lambda cold start")
+    parser.add_argument("--service", choices=SERVICES, action="append")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--endpoint-url", help="DynamoDB endpoint (แทน moto)")
+    parser.add_argument("--baseline", help="JSON ผลครั้งก่อน ไว้เทียบ")
+    parser.add_argument("--save-baseline", help="บันทึกผลครั้งนี้เป็น baseline")
+    parser.add_argument("--max-regression", type=float, default=25.0)
+    parser.add_argument("--child", choices=SERVICES, help=argparse.SUPPRESS)
+    parser.add_argument("--moto", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.moto)))
+        return 0
+
+    results = {}
+    for service in args.service or SERVICES:
+        results[service] = measure(service, args.trials, args.endpoint_url)
+        print(
+            f"{service:16} "
+            + "  ".join(f"{m}={results[service][m]:>8}" for m in METRICS)
+        )
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+
+    if args.baseline:
+        failures = compare(
+            results, load_baseline(args.baseline), GATED_METRICS, args.max_regression
+        )
+        if failures:
+            print("Cold start regression:\n  " + "\n  ".join(failures))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,447 @@
+"""
+Load test: ยิง request พร้อมกันเข้า ASGI app ของแต่ละ Service แล้ววัด latency / throughput
+
+- seed ข้อมูลปริมาณใกล้ของจริง (ค่าเริ่มต้น: สินค้า 100k, User 20 คน x Order 2,000)
+- ยิงแต่ละ scenario พร้อมกัน `--concurrency` ตัว ผ่าน httpx.ASGITransport (ไม่ต้องเปิด port)
+- รายงาน p50 / p95 / p99 (ms), requests/sec และจำนวน error
+- เทียบกับ baseline แล้ว exit 1 ถ้าแย่ลงเกิน `--max-regression` (%)
+
+DynamoDB ที่ใช้ (เลือกอย่างใดอย่างหนึ่ง):
+- ค่าเริ่มต้น: moto ใน process เดียวกัน (ไม่ต้องติดตั้งอะไรเพิ่ม)
+  แต่ moto scan/query แบบไล่ทั้ง Table และไม่ thread-safe (call ถูกเรียงทีละตัว)
+  -> ตัวเลขช้ากว่าของจริงมาก ใช้เทียบกับ baseline ของตัวเองเท่านั้น คู่กับ --quick
+- --endpoint-url: DynamoDB Local / moto server (ใกล้ของจริงกว่า เหมาะกับข้อมูลเต็มชุด)
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python benchmarks/load_test.py --endpoint-url http://localhost:8000
+
+ตัวอย่าง (รันจาก root ของ repo):
+    python benchmarks/load_test.py --quick
+    python benchmarks/load_test.py --quick --save-baseline benchmarks/load_baseline.json
+    python benchmarks/load_test.py --quick --baseline benchmarks/load_baseline.json
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from baseline import (
+    HIGHER_IS_BETTER,
+    LOWER_IS_BETTER,
+    compare,
+    load_baseline,
+    save_baseline,
+)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "services", "shared"))
+
+PRODUCTS_TABLE = "LoadProducts"
+ORDERS_TABLE = "LoadOrders"
+USERS_TABLE = "LoadUsers"
+CATEGORIES = [f"category-{i:02d}" for i in range(20)]
+# Header ที่บอกว่า request นี้เป็นของ User คนไหน (แทน JWT ของ Cognito)
+USER_HEADER = "X-Bench-User"
+
+METRICS = ("requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms")
+# {option: (ชุดเต็ม, --quick)}
+VOLUMES = {
+    "products": (100_000, 2_000),
+    "users": (20, 5),
+    "orders_per_user": (2_000, 200),
+    "requests": (1_000, 200),
+}
+GATED_METRICS = {
+    "p95_ms": LOWER_IS_BETTER,
+    "p99_ms": LOWER_IS_BETTER,
+    "rps": HIGHER_IS_BETTER,
+}
+
+
+# --- Setup ---
+def create_tables():
+    """สร้าง Table (Key/GSI ให้ตรงกับ template.yaml) ถ้ามีอยู่แล้วข้ามไป"""
+    from ecom_shared.dynamo import get_client
+
+    client = get_client()
+    tables = [
+        {
+            "TableName": PRODUCTS_TABLE,
+            "KeySchema": [{"AttributeName": "ProductID", "KeyType": "HASH"}],
+            "AttributeDefinitions": [
+                {"AttributeName": "ProductID", "AttributeType": "S"},
+                {"AttributeName": "Category", "AttributeType": "S"},
+                {"AttributeName": "Price", "AttributeType": "N"},
+                {"AttributeName": "Name", "AttributeType": "S"},
+            ],
+            "GlobalSecondaryIndexes": [
+                {
+                    "IndexName": index_name,
+                    "KeySchema": [
+                        {"AttributeName": "Category", "KeyType": "HASH"},
+                        {"AttributeName": sort_key, "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+                for index_name, sort_key in (
+                    ("CategoryPriceIndex", "Price"),
+                    ("CategoryNameIndex", "Name"),
+                )
+            ],
+        },
+        {
+            "TableName": ORDERS_TABLE,
+            "KeySchema": [
+                {"AttributeName": "UserID", "KeyType": "HASH"},
+                {"AttributeName": "OrderID", "KeyType": "RANGE"},
+            ],
+            "AttributeDefinitions": [
+                {"AttributeName": "UserID", "AttributeType": "S"},
+                {"AttributeName": "OrderID", "AttributeType": "S"},
+            ],
+        },
+        {
+            "TableName": USERS_TABLE,
+            "KeySchema": [{"AttributeName": "UserID", "KeyType": "HASH"}],
+            "AttributeDefinitions": [
+                {"AttributeName": "UserID", "AttributeType": "S"},
+            ],
+        },
+    ]
+    for table in tables:
+        try:
+            client.create_table(BillingMode="PAY_PER_REQUEST", **table)
+        except client.exceptions.ResourceInUseException:
+            pass
+
+
+def seed(products: int, users: int, orders_per_user: int, rng: random.Random):
+    """เขียนข้อมูลตั้งต้น (batch_writer ทีละ 25) แล้วคืน id ที่ scenario ต้องใช้"""
+    from ecom_shared.dynamo import DynamoTable
+    from services.order_service.app.main import new_order_id
+
+    timestamp = "2025-01-01T00:00:00+00:00"
+    product_ids = [f"PROD-{i:06d}" for i in range(products)]
+    user_ids = [f"bench-user-{i:03d}" for i in range(users)]
+
+    with DynamoTable(PRODUCTS_TABLE).batch_writer() as batch:
+        for i, product_id in enumerate(product_ids):
+            batch.put_item(
+                Item={
+                    "ProductID": product_id,
+                    "Name": f"Product {i:06d}",
+                    "Description": "Load test product",
+                    "Price": Decimal(rng.randint(100, 50_000)) / 100,
+                    "Stock": 1_000_000,  # ให้ create_order ไม่ติด Stock หมด
+                    "Category": rng.choice(CATEGORIES),
+                    "CreatedAt": timestamp,
+                    "UpdatedAt": timestamp,
+                    "Version": 1,
+                }
+            )
+
+    with DynamoTable(USERS_TABLE).batch_writer() as batch:
+        for user_id in user_ids:
+            batch.put_item(
+                Item={
+                    "UserID": user_id,
+                    "Email": f"{user_id}@example.com",
+                    "UpdatedAt": timestamp,
+                    "Version": 1,
+                }
+            )
+
+    with DynamoTable(ORDERS_TABLE).batch_writer() as batch:
+        for user_id in user_ids:
+            for _ in range(orders_per_user):
+                items = [
+                    {
+                        "ProductID": rng.choice(product_ids),
+                        "Quantity": rng.randint(1, 3),
+                        "PricePerUnit": Decimal("9.99"),
+                    }
+                    for _ in range(rng.randint(1, 4))
+                ]
+                batch.put_item(
+                    Item={
+                        "UserID": user_id,
+                        "OrderID": new_order_id(),
+                        "Status": "PENDING",
+                        "CreatedAt": timestamp,
+                        "Items": items,
+                        "TotalAmount": sum(
+                            i["PricePerUnit"] * i["Quantity"] for i in items
+                        ),
+                    }
+                )
+
+    return {"product_ids": product_ids, "user_ids": user_ids}
+
+
+def build_apps(async_backend: str | None) -> dict:
+    """
+    ASGI app ของแต่ละ Service + override dependency ให้ชี้ไปที่ Table ของ load test
+    (Auth: อ่าน User จาก Header แทน JWT เพื่อวัดเฉพาะตัว Service)
+    """
+    from fastapi import Request
+
+    from ecom_shared.aio import AsyncDynamoClient, AsyncDynamoTable
+    from services.order_service.app import main as order_main
+    from services.product_service.app import main as product_main
+    from services.user_service.app import main as user_main
+
+    client = AsyncDynamoClient(backend=async_backend)
+    products = AsyncDynamoTable(PRODUCTS_TABLE, client)
+    orders = AsyncDynamoTable(ORDERS_TABLE, client)
+    users = AsyncDynamoTable(USERS_TABLE, client)
+
+    def bench_user_id(request: Request) -> str:
+        return request.headers[USER_HEADER]
+
+    def bench_user_claims(request: Request):
+        user_id = request.headers[USER_HEADER]
+        return user_main.UserClaims(UserID=user_id, Email=f"{user_id}@example.com")
+
+    product_main.app.dependency_overrides[product_main.get_db_table] = lambda: products
+    order_main.app.dependency_overrides.update(
+        {
+            order_main.get_db_table: lambda: orders,
+            order_main.get_products_table: lambda: products,
+            order_main.get_current_user_id: bench_user_id,
+        }
+    )
+    user_main.app.dependency_overrides.update(
+        {
+            user_main.get_db_table: lambda: users,
+            user_main.get_current_user_claims: bench_user_claims,
+        }
+    )
+    return {
+        "product_service": product_main.app,
+        "order_service": order_main.app,
+        "user_service": user_main.app,
+        "client": client,
+    }
+
+
+# --- Scenarios ---
+# แต่ละ scenario = (service, ฟังก์ชันที่ยิง 1 request)
+async def list_products(http, rng, data):
+    if rng.random() < 0.5:
+        return await http.get("/products", params={"limit": 50})
+    # หน้าร้านส่วนใหญ่กรองตาม Category + ช่วงราคา (ใช้ GSI)
+    return await http.get(
+        "/products",
+        params={
+            "limit": 50,
+            "category": rng.choice(CATEGORIES),
+            "min_price": 10,
+            "max_price": 300,
+        },
+    )
+
+
+async def create_order(http, rng, data):
+    product_ids = rng.sample(data["product_ids"], k=rng.randint(1, 3))
+    return await http.post(
+        "/orders",
+        json={"Items": [{"ProductID": p, "Quantity": 1} for p in product_ids]},
+        headers={USER_HEADER: rng.choice(data["user_ids"])},
+    )
+
+
+async def get_my_profile(http, rng, data):
+    return await http.get(
+        "/profile", headers={USER_HEADER: rng.choice(data["user_ids"])}
+    )
+
+
+async def list_my_orders(http, rng, data):
+    return await http.get(
+        "/orders",
+        params={"limit": 20, "view": "summary"},
+        headers={USER_HEADER: rng.choice(data["user_ids"])},
+    )
+
+
+SCENARIOS = {
+    "list_products": ("product_service", list_products),
+    "create_order": ("order_service", create_order),
+    "get_my_profile": ("user_service", get_my_profile),
+    "list_my_orders": ("order_service", list_my_orders),
+}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """percentile แบบ nearest-rank (ค่าที่มีอยู่จริงใน sample)"""
+    index = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+async def run_scenario(
+    app, request_fn, data, requests: int, concurrency: int, warmup: int, seed: int
+) -> dict:
+    """ยิง `requests` ครั้ง โดยมี worker พร้อมกัน `concurrency` ตัว"""
+    import httpx
+
+    rng = random.Random(seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        for _ in range(warmup):
+            await request_fn(http, rng, data)
+
+        latencies: list[float] = []
+        errors = 0
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await request_fn(http, rng, data)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+    }
+
+
+async def run_all(args, data, apps) -> dict:
+    if not args.endpoint_url:
+        # moto ใน process ไม่ thread-safe (TransactWriteItems พร้อมกันพัง)
+        # -> ให้ call ไป DynamoDB ผ่าน thread เดียว (request ยังรอพร้อมกันใน event loop)
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(1))
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        service, request_fn = SCENARIOS[name]
+        results[name] = await run_scenario(
+            apps[service],
+            request_fn,
+            data,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            seed=args.seed,
+        )
+        print(f"{name:16} " + "  ".join(f"{m}={results[name][m]:>9}" for m in METRICS))
+    await apps["client"].close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the service ASGI apps")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--orders-per-user", type=int)
+    parser.add_argument("--requests", type=int)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="ข้อมูล/จำนวน request ชุดเล็ก (เหมาะกับ moto ในเครื่อง / CI)",
+    )
+    parser.add_argument("--endpoint-url", help="DynamoDB endpoint (แทน moto)")
+    parser.add_argument(
+        "--async-backend",
+        choices=("thread", "aiobotocore"),
+        help="DYNAMO_ASYNC_BACKEND ของ Service (ค่าเริ่มต้นตาม Environment)",
+    )
+    parser.add_argument(
+        "--skip-seed", action="store_true", help="ใช้ข้อมูลเดิมใน --endpoint-url"
+    )
+    parser.add_argument("--baseline", help="JSON ผลครั้งก่อน ไว้เทียบ")
+    parser.add_argument("--save-baseline", help="บันทึกผลครั้งนี้เป็น baseline")
+    parser.add_argument("--max-regression", type=float, default=25.0)
+    parser.add_argument(
+        "--max-error-rate",
+        type=float,
+        default=0.01,
+        help="สัดส่วน error สูงสุดที่ยอมรับได้ต่อ scenario",
+    )
+    args = parser.parse_args(argv)
+
+    # ค่าที่ไม่ได้ระบุเอง -> ใช้ชุดเต็ม หรือชุดเล็กถ้า --quick
+    for option, (full, quick) in VOLUMES.items():
+        if getattr(args, option) is None:
+            setattr(args, option, quick if args.quick else full)
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+    # log EMF ทีละ request จะท่วม output (ตั้ง METRICS_ENABLED=true เองถ้าอยากวัดรวม)
+    os.environ.setdefault("METRICS_ENABLED", "false")
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+    else:
+        if args.skip_seed:
+            parser.error("--skip-seed requires --endpoint-url")
+        from moto import mock_aws
+
+        mock_aws().start()
+
+    rng = random.Random(args.seed)
+    create_tables()
+    started = time.perf_counter()
+    if args.skip_seed:
+        data = {
+            "product_ids": [f"PROD-{i:06d}" for i in range(args.products)],
+            "user_ids": [f"bench-user-{i:03d}" for i in range(args.users)],
+        }
+    else:
+        data = seed(args.products, args.users, args.orders_per_user, rng)
+    print(
+        f"seeded {args.products} products, {args.users} users x "
+        f"{args.orders_per_user} orders in {time.perf_counter() - started:.1f}s"
+    )
+
+    apps = build_apps(args.async_backend)
+    results = asyncio.run(run_all(args, data, apps))
+
+    status = 0
+    for name, metrics in results.items():
+        if metrics["errors"] > metrics["requests"] * args.max_error_rate:
+            print(
+                f"{name}: too many errors ({metrics['errors']}/{metrics['requests']})"
+            )
+            status = 1
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+
+    if args.baseline:
+        failures = compare(
+            results, load_baseline(args.baseline), GATED_METRICS, args.max_regression
+        )
+        if failures:
+            print("Load test regression:\n  " + "\n  ".join(failures))
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
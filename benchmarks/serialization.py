@@ -0,0 +1,115 @@
+"""
+Micro-benchmark: แปลง list ของ Item จาก DynamoDB เป็น JSON body
+
+- fastapi: ทางปกติของ FastAPI (validate ผ่าน response_model แล้ว dump_json)
+- fast:    ecom_shared.responses.FastSerializer (ไม่ validate ซ้ำ + orjson ถ้ามี)
+เช็คด้วยว่า JSON ที่ได้เหมือนกันทุก byte
+
+ตัวอย่าง (รันจาก root ของ repo):
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --items 10000 --rounds 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "services", "shared"))
+
+
+def product_items(count: int) -> list[dict]:
+    """หน้าตาเหมือนที่ deserialize ออกมาจาก ProductsTable (ตัวเลขเป็น Decimal)"""
+    return [
+        {
+            "ProductID": f"PROD-{i:06d}",
+            "Name": f"Product {i:06d}",
+            "Description": "เสื้อยืดคอกลม ผ้าฝ้าย 100%",
+            "Price": Decimal(100 + i % 50_000) / 100,
+            "Stock": Decimal(i % 500),
+            "Category": f"category-{i % 20:02d}",
+            "CreatedAt": "2025-01-01T00:00:00+00:00",
+            "UpdatedAt": "2025-01-01T00:00:00+00:00",
+            "Version": Decimal(1),
+        }
+        for i in range(count)
+    ]
+
+
+def order_items(count: int) -> list[dict]:
+    return [
+        {
+            "UserID": "user-1",
+            "OrderID": f"ORD-{i:026d}",
+            "Status": "PENDING",
+            "CreatedAt": "2025-01-01T00:00:00+00:00",
+            "Items": [
+                {
+                    "ProductID": f"PROD-{(i + n) % 1000:06d}",
+                    "Quantity": Decimal(n + 1),
+                    "PricePerUnit": Decimal("199.50"),
+                }
+                for n in range(3)
+            ],
+            "TotalAmount": Decimal("1197.00"),
+        }
+        for i in range(count)
+    ]
+
+
+def time_ms(func, rounds: int) -> float:
+    """median ของเวลาที่ใช้ต่อรอบ (ms)"""
+    func()  # warm up
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare response serialization")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    from pydantic import TypeAdapter
+
+    from ecom_shared.responses import FastSerializer, orjson
+    from services.order_service.app.main import OrderResponse
+    from services.product_service.app.main import ProductResponse
+
+    print(f"{args.items} items, orjson={'yes' if orjson else 'no'}")
+    for model, items in (
+        (ProductResponse, product_items(args.items)),
+        (OrderResponse, order_items(args.items)),
+    ):
+        # เหมือน FastAPI: field.validate() แล้ว field.serialize_json()
+        adapter = TypeAdapter(list[model])
+        serializer = FastSerializer(model)
+
+        def fastapi_path():
+            return adapter.dump_json(adapter.validate_python(items))
+
+        def fast_path():
+            return serializer.dump_json_many(items)
+
+        if fastapi_path() != fast_path():
+            print(f"{model.__name__}: output differs!")
+            return 1
+        before = time_ms(fastapi_path, args.rounds)
+        after = time_ms(fast_path, args.rounds)
+        print(
+            f"{model.__name__:16} fastapi={before:8.2f}ms  fast={after:8.2f}ms  "
+            f"speedup={before / after:4.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
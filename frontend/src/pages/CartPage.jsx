@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { fetchAuthSession } from 'aws-amplify/auth';
 import { useCart } from '../contexts/CartContext';
 
@@ -11,6 +11,45 @@ function CartPage() {
     const [error, setError] = useState(null);
     const [orderSuccess, setOrderSuccess] = useState(false);
 
+    // Idempotency-Key: ใช้ค่าเดิมตอนกดสั่งซื้อซ้ำ (เช่น หลัง timeout) -> Server ไม่สร้าง Order ซ้ำ
+    // ตะกร้าเปลี่ยน = คำสั่งซื้อใหม่ -> สุ่ม key ใหม่
+    const idempotencyKey = useRef(null);
+    useEffect(() => {
+        idempotencyKey.current = null;
+    }, [cartItems]);
+
+    // Stock ไม่อยู่ใน Catalog Snapshot (ตัด/คืนโดย OrderService) -> อ่านสดจาก batch-get
+    // (แค่แสดงเตือน Server ยังเช็ค Stock จริงตอนสั่งซื้ออีกครั้ง)
+    const [stock, setStock] = useState({});
+    const productIDs = cartItems.map(item => item.product.ProductID).join(',');
+    useEffect(() => {
+        if (!productIDs) return;
+        const fetchStock = async () => {
+            try {
+                const session = await fetchAuthSession();
+                const jwtToken = session.tokens?.idToken?.toString();
+                if (!jwtToken) return;
+
+                const response = await fetch(`${API_ENDPOINT}/products/batch-get`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        Authorization: `Bearer ${jwtToken}`,
+                    },
+                    body: JSON.stringify({ ProductIDs: productIDs.split(',') }),
+                });
+                if (!response.ok) return;
+                const { Products } = await response.json();
+                setStock(Object.fromEntries(
+                    Products.filter(Boolean).map(p => [p.ProductID, p.Stock])
+                ));
+            } catch (err) {
+                console.error("Failed to fetch stock:", err);
+            }
+        };
+        fetchStock();
+    }, [productIDs]);
+
     const calculateTotal = () => {
         return cartItems.reduce((total, item) => total + (item.product.Price * item.quantity), 0);
     };
@@ -39,12 +78,16 @@ function CartPage() {
                 PricePerUnit: item.product.Price // ใช้ Price จากสินค้า
             }));
             const totalAmount = calculateTotal();
+            if (!idempotencyKey.current) {
+                idempotencyKey.current = crypto.randomUUID();
+            }
 
             const response = await fetch(`${API_ENDPOINT}/orders`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                     Authorization: `Bearer ${jwtToken}`,
+                    'Idempotency-Key': idempotencyKey.current,
                 },
                 body: JSON.stringify({
                     Items: orderItems,
@@ -101,6 +144,9 @@ function CartPage() {
                             <div>
                                 <h3 className="font-semibold text-gray-900">{item.product.Name}</h3>
                                 <p className="text-gray-600">${item.product.Price.toFixed(2)} each</p>
+                                {stock[item.product.ProductID] !== undefined && item.quantity > stock[item.product.ProductID] && (
+                                    <p className="text-red-600 text-sm">Only {stock[item.product.ProductID]} left in stock</p>
+                                )}
                             </div>
                         </div>
                         <div className="flex items-center space-x-4">
@@ -1,5 +1,4 @@
 import React, { useEffect, useState } from 'react';
-import { fetchAuthSession } from 'aws-amplify/auth';
 import { FaShoppingCart } from 'react-icons/fa'; // ไอคอนตะกร้า
 import { useCart } from '../contexts/CartContext';
 
@@ -18,25 +17,17 @@ function HomePage() {
                 setLoading(true);
                 setError(null);
 
-                // ดึง JWT Token
-                const session = await fetchAuthSession();
-                const jwtToken = session.tokens?.idToken?.toString();
-
-                if (!jwtToken) {
-                    throw new Error("No IdToken found. Please sign in again.");
-                }
-
-                const response = await fetch(`${API_ENDPOINT}/products`, {
-                    headers: {
-                        Authorization: `Bearer ${jwtToken}`,
-                    },
-                });
-
+                // Catalog ทั้งหมดอยู่ใน snapshot ก้อนเดียว (ไม่ต้องล็อกอิน / ไม่ต้องไล่ทีละหน้า)
+                // จัดกลุ่มตาม Category มาแล้ว -> รวมเป็น list เดียวสำหรับแสดงผล
+                // (snapshot ไม่มี Stock -> ตะกร้าอ่าน Stock สดจาก /products/batch-get เอง)
+                const response = await fetch(`${API_ENDPOINT}/products/snapshot`);
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
-                const data = await response.json();
-                setProducts(data);
+                const snapshot = await response.json();
+                const allProducts = Object.values(snapshot.Categories).flat();
+
+                setProducts(allProducts);
             } catch (err) {
                 console.error("Failed to fetch products:", err);
                 setError("Failed to fetch products. Please try again.");
@@ -4,37 +4,60 @@ import { fetchAuthSession } from 'aws-amplify/auth';
 
 const API_ENDPOINT = import.meta.env.VITE_API_ENDPOINT;
 
+// สีของแต่ละ Status (ดู ORDER_TRANSITIONS ใน order_service)
+const STATUS_STYLES = {
+    PENDING: 'bg-yellow-200 text-yellow-800',
+    PAID: 'bg-blue-200 text-blue-800',
+    SHIPPED: 'bg-indigo-200 text-indigo-800',
+    DELIVERED: 'bg-green-200 text-green-800',
+    CANCELLED: 'bg-gray-200 text-gray-700',
+};
+// ยกเลิกเองได้เฉพาะตอนยังไม่จัดส่ง
+const CANCELLABLE_STATUSES = ['PENDING', 'PAID'];
+
 function OrderHistoryPage() {
     const [orders, setOrders] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [nextCursor, setNextCursor] = useState(null);
     const [error, setError] = useState(null);
+    const [cancellingId, setCancellingId] = useState(null);
+
+    // ดึง Order ทีละหน้า (ใหม่ -> เก่า) ตาม cursor ใน Header X-Next-Cursor
+    const fetchOrderPage = async (cursor) => {
+        const session = await fetchAuthSession();
+        const jwtToken = session.tokens?.idToken?.toString();
+
+        if (!jwtToken) {
+            throw new Error("No IdToken found. Please sign in again.");
+        }
+
+        const params = new URLSearchParams({ limit: '20' });
+        if (cursor) params.set('cursor', cursor);
+
+        // --- นี่คือการเรียก Service ที่เหลืออยู่! ---
+        const response = await fetch(`${API_ENDPOINT}/orders?${params}`, {
+            method: 'GET',
+            headers: {
+                Authorization: `Bearer ${jwtToken}`,
+            },
+        });
+        // ---
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        setOrders(prev => (cursor ? [...prev, ...data] : data));
+        setNextCursor(response.headers.get('X-Next-Cursor'));
+    };
 
     useEffect(() => {
         const fetchOrderHistory = async () => {
             setLoading(true);
             setError(null);
             try {
-                const session = await fetchAuthSession();
-                const jwtToken = session.tokens?.idToken?.toString();
-
-                if (!jwtToken) {
-                    throw new Error("No IdToken found. Please sign in again.");
-                }
-
-                // --- นี่คือการเรียก Service ที่เหลืออยู่! ---
-                const response = await fetch(`${API_ENDPOINT}/orders`, {
-                    method: 'GET',
-                    headers: {
-                        Authorization: `Bearer ${jwtToken}`,
-                    },
-                });
-                // ---
-
-                if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
-                }
-                const data = await response.json();
-                setOrders(data);
+                await fetchOrderPage(null);
             } catch (err) {
                 console.error("Failed to fetch order history:", err);
                 setError("Failed to fetch order history. Please try again.");
@@ -46,6 +69,43 @@ function OrderHistoryPage() {
         fetchOrderHistory();
     }, []);
 
+    const handleLoadMore = async () => {
+        setLoadingMore(true);
+        try {
+            await fetchOrderPage(nextCursor);
+        } catch (err) {
+            console.error("Failed to fetch more orders:", err);
+            setError("Failed to fetch order history. Please try again.");
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const handleCancel = async (orderId) => {
+        setCancellingId(orderId);
+        try {
+            const session = await fetchAuthSession();
+            const jwtToken = session.tokens?.idToken?.toString();
+            const response = await fetch(`${API_ENDPOINT}/orders/${orderId}/cancel`, {
+                method: 'POST',
+                headers: {
+                    Authorization: `Bearer ${jwtToken}`,
+                },
+            });
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.detail || `HTTP error! status: ${response.status}`);
+            }
+            const updated = await response.json();
+            setOrders(prev => prev.map(order => (order.OrderID === orderId ? updated : order)));
+        } catch (err) {
+            console.error("Failed to cancel order:", err);
+            alert(`Failed to cancel order: ${err.message}`);
+        } finally {
+            setCancellingId(null);
+        }
+    };
+
     if (loading) return <div className="text-center text-gray-700 p-8">Loading your order history...</div>;
     if (error) return <div className="text-center text-red-600 p-8">{error}</div>;
 
@@ -65,11 +125,22 @@ function OrderHistoryPage() {
                                         Placed on: {new Date(order.CreatedAt).toLocaleString()}
                                     </p>
                                 </div>
-                                <span className={`px-3 py-1 rounded-full text-sm font-semibold ${
-                                    order.Status === 'PENDING' ? 'bg-yellow-200 text-yellow-800' : 'bg-green-200 text-green-800'
-                                }`}>
-                                    {order.Status}
-                                </span>
+                                <div className="flex flex-col items-end space-y-2">
+                                    <span className={`px-3 py-1 rounded-full text-sm font-semibold ${
+                                        STATUS_STYLES[order.Status] || 'bg-green-200 text-green-800'
+                                    }`}>
+                                        {order.Status}
+                                    </span>
+                                    {CANCELLABLE_STATUSES.includes(order.Status) && (
+                                        <button
+                                            onClick={() => handleCancel(order.OrderID)}
+                                            disabled={cancellingId === order.OrderID}
+                                            className="text-sm text-red-600 hover:underline disabled:opacity-50"
+                                        >
+                                            {cancellingId === order.OrderID ? 'Cancelling...' : 'Cancel order'}
+                                        </button>
+                                    )}
+                                </div>
                             </div>
                             <div className="border-t border-b py-2 mb-4">
                                 {order.Items.map(item => (
@@ -84,6 +155,17 @@ function OrderHistoryPage() {
                             </div>
                         </div>
                     ))}
+                    {nextCursor && (
+                        <div className="text-center">
+                            <button
+                                onClick={handleLoadMore}
+                                disabled={loadingMore}
+                                className="bg-blue-500 text-white px-4 py-2 rounded-lg hover:bg-blue-600 disabled:opacity-50 transition-colors duration-200"
+                            >
+                                {loadingMore ? 'Loading...' : 'Load more orders'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             )}
         </div>
@@ -0,0 +1,90 @@
+"""
+Gateway: รวม product_service, order_service และ user_service ไว้ใน process เดียว (ไม่บังคับ)
+
+ปกติ (template.yaml ค่าเริ่มต้น) แต่ละ Service เป็น Lambda แยกกัน -> หน้าเว็บที่เรียกครบ 3 Service
+ต้องจ่าย cold start / import FastAPI / สร้าง botocore client 3 รอบ
+ที่นี่ import ทั้ง 3 app มาไว้ด้วยกัน แล้วส่ง request ตาม path:
+    /products...  -> product_service
+    /orders...    -> order_service
+    /profile...   -> user_service
+ทุก Service ใช้ DynamoDB client / connection pool ชุดเดียวกัน (ดู ecom_shared.aio.get_async_client)
+
+Deploy ได้ 2 แบบ (code ทั้งโฟลเดอร์ services/):
+- Lambda ตัวเดียว:  Handler = gateway.app.main.handler (DeploymentMode=gateway ใน template.yaml)
+- Container:        uvicorn gateway.app.main:app
+"""
+
+import json
+
+from mangum import Mangum
+
+from ecom_shared.aio import close_async_client
+
+# แต่ละ Service ใช้ Environment ของตัวเอง (ชื่อ Table ฯลฯ) -> ดู template.yaml
+from product_service.app.main import app as product_app
+from order_service.app.main import app as order_app
+from user_service.app.main import app as user_app
+
+# prefix ของ path -> app ที่รับผิดชอบ (path ส่งต่อไปทั้งเส้น ไม่ตัด prefix)
+ROUTES = (
+    ("/products", product_app),
+    ("/orders", order_app),
+    ("/profile", user_app),
+)
+
+NOT_FOUND_BODY = json.dumps({"detail": "Not Found"}).encode()
+
+
+def resolve(path: str):
+    """app ของ path นี้ (None = ไม่มี Service ไหนรับ)"""
+    for prefix, service_app in ROUTES:
+        if path == prefix or path.startswith(prefix + "/"):
+            return service_app
+    return None
+
+
+async def _not_found(send):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 404,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(NOT_FOUND_BODY)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": NOT_FOUND_BODY})
+
+
+async def _lifespan(receive, send):
+    # lifespan ไม่ถูกส่งต่อให้แต่ละ Service -> shutdown: ปิด DynamoDB client ที่ใช้ร่วมกันเอง
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            try:
+                await close_async_client()
+            except Exception as e:
+                await send({"type": "lifespan.shutdown.failed", "message": repr(e)})
+            else:
+                await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI app ที่ส่ง request ต่อให้ Service ตาม prefix ของ path"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    service_app = resolve(scope["path"])
+    if service_app is None:
+        await _not_found(send)
+        return
+    await service_app(scope, receive, send)
+
+
+# ตัวแปลง Lambda (Lambda ตัวเดียวรับทุก Route)
+handler = Mangum(app, lifespan="off")
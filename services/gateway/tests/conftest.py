@@ -0,0 +1,53 @@
+import os
+import sys
+import pytest
+import boto3
+from moto import mock_aws
+
+# เพิ่ม project root ใน sys.path
+PROJECT_ROOT = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "..")
+)
+sys.path.insert(0, PROJECT_ROOT)
+# Shared Layer (ตอน deploy จะอยู่ที่ /opt/python ของ Lambda)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "services", "shared"))
+# Gateway import แต่ละ Service จากโฟลเดอร์ services/ (เหมือนตอน deploy)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "services"))
+
+from ecom_shared.dynamo import DynamoClient, DynamoTable  # noqa: E402
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "ap-southeast-1"
+
+
+@pytest.fixture(scope="function")
+def mock_tables(aws_credentials):
+    """สร้าง Table จำลองของทั้ง 3 Service ใน Moto ตัวเดียวกัน"""
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb")
+        client = DynamoClient(boto3.client("dynamodb"))
+        tables = {}
+        for name, keys in (
+            ("TestProducts", [("ProductID", "HASH")]),
+            ("TestOrders", [("UserID", "HASH"), ("OrderID", "RANGE")]),
+            ("TestUsers", [("UserID", "HASH")]),
+        ):
+            dynamodb.create_table(
+                TableName=name,
+                KeySchema=[{"AttributeName": a, "KeyType": t} for a, t in keys],
+                AttributeDefinitions=[
+                    {"AttributeName": a, "AttributeType": "S"} for a, _ in keys
+                ],
+                ProvisionedThroughput={
+                    "ReadCapacityUnits": 5,
+                    "WriteCapacityUnits": 5,
+                },
+            )
+            tables[name] = DynamoTable(name, client)
+        yield tables
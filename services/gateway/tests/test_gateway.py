@@ -0,0 +1,138 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ecom_shared.aio import AsyncDynamoTable
+
+MOCK_USER_ID = "test-user-gateway"
+
+
+@pytest.fixture
+def gateway(mock_tables, tmp_path):
+    """Gateway ที่ทุก Service ใช้ Table จำลอง (override dependency ของแต่ละ app)"""
+    from ecom_shared.storage import LocalObjectStore
+    from gateway.app import main as gateway_main
+    from order_service.app import main as order_main
+    from product_service.app import main as product_main
+    from product_service.app.catalog import CatalogSnapshots
+    from user_service.app import main as user_main
+
+    products = AsyncDynamoTable.from_sync(mock_tables["TestProducts"])
+    orders = AsyncDynamoTable.from_sync(mock_tables["TestOrders"])
+    users = AsyncDynamoTable.from_sync(mock_tables["TestUsers"])
+    catalog = CatalogSnapshots(
+        LocalObjectStore(str(tmp_path / "objects")),
+        product_main.PRODUCT_SERIALIZER.to_dict,
+    )
+
+    product_main.app.dependency_overrides = {
+        product_main.get_db_table: lambda: products,
+        product_main.get_catalog: lambda: catalog,
+    }
+    order_main.app.dependency_overrides = {
+        order_main.get_db_table: lambda: orders,
+        order_main.get_products_table: lambda: products,
+        order_main.get_current_user_id: lambda: MOCK_USER_ID,
+    }
+    user_main.app.dependency_overrides = {
+        user_main.get_db_table: lambda: users,
+        user_main.get_current_user_claims: lambda: user_main.UserClaims(
+            UserID=MOCK_USER_ID, Email="gateway@example.com"
+        ),
+    }
+    product_main.product_cache.clear()
+    product_main.catalog_cache.clear()
+    product_main.search_index.clear()
+    user_main.profile_cache.clear()
+
+    yield gateway_main
+
+    for service_main in (product_main, order_main, user_main):
+        service_main.app.dependency_overrides = {}
+
+
+def test_gateway_routes_to_each_service(gateway, mock_tables):
+    """เทสส่ง request ต่อให้ Service ตาม prefix ของ path (ครบ 3 Service ใน process เดียว)"""
+    client = TestClient(gateway.app)
+
+    created = client.post(
+        "/products",
+        json={"Name": "Mug", "Price": 12.5, "Stock": 3, "Category": "Kitchen"},
+    )
+    assert created.status_code == 201
+    product_id = created.json()["ProductID"]
+    assert client.get(f"/products/{product_id}").json()["Name"] == "Mug"
+
+    order = client.post(
+        "/orders", json={"Items": [{"ProductID": product_id, "Quantity": 2}]}
+    )
+    assert order.status_code == 201
+    assert client.get("/orders/stats").json()["OrderCount"] == 1
+    # order_service ตัด Stock ใน ProductsTable เดียวกัน
+    stock = mock_tables["TestProducts"].get_item(Key={"ProductID": product_id})
+    assert stock["Item"]["Stock"] == 1
+
+    assert client.get("/profile").json()["Email"] == "gateway@example.com"
+
+    # path ที่ไม่มี Service ไหนรับ
+    for path in ("/", "/productsX", "/admin"):
+        response = client.get(path)
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Not Found"}
+
+
+def test_gateway_shares_dynamodb_client():
+    """ทุก Service ใน process เดียวกันใช้ DynamoDB client (connection pool) ตัวเดียวกัน"""
+    from order_service.app import main as order_main
+    from product_service.app import main as product_main
+    from user_service.app import main as user_main
+
+    clients = {
+        id(product_main.table.client),
+        id(order_main.table.client),
+        id(order_main.products_table.client),
+        id(user_main.table.client),
+    }
+    assert len(clients) == 1
+
+
+def test_gateway_lambda_handler(gateway):
+    """เทส handler ของ Lambda (event แบบ HTTP API) ผ่าน Gateway"""
+    event = {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": "/profile",
+        "rawQueryString": "",
+        "headers": {"host": "api.example.com"},
+        "requestContext": {
+            "http": {
+                "method": "GET",
+                "path": "/profile",
+                "protocol": "HTTP/1.1",
+                "sourceIp": "127.0.0.1",
+                "userAgent": "pytest",
+            },
+            "stage": "$default",
+        },
+        "isBase64Encoded": False,
+    }
+    response = gateway.handler(event, None)
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["UserID"] == MOCK_USER_ID
+
+
+def test_gateway_shutdown_closes_shared_client(monkeypatch):
+    """lifespan.shutdown ของ Gateway -> ปิด DynamoDB client ที่ทุก Service ใช้ร่วมกัน"""
+    from ecom_shared import aio
+    from gateway.app import main as gateway_main
+
+    closed = []
+
+    async def fake_close(self):
+        closed.append(self)
+
+    monkeypatch.setattr(aio.AsyncDynamoClient, "close", fake_close)
+    with TestClient(gateway_main.app):
+        assert closed == []
+    assert closed == [aio.get_async_client()]
@@ -1,37 +1,62 @@
 import os
-import boto3
-import uuid
+import json
+import base64
+import hashlib
+import time
 from decimal import Decimal
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
 from pydantic import BaseModel, Field
 from mangum import Mangum
 from datetime import datetime, timezone
-from boto3.dynamodb.conditions import Key  # <-- เราจะใช้ Query
-from typing import List
+from typing import Annotated, List, Literal, Optional, Union
 
-# (Boto3 type hint - เหมือนเดิม)
-from typing import TYPE_CHECKING
+# DynamoDB แบบเบา (botocore client สร้างตอนใช้ครั้งแรก) จาก Shared Layer
+# endpoint เป็น async -> ใช้ Table แบบ async (ดู ecom_shared/aio.py)
+from ecom_shared.aio import AsyncDynamoTable as Table, batch_get_items, lifespan
+from ecom_shared.auth import InvalidToken, get_request_claims, protect
+from ecom_shared.dynamo import deserialize, serialize
+from ecom_shared.errors import TransactionCanceled
+from ecom_shared.inventory import (
+    SHARD_COUNT_ATTRIBUTE,
+    allocate,
+    random_shard,
+    release_action,
+    reserve_action,
+    shard_levels,
+)
+from ecom_shared.responses import (
+    FastJSONResponse,
+    FastSerializer,
+    fast_responses_enabled,
+)
+from ecom_shared.web import instrument, to_http_exception
 
-if TYPE_CHECKING:
-    from mypy_boto3_dynamodb.service_resource import Table
-else:
-    Table = object
+# --- 1. Models ---
+# TransactWriteItems รับได้สูงสุด 100 action
+# -> 1 (Put Order) + 1 (สถิติของ User) + 1 (Idempotency Key) + สินค้าไม่เกิน 97 ชนิด
+# (สินค้าที่แบ่ง shard ที่ต้องตัดหลาย shard ใช้หลาย action -> ถ้าเกิน 100 จะตอบ 409 ให้แยก Order)
+MAX_TRANSACT_ITEMS = 100
+MAX_ORDER_ITEMS = 97
+# เปลี่ยน Status: ลองใหม่ได้ (อ่านสินค้าใหม่) ถ้าการคืน Stock ไม่ผ่าน / ชนกับ Transaction อื่น
+MAX_TRANSITION_ATTEMPTS = 3
 
 
-# --- 1. Models ---
 class OrderItemInput(BaseModel):
     """สินค้า 1 ชนิดในตะกร้า"""
 
     ProductID: str
     Quantity: int = Field(..., gt=0)
-    PricePerUnit: Decimal = Field(..., gt=0)  # รับเป็น Decimal
+    # (ไม่ใช้แล้ว) ราคาจริงจะดึงจาก ProductsTable ฝั่ง Server เสมอ
+    # ยังรับไว้เพื่อให้ Frontend เดิมส่งมาได้ไม่พัง
+    PricePerUnit: Optional[Decimal] = Field(None, gt=0)
 
 
 class OrderInput(BaseModel):
     """ข้อมูลที่ Frontend ส่งมาตอนกด "สั่งซื้อ" """
 
-    Items: List[OrderItemInput]
-    TotalAmount: Decimal = Field(..., gt=0)
+    Items: List[OrderItemInput] = Field(..., min_length=1, max_length=MAX_ORDER_ITEMS)
+    # (ไม่ใช้แล้ว) Server คำนวณยอดรวมเองจากราคาปัจจุบัน
+    TotalAmount: Optional[Decimal] = Field(None, gt=0)
     # (เราจะไม่รับ UserID จาก Body/Input... เราจะดึงจาก Token!)
 
 
@@ -54,12 +79,77 @@ class OrderResponse(BaseModel):
     TotalAmount: float
 
 
+class OrderSummaryResponse(BaseModel):
+    """ข้อมูล Order แบบย่อ (สำหรับหน้า History) - ไม่มี Items"""
+
+    OrderID: str
+    Status: str
+    CreatedAt: str
+    TotalAmount: float
+
+
+class OrderStatusInput(BaseModel):
+    """Status ใหม่ของ Order (ต้องเป็นการเปลี่ยนที่ ORDER_TRANSITIONS อนุญาต)"""
+
+    Status: Literal["PAID", "SHIPPED", "DELIVERED", "CANCELLED"]
+
+
+class QueuedOrderResponse(BaseModel):
+    """Order 1 รายการในคิวงาน (มี UserID ไว้ใช้เปลี่ยน Status ต่อ)"""
+
+    UserID: str
+    OrderID: str
+    Status: str
+    CreatedAt: str
+    TotalAmount: float
+
+
+class OrderStatsResponse(BaseModel):
+    """สถิติการสั่งซื้อของ User (อ่านจาก Item เดียว ไม่ต้องไล่ Order ทั้งหมด)"""
+
+    OrderCount: int = 0
+    # ยอดซื้อรวม (ไม่รวม Order ที่ถูกยกเลิก)
+    TotalSpent: float = 0
+    FirstOrderAt: Optional[str] = None
+    LastOrderAt: Optional[str] = None
+    LastOrderID: Optional[str] = None
+    # จำนวน Order แยกตาม Status เช่น {"PENDING": 2, "SHIPPED": 5}
+    StatusCounts: dict[str, int] = {}
+
+
+# list_my_orders คืนได้ทั้งแบบเต็มและแบบย่อ
+# (left_to_right: ลองแบบเต็มก่อน ถ้าไม่มี Items ค่อยเป็นแบบย่อ)
+OrderListItem = Annotated[
+    Union[OrderResponse, OrderSummaryResponse], Field(union_mode="left_to_right")
+]
+
+
+# FAST_RESPONSES=true: list_my_orders แปลง Item -> JSON เอง (ไม่ validate ซ้ำ)
+# ดู ecom_shared/responses.py
+FAST_RESPONSES = fast_responses_enabled()
+ORDER_SERIALIZERS = {
+    "full": FastSerializer(OrderResponse),
+    "summary": FastSerializer(OrderSummaryResponse),
+}
+
+
 # --- 2. AWS Setup & Dependency Injection ---
-app = FastAPI(title="OrderService")
+app = FastAPI(title="OrderService", lifespan=lifespan)
+# log เวลา + Capacity ของ DynamoDB ต่อ request (EMF) -> ต้องอยู่ก่อนประกาศ route
+instrument(app, "order_service")
+# AUTH_MODE=jwt (container): ตรวจ token เองทุก Route แทน API Gateway
+protect(app)
+
+# ORDERS_TABLE_NAME มาก่อน (ตอนรวมทุก Service ไว้ใน process เดียว DYNAMO_TABLE_NAME ใช้ร่วมกันไม่ได้)
+TABLE_NAME = os.environ.get(
+    "ORDERS_TABLE_NAME", os.environ.get("DYNAMO_TABLE_NAME", "EcomPoc-OrdersTable")
+)
+table = Table(TABLE_NAME)  # (Connection จริงสร้างตอนใช้งานครั้งแรก)
 
-TABLE_NAME = os.environ.get("DYNAMO_TABLE_NAME", "EcomPoc-OrdersTable")
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(TABLE_NAME)
+
+# Order Service ต้องอ่านราคา/ตัด Stock ใน ProductsTable ด้วย
+PRODUCTS_TABLE_NAME = os.environ.get("PRODUCTS_TABLE_NAME", "EcomPoc-ProductsTable")
+products_table = Table(PRODUCTS_TABLE_NAME)
 
 
 def get_db_table() -> Table:
@@ -67,71 +157,1031 @@ def get_db_table() -> Table:
     return table
 
 
+def get_products_table() -> Table:
+    """Dependency function ที่จะส่งต่อ global products table"""
+    return products_table
+
+
+# สินค้าที่แบ่ง Stock เป็น shard (Flash Sale) ตัด Stock ที่ StockShardsTable แทน
+# (ดู ecom_shared/inventory.py)
+STOCK_SHARDS_TABLE_NAME = os.environ.get(
+    "STOCK_SHARDS_TABLE_NAME", "EcomPoc-StockShardsTable"
+)
+stock_shards_table = Table(STOCK_SHARDS_TABLE_NAME)
+
+
+def get_stock_shards_table() -> Table:
+    """Dependency function ที่จะส่งต่อ global stock shards table"""
+    return stock_shards_table
+
+
+# --- Order ID (เรียงตามเวลาได้) ---
+# OrderID แบบใหม่: "ORD-" + ULID (26 ตัวอักษร, ขึ้นต้นด้วยเวลาเป็น ms)
+# -> เรียง Sort Key ตามตัวอักษร = เรียงตามเวลาสร้าง
+ORDER_ID_PREFIX = "ORD-"
+# OrderID แบบเก่า: "ORDER-" + uuid4 (ไม่มีลำดับเวลา) ยังต้องอ่านได้
+LEGACY_ORDER_ID_PREFIX = "ORDER-"
+
+_CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def new_ulid(timestamp_ms: int | None = None) -> str:
+    """สร้าง ULID: เวลา 48 bit + สุ่ม 80 bit เข้ารหัสเป็น Crockford Base32 26 ตัว"""
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms << 80) | int.from_bytes(os.urandom(10), "big")
+    chars = []
+    for _ in range(26):
+        chars.append(_CROCKFORD_BASE32[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def new_order_id() -> str:
+    return f"{ORDER_ID_PREFIX}{new_ulid()}"
+
+
+# --- สถิติต่อ User (Aggregate Item) ---
+# เก็บไว้ใน Partition เดียวกับ Order ของ User: (UserID, OrderID="STATS")
+# ไม่ขึ้นต้นด้วย ORD-/ORDER- -> ไม่โผล่ใน list_my_orders / get_my_order
+# อัปเดตด้วย ADD ใน Transaction เดียวกับที่เขียน Order (ตัวเลขตรงกับ Order เสมอ)
+# หมายเหตุ: Order ที่สร้างก่อนมีฟีเจอร์นี้จะไม่ถูกนับ
+STATS_SORT_KEY = "STATS"
+# จำนวนต่อ Status เก็บเป็น Attribute ชั้นบนสุด เช่น "StatusCount#PENDING"
+# (ADD ลง Map ที่ยังไม่มีอยู่ไม่ได้)
+STATUS_COUNT_PREFIX = "StatusCount#"
+# Status ที่ไม่นับเป็นยอดซื้อ (TotalSpent)
+NON_SPENDING_STATUSES = frozenset({"CANCELLED"})
+
+
+def stats_key(user_id: str) -> dict:
+    return {"UserID": user_id, "OrderID": STATS_SORT_KEY}
+
+
+def stats_update_for_new_order(table_name: str, order: dict) -> dict:
+    """Action (สำหรับ TransactWriteItems) ที่นับ Order ใหม่เข้าสถิติของ User"""
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": stats_key(order["UserID"]),
+            "UpdateExpression": (
+                "ADD OrderCount :one, TotalSpent :amount, #status_count :one"
+                " SET FirstOrderAt = if_not_exists(FirstOrderAt, :created),"
+                " LastOrderAt = :created, LastOrderID = :order_id"
+            ),
+            "ExpressionAttributeNames": {
+                "#status_count": STATUS_COUNT_PREFIX + order["Status"]
+            },
+            "ExpressionAttributeValues": {
+                ":one": 1,
+                ":amount": order["TotalAmount"],
+                ":created": order["CreatedAt"],
+                ":order_id": order["OrderID"],
+            },
+        }
+    }
+
+
+def stats_update_for_status_change(
+    table_name: str, order: dict, new_status: str
+) -> dict:
+    """
+    Action (สำหรับ TransactWriteItems) ที่ย้ายจำนวนจาก Status เดิม -> Status ใหม่
+    ใช้คู่กับ Update ที่เปลี่ยน Status ของ Order ใน Transaction เดียวกัน
+    (เข้า/ออกจาก NON_SPENDING_STATUSES -> หัก/คืน TotalSpent ด้วย)
+    เงื่อนไข: ตัวนับของ Status เดิมต้องมากกว่า 0 -> Order เก่าที่ไม่เคยถูกนับ
+    (สร้างก่อนมีสถิติ) จะไม่ผ่าน แทนที่จะทำให้ตัวนับ/ยอดซื้อติดลบ
+    """
+    old_status = order["Status"]
+    spent_change = 0
+    if old_status in NON_SPENDING_STATUSES and new_status not in NON_SPENDING_STATUSES:
+        spent_change = order["TotalAmount"]
+    elif (
+        new_status in NON_SPENDING_STATUSES and old_status not in NON_SPENDING_STATUSES
+    ):
+        spent_change = -order["TotalAmount"]
+
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": stats_key(order["UserID"]),
+            "UpdateExpression": (
+                "ADD #old_count :minus_one, #new_count :one, TotalSpent :spent"
+            ),
+            # ไม่มี Attribute นี้ -> เปรียบเทียบไม่ผ่านอยู่แล้ว
+            "ConditionExpression": "#old_count > :zero",
+            "ExpressionAttributeNames": {
+                "#old_count": STATUS_COUNT_PREFIX + old_status,
+                "#new_count": STATUS_COUNT_PREFIX + new_status,
+            },
+            "ExpressionAttributeValues": {
+                ":one": 1,
+                ":minus_one": -1,
+                ":zero": 0,
+                ":spent": spent_change,
+            },
+        }
+    }
+
+
+def stats_from_item(item: dict | None) -> dict:
+    """Item สถิติใน Table -> รูปแบบ OrderStatsResponse (ไม่มี Item = ยังไม่เคยสั่ง)"""
+    if not item:
+        return {}
+    stats = {
+        key: item[key]
+        for key in (
+            "OrderCount",
+            "TotalSpent",
+            "FirstOrderAt",
+            "LastOrderAt",
+            "LastOrderID",
+        )
+        if key in item
+    }
+    stats["StatusCounts"] = {
+        key[len(STATUS_COUNT_PREFIX) :]: count
+        for key, count in sorted(item.items())
+        if key.startswith(STATUS_COUNT_PREFIX) and count
+    }
+    return stats
+
+
+# --- วงจรชีวิตของ Order (State Machine) ---
+# PENDING -> PAID -> SHIPPED -> DELIVERED
+#    |         |
+#    +---------+--> CANCELLED
+# เปลี่ยนด้วย Update แบบมีเงื่อนไข "Status ยังเป็นค่าที่อ่านมา" (เปลี่ยนพร้อมกัน 2 ทาง -> ผ่านทางเดียว)
+ORDER_TRANSITIONS = {
+    "PENDING": frozenset({"PAID", "CANCELLED"}),
+    "PAID": frozenset({"SHIPPED", "CANCELLED"}),
+    "SHIPPED": frozenset({"DELIVERED"}),
+    "DELIVERED": frozenset(),
+    "CANCELLED": frozenset(),
+}
+# Status ที่ยังมีงานต้องทำ -> อยู่ในคิวของ Fulfillment Worker
+OPEN_STATUSES = frozenset({"PENDING", "PAID", "SHIPPED"})
+# Sparse GSI (ดู template.yaml): PK = OpenStatus, SK = CreatedAt
+# OpenStatus มีเฉพาะ Order ที่ยังไม่จบ (จบแล้ว -> REMOVE) -> index มีแค่งานค้าง
+# Query ทีละ Status เรียงเก่า -> ใหม่ จ่ายตามจำนวนงานค้าง ไม่ใช่ตาม Order ทั้งหมดที่เคยมี
+# หมายเหตุ: Order ที่สร้างก่อนมีฟีเจอร์นี้ไม่มี OpenStatus -> ไม่อยู่ในคิว
+OPEN_STATUS_ATTRIBUTE = "OpenStatus"
+OPEN_STATUS_INDEX = "OpenStatusIndex"
+# User ทั่วไปยกเลิก Order ของตัวเองได้อย่างเดียว ที่เหลือเป็นงานของ Worker
+# (Worker = อยู่ใน Cognito Group นี้)
+FULFILLMENT_GROUP = os.environ.get("FULFILLMENT_GROUP", "fulfillment")
+
+
+def status_transition_update(
+    table_name: str, order: dict, new_status: str, timestamp: str
+) -> dict:
+    """
+    Action (สำหรับ TransactWriteItems) ที่เปลี่ยน Status ของ Order
+    - เงื่อนไข: Status ยังเป็นค่าเดิมที่อ่านมา
+    - OpenStatus ตาม Status ใหม่ (จบแล้ว -> ลบออก = ออกจาก Sparse GSI)
+    - ต่อท้ายประวัติใน StatusHistory
+    """
+    names = {"#status": "Status", "#open": OPEN_STATUS_ATTRIBUTE}
+    values = {
+        ":old": order["Status"],
+        ":new": new_status,
+        ":now": timestamp,
+        ":entry": [{"Status": new_status, "At": timestamp}],
+        ":empty": [],
+    }
+    update = (
+        "SET #status = :new, UpdatedAt = :now,"
+        " StatusHistory = list_append(if_not_exists(StatusHistory, :empty), :entry)"
+    )
+    if new_status in OPEN_STATUSES:
+        update += ", #open = :new"
+    else:
+        update += " REMOVE #open"
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": {"UserID": order["UserID"], "OrderID": order["OrderID"]},
+            "UpdateExpression": update,
+            "ConditionExpression": "#status = :old",
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }
+    }
+
+
+async def transition_order(
+    table: Table,
+    products_table: Table,
+    shards_table: Table,
+    user_id: str,
+    order_id: str,
+    new_status: str,
+) -> dict:
+    """
+    เปลี่ยน Status ของ Order ตาม State Machine (ผิดลำดับ -> 409)
+    + ย้ายตัวนับในสถิติของ User ใน Transaction เดียวกัน
+    + ยกเลิก -> คืน Stock ทุกชิ้นใน Transaction เดียวกัน (สินค้าที่ถูกลบไปแล้วข้าม)
+    Status ถูกเปลี่ยนไปก่อน -> 409 ทันที / คืน Stock ไม่ผ่าน (เปิด/ปิด shard) -> อ่านสินค้าใหม่แล้วลองอีกครั้ง
+    """
+    if not order_id.startswith(ORDER_ID_PHASES):
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    response = await table.get_item(
+        Key={"UserID": user_id, "OrderID": order_id}, ConsistentRead=True
+    )
+    order = response.get("Item")
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if new_status not in ORDER_TRANSITIONS.get(order["Status"], ()):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Cannot change status from {order['Status']} to {new_status}",
+        )
+
+    timestamp = datetime.now(timezone.utc).isoformat()
+    status_update = status_transition_update(table.name, order, new_status, timestamp)
+    stats_update = stats_update_for_status_change(table.name, order, new_status)
+    include_stats = True
+    restock_failed: list[str] = []
+    for _ in range(MAX_TRANSITION_ATTEMPTS):
+        restock, restock_product_ids = [], []
+        if new_status == "CANCELLED":
+            # อ่านใหม่ทุกรอบ (สินค้าอาจถูกเปิด/ปิด shard ระหว่างนั้น)
+            restock, restock_product_ids = await restock_for_order(
+                products_table, shards_table, order
+            )
+        head = [status_update, stats_update] if include_stats else [status_update]
+        transact_items = head + restock
+        if len(transact_items) > MAX_TRANSACT_ITEMS:
+            raise HTTPException(
+                status_code=409, detail="Order has too many items to change at once"
+            )
+        try:
+            await table.client.transact_write_items(TransactItems=transact_items)
+            return {**order, "Status": new_status, "UpdatedAt": timestamp}
+        except TransactionCanceled as e:
+            reasons = e.reasons
+            if reasons[:1] == ["ConditionalCheckFailed"]:
+                # มีคนเปลี่ยน Status ไปก่อนระหว่างที่เราอ่าน -> ให้ Client อ่านใหม่แล้วตัดสินใจอีกที
+                raise HTTPException(
+                    status_code=409,
+                    detail="Order status changed concurrently, please retry",
+                )
+            if include_stats and reasons[1:2] == ["ConditionalCheckFailed"]:
+                # Order เก่าที่ไม่ได้อยู่ในสถิติ -> ไม่แตะตัวนับ (Status / Stock ตามปกติ)
+                include_stats = False
+            # สินค้าถูกเปิด/ปิด shard (หรือลบ) หลังอ่าน -> อ่านใหม่แล้วคืน Stock อีกครั้ง
+            restock_failed = [
+                product_id
+                for product_id, reason in zip(restock_product_ids, reasons[len(head) :])
+                if reason == "ConditionalCheckFailed"
+            ]
+    if restock_failed:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Could not return stock, please retry: {', '.join(restock_failed)}",
+        )
+    raise HTTPException(
+        status_code=409, detail="Order changed concurrently, please retry"
+    )
+
+
+async def restock_for_order(
+    products_table: Table, shards_table: Table, order: dict
+) -> tuple[list[dict], list[str]]:
+    """
+    Action ที่คืน Stock ของทุกชิ้นใน Order (1 action ต่อสินค้า 1 ชนิด)
+    คืน (actions, ProductID ของแต่ละ action) / สินค้าที่ถูกลบไปแล้วข้าม
+    """
+    quantities: dict[str, int] = {}
+    for order_item in order.get("Items", []):
+        # Order เก่าอาจมี ProductID ซ้ำ (1 Transaction แตะ Item เดิมซ้ำไม่ได้)
+        product_id = order_item["ProductID"]
+        quantities[product_id] = quantities.get(product_id, 0) + order_item["Quantity"]
+    products = await fetch_current_products(products_table, list(quantities))
+
+    actions, product_ids = [], []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if not product:
+            continue
+        actions.extend(
+            restock_actions(
+                products_table.name,
+                shards_table.name,
+                {"ProductID": product_id, "Quantity": quantity},
+                int(product.get(SHARD_COUNT_ATTRIBUTE, 0)),
+            )
+        )
+        product_ids.append(product_id)
+    return actions, product_ids
+
+
+# --- Idempotency Key (POST /orders ซ้ำ -> ได้ Order เดิม ไม่สร้างใหม่) ---
+# Client ส่ง Header "Idempotency-Key" (สุ่มใหม่ต่อ 1 การกดสั่งซื้อ ใช้ค่าเดิมตอน retry)
+# Record เก็บใน Partition ของ User: (UserID, OrderID="IDEMPOTENCY#<key>")
+# เขียนแบบมีเงื่อนไขใน Transaction เดียวกับ Order -> มีได้ Order เดียวต่อ 1 key เสมอ
+# (ส่งซ้ำพร้อมกันหลายครั้ง ก็มีแค่ครั้งเดียวที่ Transaction ผ่าน ที่เหลืออ่าน Record มาตอบ)
+IDEMPOTENCY_PREFIX = "IDEMPOTENCY#"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Record หมดอายุด้วย TTL ของ DynamoDB (Attribute ExpiresAt, epoch seconds)
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Header ที่บอก Client ว่าเป็นคำตอบเดิม (ไม่ได้สร้าง Order ใหม่)
+IDEMPOTENT_REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def idempotency_record_key(user_id: str, idempotency_key: str) -> dict:
+    return {"UserID": user_id, "OrderID": f"{IDEMPOTENCY_PREFIX}{idempotency_key}"}
+
+
+def request_fingerprint(order_in: OrderInput) -> str:
+    """hash ของ Body (ไว้เช็คว่า key เดิมถูกใช้กับคำสั่งซื้อเดิมจริงๆ)"""
+    return hashlib.sha256(order_in.model_dump_json().encode()).hexdigest()
+
+
+def idempotency_put(
+    table_name: str, user_id: str, idempotency_key: str, fingerprint: str, order: dict
+) -> dict:
+    """Action (สำหรับ TransactWriteItems) ที่จอง key นี้ พร้อมเก็บ Response ไว้ตอบซ้ำ"""
+    now = int(time.time())
+    return {
+        "Put": {
+            "TableName": table_name,
+            "Item": {
+                **idempotency_record_key(user_id, idempotency_key),
+                "RequestHash": fingerprint,
+                "Response": order,
+                "ExpiresAt": now + IDEMPOTENCY_TTL_SECONDS,
+            },
+            # TTL ลบ Item ช้าได้หลายชั่วโมง -> Record ที่หมดอายุแล้วถือว่าไม่มี
+            "ConditionExpression": "attribute_not_exists(OrderID) OR ExpiresAt < :now",
+            "ExpressionAttributeValues": {":now": now},
+        }
+    }
+
+
+async def find_idempotent_response(
+    table: Table, user_id: str, idempotency_key: str, fingerprint: str
+) -> dict | None:
+    """
+    Response เดิมของ key นี้ (None = ยังไม่เคยใช้ / หมดอายุแล้ว)
+    key เดิมแต่ Body ไม่เหมือนเดิม -> 422
+    """
+    response = await table.get_item(
+        Key=idempotency_record_key(user_id, idempotency_key),
+        ConsistentRead=True,  # ต้องเห็น Transaction ที่เพิ่งผ่านไป
+    )
+    record = response.get("Item")
+    if not record or record["ExpiresAt"] < time.time():
+        return None
+    if record["RequestHash"] != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    return record["Response"]
+
+
+# --- Pagination Helpers ---
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+# Header ที่ใช้ส่ง cursor ของหน้าถัดไปกลับไปให้ Client
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# อ่าน Order ใหม่ (เรียงตามเวลา ใหม่ -> เก่า) ก่อน แล้วค่อยต่อด้วย Order แบบเก่า
+ORDER_ID_PHASES = (ORDER_ID_PREFIX, LEGACY_ORDER_ID_PREFIX)
+
+# view=summary: อ่านเฉพาะ Attribute ที่หน้า History ใช้ (ไม่อ่าน Items)
+SUMMARY_PROJECTION = {
+    "ProjectionExpression": "OrderID, #status, CreatedAt, TotalAmount",
+    "ExpressionAttributeNames": {"#status": "Status"},  # Status เป็น reserved word
+}
+
+
+def encode_cursor(phase: int, last_evaluated_key: dict | None) -> str:
+    """แปลง (phase, LastEvaluatedKey) เป็น cursor แบบ "ทึบ" (opaque)"""
+    typed_key = (
+        {k: serialize(v) for k, v in last_evaluated_key.items()}
+        if last_evaluated_key
+        else None
+    )
+    raw = json.dumps({"p": phase, "k": typed_key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int, dict | None]:
+    """แปลง cursor กลับเป็น (phase, ExclusiveStartKey) (ถ้า cursor เสีย ให้ตอบ 400)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        phase = payload["p"]
+        if phase not in range(len(ORDER_ID_PHASES)):
+            raise ValueError(phase)
+        typed_key = payload["k"]
+        start_key = (
+            {k: deserialize(v) for k, v in typed_key.items()} if typed_key else None
+        )
+        return phase, start_key
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# cursor ของคิวงาน (OpenStatusIndex) แยกจาก cursor ของประวัติ Order
+# Key ของ GSI = Key ของ Table (UserID, OrderID) + Key ของ Index (OpenStatus, CreatedAt)
+QUEUE_CURSOR_KEYS = frozenset({"UserID", "OrderID", OPEN_STATUS_ATTRIBUTE, "CreatedAt"})
+
+
+def encode_queue_cursor(last_evaluated_key: dict) -> str:
+    """แปลง LastEvaluatedKey ของ OpenStatusIndex เป็น cursor (ติดชื่อ Index ไว้)"""
+    typed_key = {k: serialize(v) for k, v in last_evaluated_key.items()}
+    raw = json.dumps(
+        {"i": OPEN_STATUS_INDEX, "k": typed_key}, separators=(",", ":")
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_queue_cursor(cursor: str, status: str) -> dict:
+    """
+    แปลง cursor ของคิวงานกลับเป็น ExclusiveStartKey
+    cursor เสีย / เป็นของ Index อื่น (เช่น จาก /orders) / คนละ Status -> 400
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        if payload["i"] != OPEN_STATUS_INDEX:
+            raise ValueError(payload["i"])
+        start_key = {k: deserialize(v) for k, v in payload["k"].items()}
+        if set(start_key) != QUEUE_CURSOR_KEYS:
+            raise ValueError(sorted(start_key))
+        if start_key[OPEN_STATUS_ATTRIBUTE] != status:
+            raise ValueError(start_key[OPEN_STATUS_ATTRIBUTE])
+        if not all(isinstance(value, str) for value in start_key.values()):
+            raise ValueError(start_key)
+        return start_key
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def query_orders_page(
+    table: Table, user_id: str, limit: int, cursor: str | None, **query_kwargs
+) -> tuple[list[dict], str | None]:
+    """
+    ดึง Order ของ User ทีละหน้า เรียงจากใหม่ -> เก่า (ScanIndexForward=False)
+    - phase 0: OrderID แบบใหม่ ("ORD-" + ULID) เรียงตามเวลาจริง
+    - phase 1: OrderID แบบเก่า ("ORDER-" + uuid4) ต่อท้าย (ข้อมูลก่อนเปลี่ยน ID)
+    คืนค่า (items, next_cursor)
+    """
+    phase, start_key = decode_cursor(cursor) if cursor else (0, None)
+    items: list[dict] = []
+
+    while phase < len(ORDER_ID_PHASES):
+        kwargs = {
+            "KeyConditionExpression": "UserID = :uid AND begins_with(OrderID, :prefix)",
+            "ScanIndexForward": False,
+            "Limit": limit - len(items),
+            **query_kwargs,
+        }
+        kwargs["ExpressionAttributeValues"] = {
+            **query_kwargs.get("ExpressionAttributeValues", {}),
+            ":uid": user_id,
+            ":prefix": ORDER_ID_PHASES[phase],
+        }
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        response = await table.query(**kwargs)
+        items.extend(response.get("Items", []))
+        start_key = response.get("LastEvaluatedKey")
+
+        if not start_key:
+            # phase นี้หมดแล้ว -> ไป phase ถัดไป
+            phase += 1
+        if len(items) >= limit:
+            break
+
+    if phase >= len(ORDER_ID_PHASES):
+        return items, None
+    return items, encode_cursor(phase, start_key)
+
+
 # --- 3. (ใหม่!) Dependency สำหรับดึง UserID จาก Token ---
 def get_current_user_id(request: Request) -> str:
     """
-    ดึง UserID (sub) ออกมาจาก Cognito Authorizer
-    ที่ API Gateway ส่งมาให้ใน 'request.scope'
+    ดึง UserID (sub) ออกมาจาก Token
+    - Lambda: Cognito Authorizer ของ API Gateway ตรวจแล้ว ส่งมาใน 'request.scope'
+    - Container (AUTH_MODE=jwt): ตรวจ JWT เองใน process (ดู ecom_shared/auth.py)
+    """
+    try:
+        return get_request_claims(request)["sub"]
+    except (InvalidToken, KeyError):
+        # ไม่มี Token / Token ไม่ถูกต้อง (บน Lambda _ควร_ จะมีเสมอ ถ้า Auth ถูกตั้งค่าไว้)
+        raise HTTPException(
+            status_code=401, detail="Could not extract UserID from token"
+        )
+
+
+def token_groups(claims: dict) -> list[str]:
+    """
+    Cognito Group ของ User จาก claim "cognito:groups"
+    (API Gateway HTTP API ส่ง claim ที่เป็น list มาเป็น string เช่น "[a b]")
     """
+    groups = claims.get("cognito:groups") or []
+    if isinstance(groups, str):
+        groups = groups.strip("[]").replace(",", " ").split()
+    return list(groups)
+
+
+def get_fulfillment_worker_id(request: Request) -> str:
+    """UserID ของ Fulfillment Worker (ไม่อยู่ใน FULFILLMENT_GROUP -> 403)"""
     try:
-        # Mangum (ตัวแปลง) จะเก็บ event ของ Lambda ไว้ใน scope
-        lambda_event = request.scope["aws.event"]
-        user_id = lambda_event["requestContext"]["authorizer"]["jwt"]["claims"]["sub"]
-        return user_id
-    except KeyError:
-        # นี่คือ Error ร้ายแรง (_ควร_ จะมี ถ้า Auth ถูกตั้งค่าไว้)
+        claims = get_request_claims(request)
+        worker_id = claims["sub"]
+    except (InvalidToken, KeyError):
         raise HTTPException(
             status_code=401, detail="Could not extract UserID from token"
         )
+    if FULFILLMENT_GROUP not in token_groups(claims):
+        raise HTTPException(status_code=403, detail="Fulfillment workers only")
+    return worker_id
 
 
 # --- 4. Endpoints ---
+def merge_order_items(items: List[OrderItemInput]) -> dict[str, int]:
+    """รวม Quantity ของ ProductID ที่ซ้ำกัน (1 Transaction แตะ Item เดิมซ้ำไม่ได้)"""
+    quantities: dict[str, int] = {}
+    for order_item in items:
+        quantities[order_item.ProductID] = (
+            quantities.get(order_item.ProductID, 0) + order_item.Quantity
+        )
+    return quantities
+
+
+async def fetch_current_products(
+    products_table: Table, product_ids: list[str]
+) -> dict[str, dict]:
+    """
+    ดึงราคาปัจจุบัน (+ จำนวน shard ของ Stock และ Version) ของสินค้า (BatchGetItem ครั้งเดียว)
+    -> {ProductID: {"Price": ..., "StockShards": ..., "Version": ...}}
+    """
+    products = await batch_get_items(
+        products_table,
+        [{"ProductID": product_id} for product_id in product_ids],
+        ProjectionExpression=f"ProductID, Price, {SHARD_COUNT_ATTRIBUTE}, Version",
+    )
+    return {product["ProductID"]: product for product in products}
+
+
+def stock_actions(
+    products_table_name: str,
+    shards_table_name: str,
+    order_item: dict,
+    product: dict,
+    allocation: dict[int, int] | None = None,
+) -> list[dict]:
+    """
+    Action (สำหรับ TransactWriteItems) ที่ตัด Stock ของสินค้า 1 ชนิด
+    product = ข้อมูลที่อ่านมาจาก fetch_current_products
+    - ปกติ: Update Item ของสินค้า (Stock >= Quantity และราคายังเท่าเดิม)
+    - แบ่ง shard: ตัด Stock ที่ shard อย่างเดียว ไม่แตะ Item ของสินค้าเลย
+      (ConditionCheck ก็นับว่าแตะ -> Order ที่ซื้อสินค้าเดียวกันจะชนกันเอง)
+      ราคา/จำนวน shard ยังเท่าตอนอ่าน = ProductVersion ของ shard ยังตรงกับ Version ที่อ่านมา
+      (allocation = {Shard: จำนวน}, ไม่ส่งมา = สุ่ม shard เดียวตัดทั้งหมด)
+    """
+    shard_count = int(product.get(SHARD_COUNT_ATTRIBUTE, 0))
+    quantity, price = order_item["Quantity"], order_item["PricePerUnit"]
+    if not shard_count:
+        return [
+            {
+                "Update": {
+                    "TableName": products_table_name,
+                    "Key": {"ProductID": order_item["ProductID"]},
+                    # ตัด Stock = ข้อมูลสินค้าเปลี่ยน -> +1 Version (ETag) ด้วย
+                    "UpdateExpression": "SET Stock = Stock - :qty ADD Version :one",
+                    # ถูกเปลี่ยนเป็นแบบ shard ไปแล้ว -> Stock ใน Item ไม่ใช่ตัวจริง
+                    "ConditionExpression": (
+                        "attribute_exists(ProductID) AND Stock >= :qty"
+                        " AND Price = :price AND attribute_not_exists(#shards)"
+                    ),
+                    "ExpressionAttributeNames": {"#shards": SHARD_COUNT_ATTRIBUTE},
+                    "ExpressionAttributeValues": {
+                        ":qty": quantity,
+                        ":one": 1,
+                        ":price": price,
+                    },
+                }
+            }
+        ]
+
+    if allocation is None:
+        allocation = {random_shard(shard_count): quantity}
+    return [
+        reserve_action(
+            shards_table_name,
+            order_item["ProductID"],
+            shard,
+            shard_quantity,
+            int(product.get("Version", 0)),
+        )
+        for shard, shard_quantity in sorted(allocation.items())
+    ]
+
+
+def restock_actions(
+    products_table_name: str,
+    shards_table_name: str,
+    order_item: dict,
+    shard_count: int,
+) -> list[dict]:
+    """
+    Action (สำหรับ TransactWriteItems) ที่คืน Stock ของสินค้า 1 ชนิด (ตอนยกเลิก Order)
+    - ปกติ: บวก Stock กลับที่ Item ของสินค้า (+1 Version)
+    - แบ่ง shard: บวก Stock กลับที่ shard ที่สุ่มได้ (ไม่แตะ Item ของสินค้า)
+    (ระหว่างนั้นมีการเปิด/ปิด shard -> เงื่อนไขไม่ผ่าน -> ทั้ง Transaction ไม่ผ่าน)
+    """
+    product_key = {"ProductID": order_item["ProductID"]}
+    quantity = order_item["Quantity"]
+    if not shard_count:
+        return [
+            {
+                "Update": {
+                    "TableName": products_table_name,
+                    "Key": product_key,
+                    "UpdateExpression": "SET Stock = Stock + :qty ADD Version :one",
+                    "ConditionExpression": (
+                        "attribute_exists(ProductID) AND attribute_not_exists(#shards)"
+                    ),
+                    "ExpressionAttributeNames": {"#shards": SHARD_COUNT_ATTRIBUTE},
+                    "ExpressionAttributeValues": {":qty": quantity, ":one": 1},
+                }
+            }
+        ]
+    return [
+        release_action(
+            shards_table_name,
+            order_item["ProductID"],
+            random_shard(shard_count),
+            quantity,
+        ),
+    ]
+
+
+async def allocate_from_shards(
+    shards_table: Table, product_id: str, quantity: int
+) -> dict[int, int] | None:
+    """
+    (fallback) shard ที่สุ่มได้เหลือไม่พอ -> อ่านทุก shard แล้วแบ่งตัดหลาย shard
+    None = รวมทุก shard ยังไม่พอ
+    """
+    response = await shards_table.query(
+        KeyConditionExpression="ProductID = :pid",
+        ExpressionAttributeValues={":pid": product_id},
+        ConsistentRead=True,
+    )
+    return allocate(quantity, shard_levels(response.get("Items", [])))
+
+
+def cancelled_product_ids(
+    error: TransactionCanceled, action_product_ids: list[str | None]
+) -> list[str]:
+    """
+    อ่าน CancellationReasons ของ Transaction ที่ล้มเหลว
+    แล้วคืน ProductID ที่ Condition ไม่ผ่าน (Stock ไม่พอ / ราคาเปลี่ยน)
+    (action_product_ids[i] = ProductID ของ action ที่ i / None = ไม่ใช่ action ของสินค้า)
+    """
+    failed = [
+        product_id
+        for product_id, reason in zip(action_product_ids, error.reasons)
+        if product_id and reason == "ConditionalCheckFailed"
+    ]
+    return list(dict.fromkeys(failed))
+
+
+def failed_shard_product_ids(
+    error: TransactionCanceled, transact_items: list[dict], shards_table_name: str
+) -> list[str] | None:
+    """
+    ProductID ที่ล้มเพราะ shard ที่เลือกเหลือไม่พอ "อย่างเดียว" (ลองแบ่งตัดหลาย shard ได้)
+    None = มีอย่างอื่นไม่ผ่านด้วย (ราคาเปลี่ยน / Stock ปกติไม่พอ / ชนกัน) -> ไม่ต้อง fallback
+    """
+    failed = []
+    for action, reason in zip(transact_items, error.reasons):
+        if reason == "None":
+            continue
+        update = action.get("Update", {})
+        if reason != "ConditionalCheckFailed" or (
+            update.get("TableName") != shards_table_name
+        ):
+            return None
+        failed.append(update["Key"]["ProductID"])
+    return list(dict.fromkeys(failed)) or None
+
+
 @app.post("/orders", response_model=OrderResponse, status_code=201)
-def create_order(
+async def create_order(
     order_in: OrderInput,
+    response: Response,
+    idempotency_key: str | None = Header(
+        None,
+        alias="Idempotency-Key",
+        min_length=1,
+        max_length=IDEMPOTENCY_KEY_MAX_LENGTH,
+    ),
     table: Table = Depends(get_db_table),
+    products_table: Table = Depends(get_products_table),
+    shards_table: Table = Depends(get_stock_shards_table),
     user_id: str = Depends(get_current_user_id),  # <-- "ฉีด" UserID เข้ามา
 ):
-    """สร้างคำสั่งซื้อใหม่สำหรับ User ที่ล็อกอินอยู่"""
+    """
+    สร้างคำสั่งซื้อใหม่สำหรับ User ที่ล็อกอินอยู่
+    1. ดึงราคาปัจจุบันของทุกสินค้า (BatchGetItem ครั้งเดียว) แล้วคำนวณยอดรวมเอง
+    2. บันทึก Order + ตัด Stock ทุกชิ้น + อัปเดตสถิติของ User ใน TransactWriteItems ครั้งเดียว
+       (ถ้า Stock ชิ้นไหนไม่พอ ทั้ง Transaction จะไม่ถูกบันทึกเลย)
+       สินค้าที่แบ่ง shard: สุ่มตัด shard เดียว ถ้า shard นั้นไม่พอ ลองใหม่แบบแบ่งตัดหลาย shard
+    ส่ง Header Idempotency-Key มาด้วย -> retry ด้วย key เดิมได้ Order เดิม (ไม่สร้างซ้ำ)
+    """
 
     timestamp = datetime.now(timezone.utc).isoformat()
-    order_id = f"ORDER-{uuid.uuid4()}"  # สร้าง OrderID ใหม่
+    order_id = new_order_id()  # สร้าง OrderID ใหม่ (เรียงตามเวลาได้)
 
-    # แปลง Pydantic model เป็น dict (ใช้ mode='python' เพื่อคง Decimal)
-    item = order_in.model_dump(mode="python")
-
-    # เพิ่ม PK, SK, และข้อมูลที่เราดึงมา
-    item["UserID"] = user_id
-    item["OrderID"] = order_id
-    item["Status"] = "PENDING"  # สถานะเริ่มต้น
-    item["CreatedAt"] = timestamp
+    quantities = merge_order_items(order_in.Items)
+    product_ids = list(quantities)
+    fingerprint = request_fingerprint(order_in) if idempotency_key else None
 
     try:
-        table.put_item(Item=item)
-        return item
+        # 0. key นี้เคยสั่งสำเร็จแล้ว -> ตอบ Order เดิม (ไม่อ่านราคา/ไม่เขียนอะไรเลย)
+        if idempotency_key:
+            replay = await find_idempotent_response(
+                table, user_id, idempotency_key, fingerprint
+            )
+            if replay is not None:
+                response.headers[IDEMPOTENT_REPLAYED_HEADER] = "true"
+                return replay
+
+        # 1. ราคาจริงจาก Server (ไม่เชื่อ PricePerUnit/TotalAmount จาก Client)
+        products = await fetch_current_products(products_table, product_ids)
+        missing = [
+            product_id for product_id in product_ids if product_id not in products
+        ]
+        if missing:
+            raise HTTPException(
+                status_code=404, detail=f"Product not found: {', '.join(missing)}"
+            )
+
+        order_items = [
+            {
+                "ProductID": product_id,
+                "Quantity": quantity,
+                "PricePerUnit": products[product_id]["Price"],
+            }
+            for product_id, quantity in quantities.items()
+        ]
+        item = {
+            "UserID": user_id,
+            "OrderID": order_id,
+            "Status": "PENDING",  # สถานะเริ่มต้น
+            OPEN_STATUS_ATTRIBUTE: "PENDING",  # เข้าคิวงาน (Sparse GSI)
+            "CreatedAt": timestamp,
+            "Items": order_items,
+            "TotalAmount": sum(i["PricePerUnit"] * i["Quantity"] for i in order_items),
+        }
+
+        allocations: dict[str, dict[int, int]] = {}
+
+        # ครั้งแรก: สุ่ม shard / ครั้งที่ 2 (ถ้า shard ที่สุ่มได้ไม่พอ): แบ่งตัดตามที่อ่านมา
+        for attempt in range(2):
+            # 2. Order + ตัด Stock แบบมีเงื่อนไข (Stock >= Quantity และราคายังเท่าเดิม)
+            transact_items = [
+                {
+                    "Put": {
+                        "TableName": table.name,
+                        "Item": item,
+                        "ConditionExpression": "attribute_not_exists(OrderID)",
+                    }
+                }
+            ]
+            action_product_ids: list[str | None] = [None]
+            for order_item in order_items:
+                product_id = order_item["ProductID"]
+                actions = stock_actions(
+                    products_table.name,
+                    shards_table.name,
+                    order_item,
+                    products[product_id],
+                    allocations.get(product_id),
+                )
+                transact_items.extend(actions)
+                action_product_ids.extend([product_id] * len(actions))
+            # 3. สถิติของ User
+            transact_items.append(stats_update_for_new_order(table.name, item))
+            # 4. จอง Idempotency Key (มีคนใช้ key นี้ไปก่อน -> ทั้ง Transaction ไม่ผ่าน)
+            if idempotency_key:
+                transact_items.append(
+                    idempotency_put(
+                        table.name, user_id, idempotency_key, fingerprint, item
+                    )
+                )
+            action_product_ids.extend(
+                [None] * (len(transact_items) - len(action_product_ids))
+            )
+            if len(transact_items) > MAX_TRANSACT_ITEMS:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Order touches too many stock shards, please split it",
+                )
+
+            try:
+                await table.client.transact_write_items(TransactItems=transact_items)
+                return item
+            except TransactionCanceled as e:
+                short = failed_shard_product_ids(e, transact_items, shards_table.name)
+                if attempt or not short:
+                    raise
+                # shard ที่สุ่มได้ไม่พอ -> อ่านทุก shard แล้วแบ่งตัด (ครั้งเดียว)
+                for product_id in short:
+                    allocation = await allocate_from_shards(
+                        shards_table, product_id, quantities[product_id]
+                    )
+                    if allocation is None:
+                        raise HTTPException(
+                            status_code=409,
+                            detail=f"Insufficient stock or price changed: {product_id}",
+                        )
+                    allocations[product_id] = allocation
+
+    except TransactionCanceled as e:
+        if idempotency_key:
+            # ส่งซ้ำพร้อมกัน แล้วอีก request สร้าง Order ไปแล้ว -> ตอบ Order นั้นแทน
+            replay = await find_idempotent_response(
+                table, user_id, idempotency_key, fingerprint
+            )
+            if replay is not None:
+                response.headers[IDEMPOTENT_REPLAYED_HEADER] = "true"
+                return replay
+        failed = cancelled_product_ids(e, action_product_ids)
+        if failed:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Insufficient stock or price changed: {', '.join(failed)}",
+            )
+        # ชนกับ Transaction อื่นที่แตะสินค้าชิ้นเดียวกัน -> ให้ Client ลองใหม่
+        raise HTTPException(
+            status_code=409,
+            detail="Order conflicted with another checkout, please retry",
+        )
     except Exception as e:
-        print(f"!!! UNEXPECTED ERROR (create_order): {repr(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        raise to_http_exception(e, "create_order")
 
 
-@app.get("/orders", response_model=List[OrderResponse])
-def list_my_orders(
+@app.get("/orders", response_model=List[OrderListItem])
+async def list_my_orders(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: str | None = None,
+    view: Literal["full", "summary"] = "full",
     table: Table = Depends(get_db_table),
     user_id: str = Depends(get_current_user_id),  # <-- "ฉีด" UserID เข้ามา
 ):
-    """ดึงรายการคำสั่งซื้อ "ทั้งหมด" ของ User ที่ล็อกอินอยู่"""
+    """
+    ดึงคำสั่งซื้อของ User ที่ล็อกอินอยู่ ทีละหน้า (ใหม่ -> เก่า)
+    - view=summary: คืนแค่ OrderID, Status, CreatedAt, TotalAmount (เบากว่ามาก)
+    cursor ของหน้าถัดไปจะอยู่ใน Header X-Next-Cursor
+    """
+    query_kwargs = SUMMARY_PROJECTION if view == "summary" else {}
     try:
         # นี่คือพลังของ Composite Key!
-        # เรา "Query" หา "ตู้" (PK) ที่ UserID ตรงกัน
-        response = table.query(KeyConditionExpression=Key("UserID").eq(user_id))
-        return response.get("Items", [])
+        # เรา "Query" หา "ตู้" (PK) ที่ UserID ตรงกัน แล้วอ่านจากท้าย (ใหม่สุด) ทีละหน้า
+        items, next_cursor = await query_orders_page(
+            table, user_id, limit, cursor, **query_kwargs
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        if FAST_RESPONSES:
+            return FastJSONResponse(
+                ORDER_SERIALIZERS[view].dump_json_many(items),
+                headers=response.headers,
+            )
+        if view == "summary":
+            return [OrderSummaryResponse.model_validate(item) for item in items]
+        return items
+
+    except Exception as e:
+        raise to_http_exception(e, "list_my_orders")
+
+
+# ต้องประกาศก่อน /orders/{order_id} (ไม่งั้น "stats" จะถูกมองเป็น order_id)
+@app.get("/orders/stats", response_model=OrderStatsResponse)
+async def get_my_order_stats(
+    table: Table = Depends(get_db_table),
+    user_id: str = Depends(get_current_user_id),  # <-- "ฉีด" UserID เข้ามา
+):
+    """สถิติการสั่งซื้อของ User (get_item ครั้งเดียว) เช่น จำนวน Order, ยอดซื้อรวม"""
+    try:
+        response = await table.get_item(Key=stats_key(user_id))
+        return stats_from_item(response.get("Item"))
+
+    except Exception as e:
+        raise to_http_exception(e, "get_my_order_stats")
+
+
+# ต้องประกาศก่อน /orders/{order_id} (ไม่งั้น "queue" จะถูกมองเป็น order_id)
+@app.get("/orders/queue", response_model=List[QueuedOrderResponse])
+async def list_order_queue(
+    response: Response,
+    status: Literal["PENDING", "PAID", "SHIPPED"] = "PENDING",
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: str | None = None,
+    table: Table = Depends(get_db_table),
+    worker_id: str = Depends(get_fulfillment_worker_id),
+):
+    """
+    (Fulfillment Worker) คิวงาน: Order ของทุก User ที่อยู่ใน Status นี้ เรียงเก่า -> ใหม่
+    Query บน Sparse GSI (มีแค่ Order ที่ยังไม่จบ) ทีละหน้า
+    cursor ของหน้าถัดไปจะอยู่ใน Header X-Next-Cursor
+    """
+    start_key = decode_queue_cursor(cursor, status) if cursor else None
+    kwargs = {
+        "IndexName": OPEN_STATUS_INDEX,
+        "KeyConditionExpression": "#open = :status",
+        "ExpressionAttributeNames": {"#open": OPEN_STATUS_ATTRIBUTE},
+        "ExpressionAttributeValues": {":status": status},
+        "ScanIndexForward": True,  # งานที่ค้างนานสุดก่อน
+        "Limit": limit,
+    }
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    try:
+        page = await table.query(**kwargs)
+        last_key = page.get("LastEvaluatedKey")
+        if last_key:
+            response.headers[NEXT_CURSOR_HEADER] = encode_queue_cursor(last_key)
+        return page.get("Items", [])
+
+    except Exception as e:
+        raise to_http_exception(e, "list_order_queue")
+
+
+@app.put("/orders/queue/{user_id}/{order_id}", response_model=OrderResponse)
+async def update_order_status(
+    user_id: str,
+    order_id: str,
+    status_in: OrderStatusInput,
+    table: Table = Depends(get_db_table),
+    products_table: Table = Depends(get_products_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    worker_id: str = Depends(get_fulfillment_worker_id),
+):
+    """(Fulfillment Worker) เปลี่ยน Status ของ Order ตาม State Machine (ผิดลำดับ -> 409)"""
+    try:
+        return await transition_order(
+            table, products_table, shards_table, user_id, order_id, status_in.Status
+        )
+    except Exception as e:
+        raise to_http_exception(e, "update_order_status")
+
+
+@app.post("/orders/{order_id}/cancel", response_model=OrderResponse)
+async def cancel_my_order(
+    order_id: str,
+    table: Table = Depends(get_db_table),
+    products_table: Table = Depends(get_products_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    user_id: str = Depends(get_current_user_id),  # <-- "ฉีด" UserID เข้ามา
+):
+    """
+    ยกเลิก Order ของตัวเอง (ได้เฉพาะตอนยังไม่จัดส่ง: PENDING / PAID)
+    Stock ของทุกชิ้นถูกคืนใน Transaction เดียวกัน
+    """
+    try:
+        return await transition_order(
+            table, products_table, shards_table, user_id, order_id, "CANCELLED"
+        )
+    except Exception as e:
+        raise to_http_exception(e, "cancel_my_order")
+
+
+@app.get("/orders/{order_id}", response_model=OrderResponse)
+async def get_my_order(
+    order_id: str,
+    table: Table = Depends(get_db_table),
+    user_id: str = Depends(get_current_user_id),  # <-- "ฉีด" UserID เข้ามา
+):
+    """ดึงรายละเอียด Order เดียว (get_item ด้วย Key ตรงๆ เฉพาะของ User คนนี้)"""
+    # กันไม่ให้ดึง Item ประเภทอื่นใน Partition เดียวกันที่ไม่ใช่ Order
+    if not order_id.startswith(ORDER_ID_PHASES):
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    try:
+        response = await table.get_item(Key={"UserID": user_id, "OrderID": order_id})
+        item = response.get("Item")
+        if not item:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return item
 
-    except HTTPException as http_exc:
-        raise http_exc
     except Exception as e:
-        print(f"!!! UNEXPECTED ERROR (list_my_orders): {repr(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        raise to_http_exception(e, "get_my_order")
 
 
 # ตัวแปลง Lambda
-handler = Mangum(app)
+# lifespan="off": Mangum รัน lifespan รอบทุก invocation -> จะปิด connection pool ทุก request
+# (บน Lambda ไม่มี shutdown ให้รออยู่แล้ว / lifespan ใช้ตอนรันด้วย uvicorn)
+handler = Mangum(app, lifespan="off")
@@ -9,6 +9,10 @@ PROJECT_ROOT = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "..", "..")
 )
 sys.path.insert(0, PROJECT_ROOT)
+# Shared Layer (ตอน deploy จะอยู่ที่ /opt/python ของ Lambda)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "services", "shared"))
+
+from ecom_shared.dynamo import DynamoClient, DynamoTable  # noqa: E402
 
 
 @pytest.fixture(scope="function")
@@ -38,7 +42,61 @@ def mock_dynamodb_table(aws_credentials):
             AttributeDefinitions=[
                 {"AttributeName": "UserID", "AttributeType": "S"},
                 {"AttributeName": "OrderID", "AttributeType": "S"},
+                {"AttributeName": "OpenStatus", "AttributeType": "S"},
+                {"AttributeName": "CreatedAt", "AttributeType": "S"},
+            ],
+            # Sparse GSI คิวงานของ Fulfillment Worker (ให้ตรงกับ template.yaml)
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "OpenStatusIndex",
+                    "KeySchema": [
+                        {"AttributeName": "OpenStatus", "KeyType": "HASH"},
+                        {"AttributeName": "CreatedAt", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {
+                        "ProjectionType": "INCLUDE",
+                        "NonKeyAttributes": ["Status", "TotalAmount"],
+                    },
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 5,
+                        "WriteCapacityUnits": 5,
+                    },
+                }
             ],
             ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
         )
-        yield dynamodb.Table("TestOrders")
+        yield DynamoTable("TestOrders", DynamoClient(boto3.client("dynamodb")))
+
+
+@pytest.fixture(scope="function")
+def mock_products_table(mock_dynamodb_table):
+    """สร้าง ProductsTable จำลอง (ใช้ตอนเช็คราคา/ตัด Stock) ใน Moto ตัวเดียวกัน"""
+    os.environ["PRODUCTS_TABLE_NAME"] = "TestProducts"
+
+    dynamodb = boto3.resource("dynamodb")
+    dynamodb.create_table(
+        TableName="TestProducts",
+        KeySchema=[{"AttributeName": "ProductID", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "ProductID", "AttributeType": "S"}],
+        ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+    )
+    yield DynamoTable("TestProducts", DynamoClient(boto3.client("dynamodb")))
+
+
+@pytest.fixture(scope="function")
+def mock_stock_shards_table(mock_dynamodb_table):
+    """สร้าง StockShardsTable จำลอง (Stock ของสินค้าที่แบ่ง shard) ใน Moto ตัวเดียวกัน"""
+    dynamodb = boto3.resource("dynamodb")
+    dynamodb.create_table(
+        TableName="TestStockShards",
+        KeySchema=[
+            {"AttributeName": "ProductID", "KeyType": "HASH"},
+            {"AttributeName": "Shard", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "ProductID", "AttributeType": "S"},
+            {"AttributeName": "Shard", "AttributeType": "N"},
+        ],
+        ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+    )
+    yield DynamoTable("TestStockShards", DynamoClient(boto3.client("dynamodb")))
@@ -2,19 +2,34 @@ import pytest
 from fastapi.testclient import TestClient
 from decimal import Decimal
 
+from ecom_shared.aio import AsyncDynamoTable
+
 
 # --- Fixture (ที่ Mock 2 อย่าง) ---
 @pytest.fixture
-def test_client(mock_dynamodb_table):
+def test_client(mock_dynamodb_table, mock_products_table, mock_stock_shards_table):
 
     # Import app และ dependencies ที่นี่
-    from services.order_service.app.main import app, get_db_table, get_current_user_id
+    from services.order_service.app.main import (
+        app,
+        get_db_table,
+        get_products_table,
+        get_stock_shards_table,
+        get_current_user_id,
+    )
 
-    # --- Mock 1: Database ---
+    # --- Mock 1: Database (OrdersTable + ProductsTable) ---
     def get_mock_table():
-        return mock_dynamodb_table
+        return AsyncDynamoTable.from_sync(mock_dynamodb_table)
+
+    def get_mock_products_table():
+        return AsyncDynamoTable.from_sync(mock_products_table)
 
     app.dependency_overrides[get_db_table] = get_mock_table
+    app.dependency_overrides[get_products_table] = get_mock_products_table
+    app.dependency_overrides[get_stock_shards_table] = (
+        lambda: AsyncDynamoTable.from_sync(mock_stock_shards_table)
+    )
 
     # --- Mock 2: Authentication ---
     # เรา "แกล้ง" เป็น User คนนี้
@@ -33,12 +48,26 @@ def test_client(mock_dynamodb_table):
     app.dependency_overrides = {}  # ล้าง mock
 
 
+def seed_product(products_table, product_id, price, stock):
+    """Helper: ใส่สินค้าลง ProductsTable จำลอง"""
+    products_table.put_item(
+        Item={
+            "ProductID": product_id,
+            "Name": product_id,
+            "Price": Decimal(str(price)),
+            "Stock": stock,
+            "Category": "Tests",
+        }
+    )
+
+
 # --- Test Cases ---
-def test_create_and_list_orders(test_client, mock_dynamodb_table):
+def test_create_and_list_orders(test_client, mock_dynamodb_table, mock_products_table):
     """
     เทสวงจรชีวิตของ Order (Create -> List)
     """
     client, MOCK_USER_ID = test_client  # รับ client และ mock user id
+    seed_product(mock_products_table, "PROD-1", 10.50, 5)
 
     # 1. Create Order
     order_data = {
@@ -53,7 +82,7 @@ def test_create_and_list_orders(test_client, mock_dynamodb_table):
     assert data["UserID"] == MOCK_USER_ID  # เช็คว่า UserID ถูกใส่
     assert data["TotalAmount"] == 21.00
     assert data["Status"] == "PENDING"
-    assert "ORDER-" in data["OrderID"]
+    assert data["OrderID"].startswith("ORD-")  # OrderID แบบใหม่ (ULID)
 
     order_id = data["OrderID"]
 
@@ -66,3 +95,737 @@ def test_create_and_list_orders(test_client, mock_dynamodb_table):
     assert len(orders) == 1
     assert orders[0]["OrderID"] == order_id
     assert orders[0]["UserID"] == MOCK_USER_ID
+
+
+def test_create_order_uses_server_prices_and_reserves_stock(
+    test_client, mock_products_table
+):
+    """เทส Checkout: ใช้ราคาจาก Server (ไม่เชื่อ Client) และตัด Stock ใน Transaction เดียว"""
+    client, _ = test_client
+    seed_product(mock_products_table, "PROD-A", 5.00, 10)
+    seed_product(mock_products_table, "PROD-B", 2.50, 3)
+
+    order_data = {
+        "Items": [
+            # ราคาจาก Client ผิด (ต้องถูกเมิน) + ProductID ซ้ำ (ต้องถูกรวม)
+            {"ProductID": "PROD-A", "Quantity": 1, "PricePerUnit": 0.01},
+            {"ProductID": "PROD-B", "Quantity": 3},
+            {"ProductID": "PROD-A", "Quantity": 2},
+        ],
+        "TotalAmount": 0.01,
+    }
+    response = client.post("/orders", json=order_data)
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["TotalAmount"] == 22.50  # 3 * 5.00 + 3 * 2.50
+    assert {i["ProductID"]: i["Quantity"] for i in data["Items"]} == {
+        "PROD-A": 3,
+        "PROD-B": 3,
+    }
+    assert {i["ProductID"]: i["PricePerUnit"] for i in data["Items"]} == {
+        "PROD-A": 5.00,
+        "PROD-B": 2.50,
+    }
+
+    stock = {
+        product_id: mock_products_table.get_item(Key={"ProductID": product_id})["Item"][
+            "Stock"
+        ]
+        for product_id in ("PROD-A", "PROD-B")
+    }
+    assert stock == {"PROD-A": 7, "PROD-B": 0}
+
+
+def test_create_order_insufficient_stock_writes_nothing(
+    test_client, mock_dynamodb_table, mock_products_table
+):
+    """เทส Stock ไม่พอ: ต้องได้ 409 และไม่มีอะไรถูกบันทึกเลย (ทั้ง Order และ Stock)"""
+    client, _ = test_client
+    seed_product(mock_products_table, "PROD-A", 5.00, 10)
+    seed_product(mock_products_table, "PROD-B", 2.50, 1)
+
+    response = client.post(
+        "/orders",
+        json={
+            "Items": [
+                {"ProductID": "PROD-A", "Quantity": 1},
+                {"ProductID": "PROD-B", "Quantity": 2},
+            ]
+        },
+    )
+
+    assert response.status_code == 409
+    assert "PROD-B" in response.json()["detail"]
+    assert "PROD-A" not in response.json()["detail"]
+    assert mock_dynamodb_table.scan()["Count"] == 0
+    assert (
+        mock_products_table.get_item(Key={"ProductID": "PROD-A"})["Item"]["Stock"] == 10
+    )
+
+
+def test_create_order_unknown_product(test_client, mock_products_table):
+    """เทสสั่งสินค้าที่ไม่มีอยู่จริง ต้องได้ 404"""
+    client, _ = test_client
+
+    response = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-NOPE", "Quantity": 1}]}
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Product not found: PROD-NOPE"
+
+
+def seed_sharded_product(products_table, shards_table, product_id, price, levels):
+    """
+    Helper: สินค้าที่แบ่ง Stock เป็น shard (Stock จริงอยู่ใน shards_table)
+    เหมือนตอน reshard: Version ของสินค้า = ProductVersion ของทุก shard
+    """
+    seed_product(products_table, product_id, price, sum(levels))
+    products_table.update_item(
+        Key={"ProductID": product_id},
+        UpdateExpression="SET StockShards = :n, Version = :v",
+        ExpressionAttributeValues={":n": len(levels), ":v": 1},
+    )
+    for shard, stock in enumerate(levels):
+        shards_table.put_item(
+            Item={
+                "ProductID": product_id,
+                "Shard": shard,
+                "Stock": stock,
+                "ProductVersion": 1,
+            }
+        )
+
+
+def shard_stock(shards_table, product_id):
+    items = shards_table.query(
+        KeyConditionExpression="ProductID = :pid",
+        ExpressionAttributeValues={":pid": product_id},
+    )["Items"]
+    return [item["Stock"] for item in sorted(items, key=lambda i: i["Shard"])]
+
+
+def test_create_order_sharded_stock_random_shard_then_fallback(
+    test_client, mock_products_table, mock_stock_shards_table, monkeypatch
+):
+    """เทสสินค้าแบบ shard: ตัด shard ที่สุ่มได้ / ไม่พอ -> แบ่งตัดหลาย shard / รวมไม่พอ -> 409"""
+    client, _ = test_client
+    seed_sharded_product(
+        mock_products_table, mock_stock_shards_table, "PROD-HOT", 9.99, [2, 2, 2]
+    )
+    # สุ่มได้ shard 0 ทุกครั้ง
+    monkeypatch.setattr("services.order_service.app.main.random_shard", lambda n: 0)
+
+    def order(quantity):
+        return client.post(
+            "/orders", json={"Items": [{"ProductID": "PROD-HOT", "Quantity": quantity}]}
+        )
+
+    assert order(2).status_code == 201
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [0, 2, 2]
+
+    # shard 0 หมดแล้ว -> อ่านทุก shard แล้วตัดจาก shard ที่เหลือมากสุดก่อน
+    response = order(3)
+    assert response.status_code == 201
+    assert response.json()["TotalAmount"] == pytest.approx(29.97)
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [0, 0, 1]
+
+    response = order(2)
+    assert response.status_code == 409
+    assert "PROD-HOT" in response.json()["detail"]
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [0, 0, 1]
+
+    # Item ของสินค้าไม่ถูกเขียนเลย (ไม่เป็น hot key) -> Stock/Version เดิม
+    product = mock_products_table.get_item(Key={"ProductID": "PROD-HOT"})["Item"]
+    assert product["Stock"] == 6
+    assert product["Version"] == 1
+
+
+def test_create_order_sharded_stock_does_not_touch_product_item(
+    test_client,
+    mock_dynamodb_table,
+    mock_products_table,
+    mock_stock_shards_table,
+    monkeypatch,
+):
+    """Transaction ของ Order สินค้าแบบ shard ต้องไม่มี action ไหนแตะ Item ของสินค้า"""
+    client, _ = test_client
+    seed_sharded_product(
+        mock_products_table, mock_stock_shards_table, "PROD-HOT", 9.99, [5, 5]
+    )
+    transactions = []
+    real_transact = mock_dynamodb_table.client.transact_write_items
+
+    def recording_transact(**params):
+        transactions.append(params["TransactItems"])
+        return real_transact(**params)
+
+    monkeypatch.setattr(
+        mock_dynamodb_table.client, "transact_write_items", recording_transact
+    )
+    response = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-HOT", "Quantity": 1}]}
+    )
+    assert response.status_code == 201
+
+    (actions,) = transactions
+    tables = {body["TableName"] for action in actions for body in action.values()}
+    assert mock_products_table.name not in tables
+    assert sum(shard_stock(mock_stock_shards_table, "PROD-HOT")) == 9
+
+
+def test_create_order_sharded_stock_price_changed(
+    test_client, mock_dynamodb_table, mock_products_table, mock_stock_shards_table
+):
+    """เทสสินค้าแบบ shard ที่ราคาเปลี่ยนระหว่างสั่ง -> 409 และไม่ตัด Stock"""
+    from services.order_service.app import main
+
+    client, _ = test_client
+    seed_sharded_product(
+        mock_products_table, mock_stock_shards_table, "PROD-HOT", 5.00, [3, 3]
+    )
+    original = main.fetch_current_products
+
+    async def stale_prices(products_table, product_ids):
+        products = await original(products_table, product_ids)
+        # ระหว่างอ่านราคากับเขียน Order: แก้ราคา (Product Service เขียน shard ด้วย Version ใหม่)
+        mock_products_table.update_item(
+            Key={"ProductID": "PROD-HOT"},
+            UpdateExpression="SET Price = :p, Version = :v",
+            ExpressionAttributeValues={":p": Decimal("6.00"), ":v": 2},
+        )
+        for shard in range(2):
+            mock_stock_shards_table.update_item(
+                Key={"ProductID": "PROD-HOT", "Shard": shard},
+                UpdateExpression="SET ProductVersion = :v",
+                ExpressionAttributeValues={":v": 2},
+            )
+        return products
+
+    main.fetch_current_products = stale_prices
+    try:
+        response = client.post(
+            "/orders", json={"Items": [{"ProductID": "PROD-HOT", "Quantity": 1}]}
+        )
+    finally:
+        main.fetch_current_products = original
+
+    assert response.status_code == 409
+    assert "PROD-HOT" in response.json()["detail"]
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [3, 3]
+    assert mock_dynamodb_table.scan()["Count"] == 0
+
+
+def seed_order(orders_table, user_id, order_id, created_at="2024-01-01T00:00:00"):
+    """Helper: ใส่ Order ลง OrdersTable จำลองตรงๆ"""
+    orders_table.put_item(
+        Item={
+            "UserID": user_id,
+            "OrderID": order_id,
+            "Status": "PENDING",
+            "CreatedAt": created_at,
+            "Items": [
+                {"ProductID": "PROD-1", "Quantity": 1, "PricePerUnit": Decimal("1")}
+            ],
+            "TotalAmount": Decimal("1"),
+        }
+    )
+
+
+def test_new_ulid_is_time_sortable():
+    """เทส ULID: 26 ตัว และเรียงตามเวลาที่สร้าง"""
+    from services.order_service.app.main import new_ulid
+
+    ids = [new_ulid(timestamp_ms) for timestamp_ms in (1, 1_000, 1_700_000_000_000)]
+    assert all(len(i) == 26 for i in ids)
+    assert ids == sorted(ids)
+
+
+def test_list_orders_newest_first_with_legacy_rows(test_client, mock_dynamodb_table):
+    """เทส GET /orders: ใหม่ -> เก่า ทีละหน้า และยังอ่าน Order แบบเก่า (uuid) ได้"""
+    from services.order_service.app.main import new_ulid
+
+    client, MOCK_USER_ID = test_client
+
+    new_ids = [f"ORD-{new_ulid(1_700_000_000_000 + i)}" for i in range(5)]
+    legacy_ids = ["ORDER-0b6d1c1e-legacy", "ORDER-f4a2c9d0-legacy"]
+    for order_id in new_ids + legacy_ids:
+        seed_order(mock_dynamodb_table, MOCK_USER_ID, order_id)
+    seed_order(mock_dynamodb_table, "someone-else", f"ORD-{new_ulid()}")
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/orders", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 3
+        seen.extend(order["OrderID"] for order in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Order ใหม่ต้องมาก่อน เรียงจากใหม่สุด แล้วตามด้วย Order แบบเก่า
+    assert seen[:5] == list(reversed(new_ids))
+    assert sorted(seen[5:]) == sorted(legacy_ids)
+    assert pages == 3
+
+
+def test_list_orders_invalid_cursor(test_client):
+    """เทส cursor ที่ไม่ถูกต้อง ต้องได้ 400"""
+    client, _ = test_client
+    response = client.get("/orders", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+def test_list_orders_summary_view(test_client, mock_dynamodb_table):
+    """เทส view=summary: ต้องคืนแค่ข้อมูลย่อ (ไม่มี Items)"""
+    client, MOCK_USER_ID = test_client
+    seed_order(mock_dynamodb_table, MOCK_USER_ID, "ORD-01AAAAAAAAAAAAAAAAAAAAAAAA")
+
+    response = client.get("/orders", params={"view": "summary"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "OrderID": "ORD-01AAAAAAAAAAAAAAAAAAAAAAAA",
+            "Status": "PENDING",
+            "CreatedAt": "2024-01-01T00:00:00",
+            "TotalAmount": 1.0,
+        }
+    ]
+
+    # แบบเต็ม (ค่าเริ่มต้น) ต้องยังมี Items อยู่
+    full = client.get("/orders").json()
+    assert full[0]["Items"][0]["ProductID"] == "PROD-1"
+
+
+def test_list_orders_fast_responses(test_client, mock_dynamodb_table, monkeypatch):
+    """FAST_RESPONSES: ทั้งแบบเต็มและแบบย่อ ต้องได้ JSON เหมือนทางปกติ"""
+    from services.order_service.app import main
+
+    client, MOCK_USER_ID = test_client
+    for i in range(3):
+        seed_order(
+            mock_dynamodb_table, MOCK_USER_ID, f"ORD-01AAAAAAAAAAAAAAAAAAAAAAA{i}"
+        )
+
+    requests = [{"limit": 2}, {"limit": 2, "view": "summary"}]
+    normal = [client.get("/orders", params=params) for params in requests]
+    monkeypatch.setattr(main, "FAST_RESPONSES", True)
+    fast = [client.get("/orders", params=params) for params in requests]
+
+    for before, after in zip(normal, fast):
+        assert after.status_code == 200
+        assert after.content == before.content
+        assert after.headers["X-Next-Cursor"] == before.headers["X-Next-Cursor"]
+
+
+def test_get_single_order(test_client, mock_dynamodb_table):
+    """เทส GET /orders/{order_id}: ได้เฉพาะ Order ของตัวเอง"""
+    client, MOCK_USER_ID = test_client
+    seed_order(mock_dynamodb_table, MOCK_USER_ID, "ORD-01MINE00000000000000000000")
+    seed_order(mock_dynamodb_table, "someone-else", "ORD-01THEIRS0000000000000000")
+
+    response = client.get("/orders/ORD-01MINE00000000000000000000")
+    assert response.status_code == 200
+    assert response.json()["Items"][0]["Quantity"] == 1
+
+    # Order ของคนอื่น / ไม่มีอยู่จริง / ไม่ใช่ Order -> 404
+    for order_id in ("ORD-01THEIRS0000000000000000", "ORD-NOPE", "STATS"):
+        assert client.get(f"/orders/{order_id}").status_code == 404
+
+
+def test_order_stats_updated_with_each_order(
+    test_client, mock_dynamodb_table, mock_products_table
+):
+    """เทส GET /orders/stats: สถิติถูกอัปเดตใน Transaction เดียวกับการสร้าง Order"""
+    client, MOCK_USER_ID = test_client
+    seed_product(mock_products_table, "PROD-1", 10.50, 10)
+
+    # ยังไม่เคยสั่ง -> ค่าเริ่มต้น
+    assert client.get("/orders/stats").json() == {
+        "OrderCount": 0,
+        "TotalSpent": 0,
+        "FirstOrderAt": None,
+        "LastOrderAt": None,
+        "LastOrderID": None,
+        "StatusCounts": {},
+    }
+
+    first = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-1", "Quantity": 2}]}
+    )
+    second = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-1", "Quantity": 1}]}
+    )
+    # Stock ไม่พอ -> ไม่ถูกนับ
+    failed = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-1", "Quantity": 99}]}
+    )
+    assert failed.status_code == 409
+
+    stats = client.get("/orders/stats").json()
+    assert stats["OrderCount"] == 2
+    assert stats["TotalSpent"] == 31.50
+    assert stats["FirstOrderAt"] == first.json()["CreatedAt"]
+    assert stats["LastOrderAt"] == second.json()["CreatedAt"]
+    assert stats["LastOrderID"] == second.json()["OrderID"]
+    assert stats["StatusCounts"] == {"PENDING": 2}
+
+    # Item สถิติไม่โผล่ในรายการ Order
+    assert len(client.get("/orders").json()) == 2
+
+
+def test_order_stats_status_change(
+    test_client, mock_dynamodb_table, mock_products_table
+):
+    """เทส stats_update_for_status_change: ย้ายจำนวนระหว่าง Status + หักยอดเมื่อยกเลิก"""
+    from services.order_service.app.main import stats_update_for_status_change
+
+    client, MOCK_USER_ID = test_client
+    seed_product(mock_products_table, "PROD-1", 10.50, 10)
+    order = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-1", "Quantity": 2}]}
+    ).json()
+    order["TotalAmount"] = Decimal("21.00")
+
+    client_ddb = mock_dynamodb_table.client
+    client_ddb.transact_write_items(
+        TransactItems=[stats_update_for_status_change("TestOrders", order, "CANCELLED")]
+    )
+    stats = client.get("/orders/stats").json()
+    assert stats["OrderCount"] == 1
+    assert stats["TotalSpent"] == 0
+    assert stats["StatusCounts"] == {"CANCELLED": 1}
+
+    # กลับจาก CANCELLED -> คืนยอดซื้อ
+    order["Status"] = "CANCELLED"
+    client_ddb.transact_write_items(
+        TransactItems=[stats_update_for_status_change("TestOrders", order, "PAID")]
+    )
+    stats = client.get("/orders/stats").json()
+    assert stats["TotalSpent"] == 21.00
+    assert stats["StatusCounts"] == {"PAID": 1}
+
+
+def test_create_order_idempotency_key_replays(test_client, mock_products_table):
+    """เทส Idempotency-Key: ส่งซ้ำด้วย key เดิม -> ได้ Order เดิม ไม่ตัด Stock ซ้ำ"""
+    client, MOCK_USER_ID = test_client
+    seed_product(mock_products_table, "PROD-1", 10.50, 5)
+    order_data = {"Items": [{"ProductID": "PROD-1", "Quantity": 2}]}
+    headers = {"Idempotency-Key": "checkout-1"}
+
+    first = client.post("/orders", json=order_data, headers=headers)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = client.post("/orders", json=order_data, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+    # เขียนครั้งเดียวจริง: Stock ลดครั้งเดียว / มี Order เดียว / สถิตินับครั้งเดียว
+    assert mock_products_table.get_item(Key={"ProductID": "PROD-1"})["Item"][
+        "Stock"
+    ] == Decimal(3)
+    assert len(client.get("/orders").json()) == 1
+    assert client.get("/orders/stats").json()["OrderCount"] == 1
+
+    # key เดิมแต่คนละคำสั่งซื้อ -> 422 / key ใหม่ -> Order ใหม่
+    other = {"Items": [{"ProductID": "PROD-1", "Quantity": 1}]}
+    assert client.post("/orders", json=other, headers=headers).status_code == 422
+    fresh = client.post(
+        "/orders", json=other, headers={"Idempotency-Key": "checkout-2"}
+    )
+    assert fresh.status_code == 201
+    assert fresh.json()["OrderID"] != first.json()["OrderID"]
+
+
+def test_create_order_concurrent_duplicate_collapsed(
+    test_client, mock_products_table, monkeypatch
+):
+    """
+    เทสส่งซ้ำพร้อมกัน: request ที่ 2 เช็คก่อน request แรกเขียนเสร็จ (ยังไม่เจอ Record)
+    -> Transaction ของมันไม่ผ่าน แล้วตอบ Order ของ request แรกแทน
+    """
+    from services.order_service.app import main
+
+    client, MOCK_USER_ID = test_client
+    seed_product(mock_products_table, "PROD-1", 10.50, 5)
+    order_data = {"Items": [{"ProductID": "PROD-1", "Quantity": 2}]}
+    headers = {"Idempotency-Key": "checkout-1"}
+    first = client.post("/orders", json=order_data, headers=headers).json()
+
+    real_find = main.find_idempotent_response
+    lookups = []
+
+    async def late_find(*args):
+        lookups.append(args)
+        if len(lookups) == 1:
+            return None  # เหมือนเช็คก่อน request แรก commit
+        return await real_find(*args)
+
+    monkeypatch.setattr(main, "find_idempotent_response", late_find)
+    duplicate = client.post("/orders", json=order_data, headers=headers)
+
+    assert len(lookups) == 2
+    assert duplicate.status_code == 201
+    assert duplicate.headers["Idempotent-Replayed"] == "true"
+    assert duplicate.json()["OrderID"] == first["OrderID"]
+    assert mock_products_table.get_item(Key={"ProductID": "PROD-1"})["Item"][
+        "Stock"
+    ] == Decimal(3)
+
+
+def test_order_status_lifecycle_and_queue(
+    test_client, mock_dynamodb_table, mock_products_table
+):
+    """เทสเปลี่ยน Status ตาม State Machine + คิวงานบน Sparse GSI + สถิติของ User"""
+    from services.order_service.app.main import app, get_fulfillment_worker_id
+
+    client, MOCK_USER_ID = test_client
+    app.dependency_overrides[get_fulfillment_worker_id] = lambda: "worker-1"
+    seed_product(mock_products_table, "PROD-1", 10.00, 10)
+    first, second = [
+        client.post(
+            "/orders", json={"Items": [{"ProductID": "PROD-1", "Quantity": 1}]}
+        ).json()
+        for _ in range(2)
+    ]
+
+    def queue(status):
+        response = client.get("/orders/queue", params={"status": status})
+        assert response.status_code == 200
+        return [order["OrderID"] for order in response.json()]
+
+    # งานค้างนานสุดก่อน
+    assert queue("PENDING") == [first["OrderID"], second["OrderID"]]
+
+    def set_status(order_id, status):
+        return client.put(
+            f"/orders/queue/{MOCK_USER_ID}/{order_id}", json={"Status": status}
+        )
+
+    response = set_status(first["OrderID"], "PAID")
+    assert response.status_code == 200
+    assert response.json()["Status"] == "PAID"
+    assert queue("PENDING") == [second["OrderID"]]
+    assert queue("PAID") == [first["OrderID"]]
+
+    # ข้ามขั้น -> 409 และไม่มีอะไรเปลี่ยน
+    response = set_status(first["OrderID"], "DELIVERED")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Cannot change status from PAID to DELIVERED"
+
+    assert set_status(first["OrderID"], "SHIPPED").status_code == 200
+    assert set_status(first["OrderID"], "DELIVERED").status_code == 200
+    # จบแล้ว -> ออกจากคิว (ไม่มี OpenStatus)
+    assert queue("PAID") == [] and queue("SHIPPED") == []
+    item = mock_dynamodb_table.get_item(
+        Key={"UserID": MOCK_USER_ID, "OrderID": first["OrderID"]}
+    )["Item"]
+    assert "OpenStatus" not in item
+    assert [entry["Status"] for entry in item["StatusHistory"]] == [
+        "PAID",
+        "SHIPPED",
+        "DELIVERED",
+    ]
+
+    # เจ้าของยกเลิกเองได้ตอนยังไม่จัดส่ง / ยกเลิกซ้ำ -> 409
+    response = client.post(f"/orders/{second['OrderID']}/cancel")
+    assert response.status_code == 200
+    assert response.json()["Status"] == "CANCELLED"
+    assert queue("PENDING") == []
+    assert client.post(f"/orders/{second['OrderID']}/cancel").status_code == 409
+    assert client.post(f"/orders/{first['OrderID']}/cancel").status_code == 409
+    assert client.post("/orders/ORD-NOPE/cancel").status_code == 404
+
+    stats = client.get("/orders/stats").json()
+    assert stats["OrderCount"] == 2
+    assert stats["TotalSpent"] == 10.00
+    assert stats["StatusCounts"] == {"CANCELLED": 1, "DELIVERED": 1}
+
+
+def test_cancel_order_restocks_in_same_transaction(
+    test_client,
+    mock_dynamodb_table,
+    mock_products_table,
+    mock_stock_shards_table,
+    monkeypatch,
+):
+    """ยกเลิก Order -> คืน Stock ทั้งสินค้าปกติและสินค้าที่แบ่ง shard / ยกเลิกซ้ำไม่คืนซ้ำ"""
+    client, MOCK_USER_ID = test_client
+    seed_product(mock_products_table, "PROD-1", 10.00, 5)
+    seed_sharded_product(
+        mock_products_table, mock_stock_shards_table, "PROD-HOT", 9.99, [2, 2]
+    )
+    monkeypatch.setattr("services.order_service.app.main.random_shard", lambda n: 1)
+    order = client.post(
+        "/orders",
+        json={
+            "Items": [
+                {"ProductID": "PROD-1", "Quantity": 3},
+                {"ProductID": "PROD-HOT", "Quantity": 2},
+            ]
+        },
+    ).json()
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [2, 0]
+
+    def product_stock():
+        item = mock_products_table.get_item(Key={"ProductID": "PROD-1"})["Item"]
+        return item["Stock"], item["Version"]
+
+    stock, version = product_stock()
+    assert stock == 2
+
+    assert client.post(f"/orders/{order['OrderID']}/cancel").status_code == 200
+    # Stock คืนที่ Item ของสินค้า (+1 Version) / สินค้าแบบ shard คืนเข้า shard
+    assert product_stock() == (5, version + 1)
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [2, 2]
+
+    assert client.post(f"/orders/{order['OrderID']}/cancel").status_code == 409
+    assert product_stock() == (5, version + 1)
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [2, 2]
+
+
+def test_cancel_order_restock_conflict_retries(
+    test_client, mock_products_table, mock_stock_shards_table, monkeypatch
+):
+    """สินค้าถูกแบ่ง shard หลังอ่าน -> ไม่ใช่ "Status changed" แต่อ่านใหม่แล้วคืน Stock ได้ / เกิน 100 action -> 409"""
+    from services.order_service.app import main
+
+    client, _ = test_client
+    seed_sharded_product(
+        mock_products_table, mock_stock_shards_table, "PROD-HOT", 9.99, [2, 2]
+    )
+    monkeypatch.setattr(main, "random_shard", lambda n: 0)
+    order = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-HOT", "Quantity": 2}]}
+    ).json()
+
+    # รอบแรกเห็นสินค้าแบบยังไม่แบ่ง shard (อ่านก่อน reshard) -> เงื่อนไขคืน Stock ไม่ผ่าน
+    fetch = main.fetch_current_products
+    calls = []
+
+    async def stale_then_fresh(products_table, product_ids):
+        products = await fetch(products_table, product_ids)
+        calls.append(product_ids)
+        if len(calls) == 1:
+            return {
+                pid: {k: v for k, v in p.items() if k != "StockShards"}
+                for pid, p in products.items()
+            }
+        return products
+
+    monkeypatch.setattr(main, "fetch_current_products", stale_then_fresh)
+    response = client.post(f"/orders/{order['OrderID']}/cancel")
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert shard_stock(mock_stock_shards_table, "PROD-HOT") == [2, 2]
+
+    # อ่านเจอแต่ข้อมูลเก่าตลอด -> 409 ที่บอกว่าคืน Stock ไม่ได้ (Status ยังไม่เปลี่ยน)
+    order = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-HOT", "Quantity": 1}]}
+    ).json()
+
+    async def always_stale(products_table, product_ids):
+        products = await fetch(products_table, product_ids)
+        return {
+            pid: {k: v for k, v in p.items() if k != "StockShards"}
+            for pid, p in products.items()
+        }
+
+    monkeypatch.setattr(main, "fetch_current_products", always_stale)
+    response = client.post(f"/orders/{order['OrderID']}/cancel")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Could not return stock, please retry: PROD-HOT"
+    assert client.get(f"/orders/{order['OrderID']}").json()["Status"] == "PENDING"
+
+    # Action เกินขีดจำกัดของ Transaction -> 409 (ไม่ใช่ ValidationException / 500)
+    monkeypatch.setattr(main, "fetch_current_products", fetch)
+    monkeypatch.setattr(main, "MAX_TRANSACT_ITEMS", 2)
+    response = client.post(f"/orders/{order['OrderID']}/cancel")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Order has too many items to change at once"
+
+
+def test_cancel_legacy_order_without_stats(
+    test_client, mock_dynamodb_table, mock_products_table
+):
+    """Order เก่าที่ไม่เคยถูกนับในสถิติ -> ยกเลิกได้ และตัวนับ/ยอดซื้อไม่ติดลบ"""
+    client, MOCK_USER_ID = test_client
+    seed_product(mock_products_table, "PROD-1", 1.00, 10)
+    seed_order(mock_dynamodb_table, MOCK_USER_ID, "ORDER-legacy-1")
+
+    response = client.post("/orders/ORDER-legacy-1/cancel")
+    assert response.status_code == 200
+    assert response.json()["Status"] == "CANCELLED"
+
+    stats_item = mock_dynamodb_table.get_item(
+        Key={"UserID": MOCK_USER_ID, "OrderID": "STATS"}
+    ).get("Item")
+    assert stats_item is None
+    assert client.get("/orders/stats").json()["StatusCounts"] == {}
+
+    # มี Order ใหม่ที่นับแล้ว -> ยกเลิก Order นั้นยังย้ายตัวนับตามปกติ
+    order = client.post(
+        "/orders", json={"Items": [{"ProductID": "PROD-1", "Quantity": 2}]}
+    ).json()
+    assert client.post(f"/orders/{order['OrderID']}/cancel").status_code == 200
+    stats = client.get("/orders/stats").json()
+    assert stats["TotalSpent"] == 0
+    assert stats["StatusCounts"] == {"CANCELLED": 1}
+
+
+def test_order_queue_pagination_and_foreign_cursor(test_client, mock_products_table):
+    """เทสคิวงานทีละหน้า: cursor ของคิวใช้ต่อได้ / cursor จาก /orders หรือคนละ Status -> 400"""
+    from services.order_service.app.main import app, get_fulfillment_worker_id
+
+    client, _ = test_client
+    app.dependency_overrides[get_fulfillment_worker_id] = lambda: "worker-1"
+    seed_product(mock_products_table, "PROD-1", 10.00, 10)
+    order_ids = [
+        client.post(
+            "/orders", json={"Items": [{"ProductID": "PROD-1", "Quantity": 1}]}
+        ).json()["OrderID"]
+        for _ in range(3)
+    ]
+
+    first = client.get("/orders/queue", params={"limit": 2})
+    queue_cursor = first.headers["X-Next-Cursor"]
+    second = client.get("/orders/queue", params={"limit": 2, "cursor": queue_cursor})
+    assert second.status_code == 200
+    assert [o["OrderID"] for o in first.json() + second.json()] == order_ids
+
+    # cursor ของประวัติ Order (คนละ Index) -> 400 ไม่ใช่ 500
+    orders_cursor = client.get("/orders", params={"limit": 1}).headers["X-Next-Cursor"]
+    for cursor in (orders_cursor, "not-a-cursor"):
+        response = client.get("/orders/queue", params={"cursor": cursor})
+        assert response.status_code == 400
+    # cursor ของคิว PENDING ใช้กับคิว PAID ไม่ได้ / ใช้กับ /orders ไม่ได้
+    response = client.get(
+        "/orders/queue", params={"status": "PAID", "cursor": queue_cursor}
+    )
+    assert response.status_code == 400
+    assert client.get("/orders", params={"cursor": queue_cursor}).status_code == 400
+
+
+def test_order_queue_requires_fulfillment_group(test_client):
+    """เทสคิวงาน: ต้องอยู่ใน Cognito Group ของ Worker"""
+    from services.order_service.app.main import token_groups
+
+    client, _ = test_client
+    # ไม่มี claims (ไม่ได้ผ่าน Authorizer) -> 401
+    assert client.get("/orders/queue").status_code == 401
+
+    assert token_groups({"cognito:groups": "[fulfillment admin]"}) == [
+        "fulfillment",
+        "admin",
+    ]
+    assert token_groups({"cognito:groups": ["fulfillment"]}) == ["fulfillment"]
+    assert token_groups({}) == []
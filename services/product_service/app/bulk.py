@@ -0,0 +1,335 @@
+"""
+Bulk import / export ของสินค้า (ใช้ได้ทั้งผ่าน API และ CLI)
+
+ตัวอย่าง CLI (รันจากโฟลเดอร์ services/product_service):
+    python -m app.bulk import products.csv --concurrency 8
+    python -m app.bulk export --format ndjson --output products.ndjson
+"""
+
+import argparse
+import codecs
+import contextlib
+import csv
+import json
+import sys
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ecom_shared.dynamo import build_update
+from ecom_shared.errors import ConditionalCheckFailed, TransactionCanceled
+from ecom_shared.inventory import SHARD_COUNT_ATTRIBUTE
+from pydantic import ValidationError
+
+from .main import (
+    ProductInput,
+    ProductResponse,
+    attach_sharded_stock_sync,
+    get_iso_timestamp,
+    iter_pages,
+)
+
+SUPPORTED_FORMATS = ("ndjson", "csv")
+
+# ลำดับคอลัมน์ของไฟล์ CSV ตอน export
+CSV_FIELDS = list(ProductResponse.model_fields)
+
+# จำนวนแถวต่อ 1 งานที่ส่งให้ worker (worker จะเขียนผ่าน batch_writer ทีละ 25)
+IMPORT_CHUNK_SIZE = 500
+DEFAULT_CONCURRENCY = 4
+# เก็บรายละเอียด error ไม่เกินนี้ (กัน report ใหญ่เกินไปถ้าไฟล์ผิดทั้งไฟล์)
+MAX_REPORTED_ERRORS = 1000
+
+
+def iter_lines(chunks, encoding: str = "utf-8-sig"):
+    """
+    byte ทีละก้อน (เช่น body ของ request แบบ streaming) -> ข้อความทีละบรรทัด
+    (เก็บ "\n" ไว้เหมือนไฟล์ที่เปิดด้วย newline="" -> ใช้กับ csv ได้)
+    ถอดรหัสแบบ incremental: ตัวอักษรหลาย byte ที่ขาดกลางก้อนไม่เสีย
+    และใช้ memory ไม่เกินก้อนละ 1 บรรทัด (ไม่ต้องอ่านทั้งไฟล์ก่อน)
+    byte ไม่ใช่ UTF-8 -> UnicodeDecodeError
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    partial = []  # ส่วนของบรรทัดที่ยังไม่จบ
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        start = 0
+        while (end := text.find("\n", start)) != -1:
+            partial.append(text[start : end + 1])
+            yield "".join(partial)
+            partial = []
+            start = end + 1
+        if start < len(text):
+            partial.append(text[start:])
+    partial.append(decoder.decode(b"", final=True))
+    if line := "".join(partial):
+        yield line
+
+
+def iter_records(stream, fmt: str):
+    """
+    อ่านไฟล์ทีละแถวแบบ streaming
+    yield (row_number, record) โดย row_number เริ่มที่ 1 (ไม่นับ header ของ CSV)
+    """
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            # ช่องว่างใน CSV = ไม่ส่ง field นั้น (ให้ใช้ค่า default ของ Model)
+            yield row_number, {k: v for k, v in row.items() if v not in ("", None)}
+    elif fmt == "ndjson":
+        row_number = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                yield row_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, e
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def build_item(record: dict, timestamp: str) -> tuple[dict, bool]:
+    """
+    ตรวจ record ด้วย ProductInput แล้วแปลงเป็น Item ที่พร้อมบันทึก
+    คืน (item, is_new): ไม่มี ProductID มา = สร้างใหม่ / มี = sync/อัปเดตของเดิม (upsert)
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Row must be a JSON object")
+
+    item = ProductInput.model_validate(record).model_dump()
+    item["CreatedAt"] = record.get("CreatedAt") or timestamp
+    item["UpdatedAt"] = timestamp
+    if record.get("ProductID"):
+        # Version ของของเดิมอยู่ใน DB (ADD ตอน upsert) -> ไม่ใช้ Version จากไฟล์
+        item["ProductID"] = record["ProductID"]
+        return item, False
+    item["ProductID"] = f"PROD-{uuid.uuid4()}"
+    item["Version"] = 1
+    return item, True
+
+
+def upsert_item(table, shards_table, item: dict):
+    """
+    เขียนสินค้าที่ระบุ ProductID มา (อาจมีอยู่แล้ว) ด้วย update_item
+    - Version +1 ต่อจากของเดิมแบบ atomic (ETag เดินหน้าเสมอ / If-Match เดิมใช้ไม่ได้)
+    - CreatedAt เดิมไม่ถูกทับ / Attribute อื่นที่ไม่ได้อยู่ในไฟล์ (เช่น StockShards) คงไว้
+    - สินค้าที่แบ่ง shard: Stock ในไฟล์ไปแบ่งลง shard (เหมือน PUT /products/{id})
+    """
+    fields = {
+        key: value
+        for key, value in item.items()
+        if key not in ("ProductID", "CreatedAt")
+    }
+    update_expression, names, values = build_update(fields, {"Version": 1})
+    # "SET ... ADD ..." -> ต่อ CreatedAt เข้าไปในส่วน SET
+    update_expression = update_expression.replace(
+        "SET ", "SET #created = if_not_exists(#created, :created), ", 1
+    )
+    names["#created"] = "CreatedAt"
+    values[":created"] = item["CreatedAt"]
+    names["#shards"] = SHARD_COUNT_ATTRIBUTE
+    try:
+        table.update_item(
+            Key={"ProductID": item["ProductID"]},
+            UpdateExpression=update_expression,
+            # Stock จริงของสินค้าที่แบ่ง shard อยู่ใน shard -> ห้ามเขียนลง Item ตรงๆ
+            ConditionExpression="attribute_not_exists(#shards)",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+    except ConditionalCheckFailed as e:
+        from . import inventory
+
+        inventory.update_with_total(table, shards_table, e.item, fields)
+
+
+def _write_chunk(table, shards_table, chunk: list[tuple[int, dict, bool]]):
+    """
+    (รันใน worker thread) เขียน 1 chunk
+    สินค้าใหม่ -> batch_writer (ทีละ 25) / ProductID ที่ส่งมา -> upsert ทีละตัว
+    คืน (จำนวนที่เขียนได้, [(row_number, error)] ของแถวที่ upsert ไม่ผ่าน)
+    """
+    written, errors = 0, []
+    # overwrite_by_pkeys: ถ้า ProductID ซ้ำใน buffer เดียวกัน ให้เอาตัวหลังสุด
+    with table.batch_writer(overwrite_by_pkeys=["ProductID"]) as batch:
+        for row_number, item, is_new in chunk:
+            if is_new:
+                batch.put_item(Item=item)
+                written += 1
+                continue
+            try:
+                upsert_item(table, shards_table, item)
+                written += 1
+            except TransactionCanceled:
+                # มีคนแก้สินค้าที่แบ่ง shard แทรกระหว่างนั้น
+                errors.append((row_number, "Product changed while importing"))
+    return written, errors
+
+
+def import_products(
+    table,
+    shards_table,
+    records,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> dict:
+    """
+    นำเข้าสินค้าจาก iterator ของ (row_number, record)
+    - ตรวจทุกแถวด้วย ProductInput (แถวที่ผิดจะถูกรายงาน ไม่หยุดทั้งงาน)
+    - เขียนผ่าน batch_writer โดยมี worker พร้อมกันไม่เกิน `concurrency`
+      และมี chunk ค้างใน memory ไม่เกิน `concurrency` chunk
+    """
+    timestamp = get_iso_timestamp()
+    report = {"Total": 0, "Imported": 0, "Failed": 0, "Errors": []}
+
+    def record_error(row_number, errors):
+        report["Failed"] += 1
+        if len(report["Errors"]) < MAX_REPORTED_ERRORS:
+            report["Errors"].append({"Row": row_number, "Errors": errors})
+
+    def collect(done):
+        for future in done:
+            chunk = in_flight.pop(future)
+            try:
+                written, errors = future.result()
+                report["Imported"] += written
+                for row_number, error in errors:
+                    record_error(row_number, [error])
+            except Exception as e:
+                print(f"!!! UNEXPECTED ERROR (import_products): {repr(e)}")
+                for row_number, *_ in chunk:
+                    record_error(row_number, [f"Write failed: {e}"])
+
+    in_flight = {}
+    chunk = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for row_number, record in records:
+            report["Total"] += 1
+            try:
+                if isinstance(record, Exception):
+                    raise ValueError(f"Invalid JSON: {record}")
+                chunk.append((row_number, *build_item(record, timestamp)))
+            except ValidationError as e:
+                record_error(
+                    row_number,
+                    [
+                        f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                        for err in e.errors()
+                    ],
+                )
+                continue
+            except ValueError as e:
+                record_error(row_number, [str(e)])
+                continue
+
+            if len(chunk) >= chunk_size:
+                # worker เต็ม -> รอให้เสร็จอย่างน้อย 1 ตัวก่อน (bounded)
+                if len(in_flight) >= concurrency:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight[executor.submit(_write_chunk, table, shards_table, chunk)] = (
+                    chunk
+                )
+                chunk = []
+
+        if chunk:
+            in_flight[executor.submit(_write_chunk, table, shards_table, chunk)] = chunk
+        done, _ = wait(in_flight)
+        collect(done)
+
+    report["Errors"].sort(key=lambda error: error["Row"])
+    return report
+
+
+def export_products(table, shards_table, fmt: str, page_size: int = 500):
+    """
+    ส่งออกสินค้าทั้งหมดแบบ streaming (ทีละหน้า) -> yield ข้อความทีละ chunk
+    ใช้ memory คงที่ ไม่ว่า catalog จะใหญ่แค่ไหน
+    (สินค้าที่แบ่ง shard ใช้ Stock รวมจากทุก shard)
+    """
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    if fmt == "csv":
+        yield ",".join(CSV_FIELDS) + "\r\n"
+
+    for items, _ in iter_pages(table.scan, Limit=page_size):
+        lines = []
+        for item in attach_sharded_stock_sync(items, shards_table):
+            product = ProductResponse.model_validate(item)
+            if fmt == "ndjson":
+                lines.append(product.model_dump_json() + "\n")
+            else:
+                lines.append(_csv_line(product.model_dump()))
+        if lines:
+            yield "".join(lines)
+
+
+class _LineBuffer:
+    """file-like เล็กๆ ให้ csv.writer เขียนลง แล้วเราดึงข้อความออกมา"""
+
+    def __init__(self):
+        self.value = ""
+
+    def write(self, text):
+        self.value = text
+
+
+def _csv_line(row: dict) -> str:
+    buffer = _LineBuffer()
+    csv.writer(buffer).writerow(
+        ["" if row[field] is None else row[field] for field in CSV_FIELDS]
+    )
+    return buffer.value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export products")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="import products from file")
+    import_parser.add_argument("file", help="path to .csv / .ndjson ('-' = stdin)")
+    import_parser.add_argument("--format", choices=SUPPORTED_FORMATS)
+    import_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+
+    export_parser = subparsers.add_parser("export", help="export all products")
+    export_parser.add_argument("--format", choices=SUPPORTED_FORMATS, default="ndjson")
+    export_parser.add_argument(
+        "--output", default="-", help="output path ('-' = stdout)"
+    )
+
+    args = parser.parse_args(argv)
+
+    from .main import stock_shards_table, table
+
+    if args.command == "import":
+        fmt = args.format or ("csv" if args.file.endswith(".csv") else "ndjson")
+        stream = (
+            contextlib.nullcontext(sys.stdin)
+            if args.file == "-"
+            else open(args.file, newline="", encoding="utf-8")
+        )
+        with stream as stream:
+            report = import_products(
+                table.sync,
+                stock_shards_table.sync,
+                iter_records(stream, fmt),
+                concurrency=args.concurrency,
+            )
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return 1 if report["Failed"] else 0
+
+    out = (
+        contextlib.nullcontext(sys.stdout)
+        if args.output == "-"
+        else open(args.output, "w", newline="", encoding="utf-8")
+    )
+    with out as out:
+        for chunk in export_products(table.sync, stock_shards_table.sync, args.format):
+            out.write(chunk)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Catalog Snapshot: สินค้าทั้งหมด จัดกลุ่มตาม Category เป็นไฟล์ gzip JSON ก้อนเดียวใน Object Storage
+
+หน้าแรก (HomePage) โหลดก้อนนี้ก้อนเดียวแทนการเรียก GET /products ทั้ง catalog
+-> ผู้ใช้ที่แค่เข้ามาดูสินค้าไม่ทำให้เกิดการอ่าน Table เลย
+
+    {"Version": 12, "GeneratedAt": "...", "Count": 345,
+     "Categories": {"Apparel": [{ProductResponse}, ...], ...}}   (เรียงตาม Category / Name)
+
+- rebuild: สร้างใหม่จากสินค้าทั้งหมด (ครั้งแรก / หลัง bulk import)
+- patch:   แก้ทีละชิ้นหลัง create/update/delete
+ทั้งสองแบบเขียนแบบมีเงื่อนไข (If-Match / If-None-Match) ถ้ามีคนเขียนแทรก
+ก็อ่านใหม่แล้วลองอีกครั้ง (Version ไม่ซ้ำ / ไม่ถอยหลัง)
+ทุกครั้งที่เขียน Version จะ +1
+
+ความสดของข้อมูล:
+- ข้อมูลสินค้า (Name / Price / Category / ...) ถูก patch หลัง ProductService เขียนทุกครั้ง
+  (background task) แต่แต่ละ container อาจยังเห็นของเดิมได้อีกไม่เกิน
+  CATALOG_CACHE_TTL_SECONDS + max-age ของ Cache-Control
+- Stock / Version ไม่อยู่ใน snapshot (LIVE_FIELDS): OrderService ตัด/คืน Stock
+  (และ +1 Version) ตรงที่ Table โดยไม่ผ่าน ProductService -> ถ้าเก็บไว้ก็จะค้าง
+  Client ที่ต้องการ Stock ให้อ่านสดจาก POST /products/batch-get
+"""
+
+import bisect
+import gzip
+import json
+from datetime import datetime, timezone
+from typing import Callable
+
+from ecom_shared.responses import dumps
+from ecom_shared.storage import PreconditionFailed, StoredObject
+
+SNAPSHOT_KEY = "catalog/snapshot.json.gz"
+MAX_PATCH_ATTEMPTS = 5
+# เปลี่ยนได้โดยไม่ผ่าน ProductService (ดูด้านบน) -> ไม่เก็บใน snapshot
+LIVE_FIELDS = ("Stock", "Version")
+
+
+def _sort_key(product: dict) -> tuple[str, str]:
+    return product["Name"], product["ProductID"]
+
+
+def encode_snapshot(snapshot: dict) -> bytes:
+    return gzip.compress(dumps(snapshot), mtime=0)
+
+
+def decode_snapshot(data: bytes) -> dict:
+    return json.loads(gzip.decompress(data))
+
+
+def build_snapshot(products: list[dict], version: int) -> dict:
+    """จัดกลุ่มสินค้า (รูปแบบ Response แล้ว) ตาม Category"""
+    categories: dict[str, list[dict]] = {}
+    for product in products:
+        categories.setdefault(product["Category"], []).append(product)
+    for category_products in categories.values():
+        category_products.sort(key=_sort_key)
+    return {
+        "Version": version,
+        "GeneratedAt": datetime.now(timezone.utc).isoformat(),
+        "Count": len(products),
+        "Categories": dict(sorted(categories.items())),
+    }
+
+
+def patch_snapshot(
+    snapshot: dict, product: dict | None = None, product_id: str | None = None
+) -> dict:
+    """
+    แก้ snapshot 1 ชิ้น: product = เพิ่ม/แทนที่, product_id (อย่างเดียว) = ลบ
+    (ลบของเดิมออกจากทุก Category ก่อน เผื่อสินค้าเปลี่ยน Category)
+    """
+    product_id = product["ProductID"] if product else product_id
+    categories = {}
+    for category, category_products in snapshot["Categories"].items():
+        kept = [p for p in category_products if p["ProductID"] != product_id]
+        if kept:
+            categories[category] = kept
+
+    if product:
+        category_products = categories.setdefault(product["Category"], [])
+        bisect.insort(category_products, product, key=_sort_key)
+        categories = dict(sorted(categories.items()))
+
+    return {
+        "Version": snapshot["Version"] + 1,
+        "GeneratedAt": datetime.now(timezone.utc).isoformat(),
+        "Count": sum(len(products) for products in categories.values()),
+        "Categories": categories,
+    }
+
+
+class CatalogSnapshots:
+    """
+    อ่าน/เขียน snapshot ใน Object Storage (ทุก method เป็น I/O แบบ blocking)
+    to_public: แปลง Item จาก DynamoDB เป็นรูปแบบ Response (เช่น FastSerializer.to_dict)
+    """
+
+    def __init__(self, store, to_public: Callable[[dict], dict], key=SNAPSHOT_KEY):
+        self.store = store
+        self.to_public = to_public
+        self.key = key
+
+    def get(self) -> StoredObject | None:
+        return self.store.get(self.key)
+
+    def entry(self, item: dict) -> dict:
+        """Item จาก DynamoDB -> ข้อมูลสินค้า 1 ชิ้นใน snapshot (ไม่มี LIVE_FIELDS)"""
+        public = self.to_public(item)
+        return {k: v for k, v in public.items() if k not in LIVE_FIELDS}
+
+    def rebuild(self, items: list[dict]) -> StoredObject:
+        """
+        สร้างใหม่จากสินค้าทั้งหมด (Version ต่อจากของเดิม)
+        ชนกับคนอื่นจนครบจำนวนครั้ง -> ใช้ snapshot ล่าสุดของคนที่เขียนได้แทน
+        """
+        products = [self.entry(item) for item in items]
+        for _ in range(MAX_PATCH_ATTEMPTS):
+            current = self.get()
+            version = decode_snapshot(current.data)["Version"] + 1 if current else 1
+            data = encode_snapshot(build_snapshot(products, version))
+            try:
+                etag = self.store.put(
+                    self.key,
+                    data,
+                    content_type="application/json",
+                    if_match=current.etag if current else None,
+                    # ยังไม่มี -> ต้องยังไม่มีตอนเขียน (อีก container สร้างพร้อมกัน)
+                    if_none_match=current is None,
+                )
+                return StoredObject(data, etag, "application/json")
+            except PreconditionFailed:
+                continue  # มีคนเขียนแทรก -> อ่านใหม่แล้วลองอีกครั้ง
+        current = self.get()
+        if current is None:
+            raise PreconditionFailed(self.key)
+        return current
+
+    def patch(
+        self, product: dict | None = None, product_id: str | None = None
+    ) -> tuple[str, StoredObject] | None:
+        """
+        แก้ทีละชิ้น คืน (ETag ของ snapshot ที่เอามาแก้, snapshot ใหม่ที่เขียนแล้ว)
+        ยังไม่มี snapshot -> None (ไม่ทำอะไร เดี๋ยวตอนอ่านครั้งแรกจะ rebuild เอง)
+        ชนกับคนอื่นจนครบจำนวนครั้ง -> PreconditionFailed
+        """
+        public = self.entry(product) if product else None
+        for _ in range(MAX_PATCH_ATTEMPTS):
+            current = self.get()
+            if current is None:
+                return None
+            snapshot = patch_snapshot(decode_snapshot(current.data), public, product_id)
+            data = encode_snapshot(snapshot)
+            try:
+                etag = self.store.put(
+                    self.key,
+                    data,
+                    content_type="application/json",
+                    if_match=current.etag,
+                )
+                return current.etag, StoredObject(data, etag, "application/json")
+            except PreconditionFailed:
+                continue  # มีคนเขียนแทรก -> อ่านใหม่แล้วแก้ซ้ำ
+        raise PreconditionFailed(self.key)
@@ -0,0 +1,302 @@
+"""
+เปิด/ปิด/เกลี่ย Stock แบบแบ่ง shard ของสินค้า (ดูหลักการใน ecom_shared/inventory.py)
+
+- reshard:   เปลี่ยนจำนวน shard (1 = ปิด -> ย้าย Stock กลับไปอยู่ใน Item ของสินค้า)
+- update_with_total: แก้สินค้า + ตั้ง Stock รวมใหม่ (ตอนแก้สินค้าด้วย PUT /products/{id})
+- rebalance: เกลี่ยให้ทุก shard มี Stock ใกล้เคียงกัน (ทีละสินค้า / ทุกสินค้าตามรอบเวลา)
+
+shard ทุกตัวเก็บ ProductVersion = Version ของสินค้าตอนเขียน shard ชุดนี้
+(Order เช็คกับค่านี้แทนการแตะ Item ของสินค้า) -> reshard / update_with_total เขียนค่าใหม่
+ส่วน rebalance แก้แค่ Stock (ไม่เปลี่ยน ProductVersion)
+
+ทุกการเขียนทำใน TransactWriteItems ครั้งเดียว โดยมีเงื่อนไขว่า Stock ของแต่ละ shard
+ยังเท่ากับตอนที่อ่านมา -> ถ้ามี Order ตัด Stock แทรกระหว่างนั้น Transaction จะไม่ผ่าน
+แล้วอ่านใหม่ลองอีกครั้ง (ผลรวมของ Stock จึงไม่เพี้ยน)
+ทุก method เป็น I/O แบบ blocking (table แบบ sync) -> เรียกผ่าน threadpool
+"""
+
+from ecom_shared.dynamo import build_update
+from ecom_shared.errors import TransactionCanceled
+from ecom_shared.inventory import (
+    SHARD_COUNT_ATTRIBUTE,
+    SHARD_VERSION_ATTRIBUTE,
+    shard_key,
+    shard_levels,
+    split_stock,
+)
+
+from .main import iter_pages
+
+MAX_WRITE_ATTEMPTS = 3
+
+
+def read_levels(shards_table, product_id: str) -> dict[int, int]:
+    """Stock ของทุก shard ของสินค้า -> {Shard: Stock} (ConsistentRead)"""
+    items = []
+    pages = iter_pages(
+        shards_table.query,
+        KeyConditionExpression="ProductID = :pid",
+        ExpressionAttributeValues={":pid": product_id},
+        ConsistentRead=True,
+    )
+    for page, _ in pages:
+        items.extend(page)
+    return shard_levels(items)
+
+
+def summarize(product_id: str, levels: dict[int, int]) -> dict:
+    """รูปแบบ StockShardsResponse (ไม่แบ่ง shard = มี counter เดียว)"""
+    shard_stock = [stock for _, stock in sorted(levels.items())]
+    return {
+        "ProductID": product_id,
+        "Shards": max(len(shard_stock), 1),
+        "Stock": sum(shard_stock),
+        "ShardStock": shard_stock,
+    }
+
+
+def _shard_item(product_id: str, shard: int, stock: int, version: int) -> dict:
+    return {
+        **shard_key(product_id, shard),
+        "Stock": stock,
+        SHARD_VERSION_ATTRIBUTE: version,
+    }
+
+
+def _put_shard(
+    shards_table, product_id: str, shard: int, stock: int, version: int, observed
+):
+    """Put shard 1 ตัว: observed = Stock ที่อ่านมา (None = ต้องยังไม่มี shard นี้)"""
+    put = {
+        "TableName": shards_table.name,
+        "Item": _shard_item(product_id, shard, stock, version),
+    }
+    if observed is None:
+        put["ConditionExpression"] = "attribute_not_exists(ProductID)"
+    else:
+        put["ConditionExpression"] = "Stock = :observed"
+        put["ExpressionAttributeValues"] = {":observed": observed}
+    return {"Put": put}
+
+
+def _set_shard_stock(shards_table, product_id: str, shard: int, stock: int, observed):
+    """แก้ Stock ของ shard ที่มีอยู่ (Attribute อื่น เช่น ProductVersion คงเดิม)"""
+    return {
+        "Update": {
+            "TableName": shards_table.name,
+            "Key": shard_key(product_id, shard),
+            "UpdateExpression": "SET Stock = :stock",
+            "ConditionExpression": "Stock = :observed",
+            "ExpressionAttributeValues": {":stock": stock, ":observed": observed},
+        }
+    }
+
+
+def _delete_shard(shards_table, product_id: str, shard: int, observed: int):
+    return {
+        "Delete": {
+            "TableName": shards_table.name,
+            "Key": shard_key(product_id, shard),
+            "ConditionExpression": "Stock = :observed",
+            "ExpressionAttributeValues": {":observed": observed},
+        }
+    }
+
+
+def reshard(products_table, shards_table, product_id: str, shard_count: int):
+    """
+    เปลี่ยนจำนวน shard ของสินค้า (Stock รวมเท่าเดิม แบ่งใหม่ให้เท่าๆ กัน)
+    shard_count = 1 -> ปิด (Stock กลับไปอยู่ใน Item ของสินค้า แล้วลบ shard ทิ้ง)
+    คืน summary / None = ไม่มีสินค้านี้
+    """
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        response = products_table.get_item(
+            Key={"ProductID": product_id}, ConsistentRead=True
+        )
+        product = response.get("Item")
+        if not product:
+            return None
+
+        names = {"#shards": SHARD_COUNT_ATTRIBUTE}
+        values = {":one": 1}
+        old_count = int(product.get(SHARD_COUNT_ATTRIBUTE, 0))
+        if old_count:
+            levels = read_levels(shards_table, product_id)
+            total = sum(levels.values())
+            condition = "#shards = :old_shards"
+            values[":old_shards"] = old_count
+        else:
+            if shard_count == 1:
+                return summarize(product_id, {0: int(product["Stock"])})
+            levels = {}
+            total = int(product["Stock"])
+            # Order ตัด Stock แทรกมา -> Stock ไม่เท่าเดิม -> Transaction ไม่ผ่าน
+            condition = "attribute_not_exists(#shards) AND Stock = :old_stock"
+            values[":old_stock"] = product["Stock"]
+
+        # Stock ใน Item ของสินค้า = ค่ารวมตอนเปลี่ยน (ตอนอ่านจะรวมจาก shard ใหม่เสมอ)
+        values[":total"] = total
+        if shard_count > 1:
+            update = "SET #shards = :shards, Stock = :total ADD Version :one"
+            values[":shards"] = shard_count
+            new_levels = split_stock(total, shard_count)
+        else:
+            update = "SET Stock = :total REMOVE #shards ADD Version :one"
+            new_levels = []
+
+        transact_items = [
+            {
+                "Update": {
+                    "TableName": products_table.name,
+                    "Key": {"ProductID": product_id},
+                    "UpdateExpression": update,
+                    "ConditionExpression": f"attribute_exists(ProductID) AND {condition}",
+                    "ExpressionAttributeNames": names,
+                    "ExpressionAttributeValues": values,
+                }
+            }
+        ]
+        new_version = int(product.get("Version", 0)) + 1
+        for shard, stock in enumerate(new_levels):
+            transact_items.append(
+                _put_shard(
+                    shards_table,
+                    product_id,
+                    shard,
+                    stock,
+                    new_version,
+                    levels.get(shard),
+                )
+            )
+        for shard, observed in levels.items():
+            if shard >= len(new_levels):
+                transact_items.append(
+                    _delete_shard(shards_table, product_id, shard, observed)
+                )
+
+        try:
+            products_table.client.transact_write_items(TransactItems=transact_items)
+        except TransactionCanceled:
+            if attempt == MAX_WRITE_ATTEMPTS - 1:
+                raise
+            continue  # Stock เปลี่ยนระหว่างทาง -> อ่านใหม่แล้วลองอีกครั้ง
+        return summarize(product_id, dict(enumerate(new_levels)) or {0: total})
+
+
+def update_with_total(
+    products_table, shards_table, product: dict, update_data: dict
+) -> dict:
+    """
+    แก้สินค้าที่แบ่ง shard (product = Item เดิมที่อ่านมา) พร้อมตั้ง Stock รวมใหม่
+    - Item ของสินค้า: แก้ทุก field ยกเว้น Stock (Stock จริงอยู่ใน shard)
+    - Stock ใหม่แบ่งให้ทุก shard เท่าๆ กัน
+    ทั้งหมดใน Transaction เดียว โดยมีเงื่อนไขว่า Version / จำนวน shard ยังเท่าตอนที่อ่านมา
+    (มีคนแก้แทรก -> TransactionCanceled) คืน Item ใหม่ (Stock = ค่ารวมใหม่)
+    """
+    product_id = product["ProductID"]
+    shard_count = int(product[SHARD_COUNT_ATTRIBUTE])
+    fields = {key: value for key, value in update_data.items() if key != "Stock"}
+    update_expression, names, values = build_update(fields, {"Version": 1})
+    names.update({"#ver": "Version", "#shards": SHARD_COUNT_ATTRIBUTE})
+    values[":shards"] = shard_count
+    if "Version" in product:
+        version_check = "#ver = :observed"
+        values[":observed"] = product["Version"]
+    else:
+        version_check = "attribute_not_exists(#ver)"  # Item เก่าก่อนมี Version
+
+    new_version = int(product.get("Version", 0)) + 1
+    levels = dict(enumerate(split_stock(update_data["Stock"], shard_count)))
+    transact_items = [
+        {
+            "Update": {
+                "TableName": products_table.name,
+                "Key": {"ProductID": product_id},
+                "UpdateExpression": update_expression,
+                "ConditionExpression": (
+                    f"attribute_exists(ProductID) AND {version_check}"
+                    " AND #shards = :shards"
+                ),
+                "ExpressionAttributeNames": names,
+                "ExpressionAttributeValues": values,
+            }
+        }
+    ]
+    transact_items.extend(
+        {
+            "Put": {
+                "TableName": shards_table.name,
+                # Version ใหม่ -> Order ที่อ่านราคาเดิมมาจะตัด Stock ไม่ผ่าน
+                "Item": _shard_item(product_id, shard, stock, new_version),
+            }
+        }
+        for shard, stock in levels.items()
+    )
+    products_table.client.transact_write_items(TransactItems=transact_items)
+    return {
+        **product,
+        **fields,
+        "Version": new_version,
+        "Stock": update_data["Stock"],
+    }
+
+
+def needs_rebalance(levels: dict[int, int]) -> bool:
+    """shard ที่มากสุด/น้อยสุดต่างกันเกิน 1 -> ยังเกลี่ยได้อีก"""
+    return len(levels) > 1 and max(levels.values()) - min(levels.values()) > 1
+
+
+def rebalance(shards_table, product_id: str, levels: dict[int, int] | None = None):
+    """
+    เกลี่ย Stock ให้ทุก shard เท่าๆ กัน (เขียนเฉพาะ shard ที่ค่าเปลี่ยน)
+    shard ที่ไม่ได้เขียนถูก Order ตัดแทรกได้ตามปกติ ผลรวมก็ยังถูก
+    คืน True ถ้ามีการย้าย Stock
+    """
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        if levels is None or attempt:
+            levels = read_levels(shards_table, product_id)
+        if not needs_rebalance(levels):
+            return False
+
+        shards = sorted(levels)
+        target = split_stock(sum(levels.values()), len(shards))
+        transact_items = [
+            _set_shard_stock(shards_table, product_id, shard, stock, levels[shard])
+            for shard, stock in zip(shards, target)
+            if stock != levels[shard]
+        ]
+        try:
+            shards_table.client.transact_write_items(TransactItems=transact_items)
+            return True
+        except TransactionCanceled:
+            if attempt == MAX_WRITE_ATTEMPTS - 1:
+                raise
+    return False
+
+
+def rebalance_all(shards_table) -> dict:
+    """
+    (ตามรอบเวลา) เกลี่ยทุกสินค้าที่แบ่ง shard
+    scan เฉพาะ StockShardsTable (มีแค่สินค้าที่เปิด shard ไม่ต้อง scan สินค้าทั้งหมด)
+    """
+    grouped: dict[str, list[dict]] = {}
+    for items, _ in iter_pages(shards_table.scan):
+        for item in items:
+            grouped.setdefault(item["ProductID"], []).append(item)
+
+    rebalanced = failed = 0
+    for product_id, items in grouped.items():
+        try:
+            if rebalance(shards_table, product_id, shard_levels(items)):
+                rebalanced += 1
+        except Exception as e:
+            failed += 1
+            print(f"!!! STOCK REBALANCE FAILED ({product_id}): {repr(e)}")
+    return {"Products": len(grouped), "Rebalanced": rebalanced, "Failed": failed}
+
+
+def delete_shards(shards_table, product_id: str):
+    """ลบทุก shard ของสินค้า (หลังลบสินค้า)"""
+    with shards_table.batch_writer() as batch:
+        for shard in read_levels(shards_table, product_id):
+            batch.delete_item(Key=shard_key(product_id, shard))
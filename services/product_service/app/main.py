@@ -1,19 +1,62 @@
 import os
-import boto3
+import asyncio
+import json
+import base64
+import gzip
+import hashlib
 import uuid
 from decimal import Decimal
-from fastapi import FastAPI, HTTPException, Depends
+import anyio
+from fastapi import (
+    BackgroundTasks,
+    FastAPI,
+    HTTPException,
+    Depends,
+    Header,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from mangum import Mangum
 from datetime import datetime, timezone
-from boto3.dynamodb.conditions import Key
 
-from typing import TYPE_CHECKING
+# DynamoDB แบบเบา (botocore client สร้างตอนใช้ครั้งแรก) จาก Shared Layer
+# endpoint เป็น async -> ใช้ Table แบบ async (ดู ecom_shared/aio.py)
+from ecom_shared.aio import (
+    AsyncDynamoTable as Table,
+    aiter_pages,
+    batch_get_items,
+    lifespan,
+)
+from ecom_shared.auth import protect
+from ecom_shared.cache import MISSING, TTLCache
+from ecom_shared.dynamo import (
+    batch_get_items as batch_get_items_sync,
+    build_update,
+    deserialize,
+    serialize,
+)
+from ecom_shared.errors import ConditionalCheckFailed, TransactionCanceled
+from ecom_shared.inventory import MAX_STOCK_SHARDS, SHARD_COUNT_ATTRIBUTE, shard_key
+from ecom_shared.responses import (
+    FastJSONResponse,
+    FastSerializer,
+    fast_responses_enabled,
+)
+from ecom_shared.storage import get_object_store
+from ecom_shared.web import (
+    build_write_condition,
+    format_etag,
+    instrument,
+    parse_if_match,
+    to_http_exception,
+)
 
-if TYPE_CHECKING:
-    from mypy_boto3_dynamodb.service_resource import Table
-else:
-    Table = object
+from .catalog import CatalogSnapshots, decode_snapshot
+from .search import SearchIndex
 
 # --- Models (โครงสร้างข้อมูล) ---
 # นี่คือ "แบบพิมพ์" ที่ FastAPI ใช้ตรวจสอบข้อมูลขาเข้า
@@ -42,16 +85,92 @@ class ProductResponse(BaseModel):
     ImageUrl: str | None = None
     CreatedAt: str
     UpdatedAt: str
+    Version: int | None = None  # เลข version สำหรับ Optimistic Concurrency (ETag)
+
+
+# จำนวน ProductID สูงสุดต่อ 1 request ของ batch-get
+MAX_BATCH_GET_IDS = 500
+
+
+class BatchGetInput(BaseModel):
+    """รายการ ProductID ที่ต้องการดึงพร้อมกัน"""
+
+    ProductIDs: list[str] = Field(..., min_length=1, max_length=MAX_BATCH_GET_IDS)
+
+
+class BulkImportError(BaseModel):
+    """Error ของแถวที่นำเข้าไม่สำเร็จ"""
+
+    Row: int
+    Errors: list[str]
+
+
+class BulkImportResponse(BaseModel):
+    """สรุปผลการนำเข้าสินค้าแบบ bulk"""
+
+    Total: int
+    Imported: int
+    Failed: int
+    Errors: list[BulkImportError]
+
+
+class ProductSearchHit(BaseModel):
+    """ผลค้นหา 1 ชิ้น (ข้อมูลจาก Search Index ไม่ได้อ่านจาก Table)"""
+
+    ProductID: str
+    Name: str
+    Category: str
+    Price: float | None = None
+    Description: str | None = None
+    Score: float
+
+
+class StockShardsInput(BaseModel):
+    """จำนวน shard ของ Stock (1 = ไม่แบ่ง)"""
+
+    Shards: int = Field(..., ge=1, le=MAX_STOCK_SHARDS)
+
+
+class StockShardsResponse(BaseModel):
+    """Stock แยกตาม shard (ไม่แบ่ง shard = มีตัวเดียว)"""
+
+    ProductID: str
+    Shards: int
+    Stock: int
+    ShardStock: list[int]
+
+
+class BatchGetResponse(BaseModel):
+    """ผลลัพธ์ batch-get: Products เรียงตามลำดับที่ขอ (None = ไม่เจอ)"""
+
+    Products: list[ProductResponse | None]
+    Missing: list[str]
+
+
+# FAST_RESPONSES=true: endpoint แบบ list แปลง Item -> JSON เอง (ไม่ validate ซ้ำ)
+# ดู ecom_shared/responses.py
+FAST_RESPONSES = fast_responses_enabled()
+PRODUCT_SERIALIZER = FastSerializer(ProductResponse)
 
 
 # --- AWS Setup ---
-app = FastAPI(title="ProductService")
+app = FastAPI(title="ProductService", lifespan=lifespan)
+# log เวลา + Capacity ของ DynamoDB ต่อ request (EMF) -> ต้องอยู่ก่อนประกาศ route
+instrument(app, "product_service")
+# AUTH_MODE=jwt (container): ตรวจ token เองทุก Route แทน API Gateway
+protect(app, public_paths=("/products/snapshot",))
 
 # ดึงชื่อ Table มาจาก Environment Variable ที่ SAM ตั้งให้
-TABLE_NAME = os.environ.get("DYNAMO_TABLE_NAME", "EcomPoc-ProductsTable")
-# สร้าง Connection ไปยัง DynamoDB
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(TABLE_NAME)
+# PRODUCTS_TABLE_NAME มาก่อน (ตอนรวมทุก Service ไว้ใน process เดียว DYNAMO_TABLE_NAME ใช้ร่วมกันไม่ได้)
+TABLE_NAME = os.environ.get(
+    "PRODUCTS_TABLE_NAME", os.environ.get("DYNAMO_TABLE_NAME", "EcomPoc-ProductsTable")
+)
+# GSI สำหรับ Query ตาม Category (ดู template.yaml)
+CATEGORY_PRICE_INDEX = "CategoryPriceIndex"  # PK: Category, SK: Price
+CATEGORY_NAME_INDEX = "CategoryNameIndex"  # PK: Category, SK: Name
+# สร้าง Table ไว้ก่อน แต่ Connection (botocore client) จะถูกสร้างตอนใช้งานครั้งแรก
+# (ไม่ใช้ boto3.resource เพราะ import/สร้างช้า -> cold start นาน)
+table = Table(TABLE_NAME)
 
 
 def get_db_table() -> Table:
@@ -59,17 +178,343 @@ def get_db_table() -> Table:
     return table
 
 
+# --- Stock แบบแบ่ง shard (สินค้าขายดี / Flash Sale) ---
+# สินค้าที่มี StockShards: Stock จริงอยู่ใน StockShardsTable (ดู ecom_shared/inventory.py)
+# Stock ที่ตอบกลับ = ผลรวมของทุก shard (อ่านเพิ่ม 1 BatchGetItem ต่อหน้า)
+STOCK_SHARDS_TABLE_NAME = os.environ.get(
+    "STOCK_SHARDS_TABLE_NAME", "EcomPoc-StockShardsTable"
+)
+stock_shards_table = Table(STOCK_SHARDS_TABLE_NAME)
+
+
+def get_stock_shards_table() -> Table:
+    """Dependency function ที่จะส่งต่อ global stock shards table"""
+    return stock_shards_table
+
+
+def _shard_keys(sharded: list[dict]) -> list[dict]:
+    return [
+        shard_key(item["ProductID"], shard)
+        for item in sharded
+        for shard in range(int(item[SHARD_COUNT_ATTRIBUTE]))
+    ]
+
+
+def _apply_shard_totals(sharded: list[dict], shards: list[dict]):
+    totals: dict[str, int] = {}
+    for shard in shards:
+        totals[shard["ProductID"]] = totals.get(shard["ProductID"], 0) + shard["Stock"]
+    for item in sharded:
+        item["Stock"] = totals.get(item["ProductID"], 0)
+
+
+async def attach_sharded_stock(items: list[dict], shards_table: Table) -> list[dict]:
+    """แทน Stock ของสินค้าที่แบ่ง shard ด้วยผลรวมของทุก shard (แก้ items ในที่)"""
+    sharded = [item for item in items if item.get(SHARD_COUNT_ATTRIBUTE)]
+    if not sharded:
+        return items
+
+    shards = await batch_get_items(
+        shards_table, _shard_keys(sharded), ProjectionExpression="ProductID, Stock"
+    )
+    _apply_shard_totals(sharded, shards)
+    return items
+
+
+def attach_sharded_stock_sync(items: list[dict], shards_table) -> list[dict]:
+    """เหมือน attach_sharded_stock แต่ใช้ table แบบ sync (งานใน thread / background)"""
+    sharded = [item for item in items if item.get(SHARD_COUNT_ATTRIBUTE)]
+    if not sharded:
+        return items
+
+    shards = batch_get_items_sync(
+        shards_table, _shard_keys(sharded), ProjectionExpression="ProductID, Stock"
+    )
+    _apply_shard_totals(sharded, shards)
+    return items
+
+
+def remove_stock_shards(shards_table, product_id: str):
+    """(Background task) ลบ shard ของสินค้าที่ถูกลบไปแล้ว (table แบบ sync)"""
+    from . import inventory
+
+    try:
+        inventory.delete_shards(shards_table, product_id)
+    except Exception as e:
+        print(f"!!! STOCK SHARDS CLEANUP FAILED ({product_id}): {repr(e)}")
+
+
+# --- Read Cache ---
+# Cache ของ get_product (อยู่ระดับ module -> ใช้ซ้ำได้ตลอดอายุของ warm Lambda)
+# ตั้ง PRODUCT_CACHE_MAX_ITEMS=0 เพื่อปิด cache
+product_cache = TTLCache(
+    max_items=int(os.environ.get("PRODUCT_CACHE_MAX_ITEMS", "1024")),
+    ttl_seconds=float(os.environ.get("PRODUCT_CACHE_TTL_SECONDS", "30")),
+)
+
+
+def get_product_cache() -> TTLCache:
+    """Dependency function ที่จะส่งต่อ global cache"""
+    return product_cache
+
+
+# --- Catalog Snapshot ---
+# สินค้าทั้งหมดจัดกลุ่มตาม Category (gzip JSON) ใน Object Storage (ดู app/catalog.py)
+# ตั้ง OBJECT_STORE_BUCKET = S3 bucket / ไม่ตั้ง = ไฟล์ในเครื่อง (OBJECT_STORE_DIR)
+catalog = CatalogSnapshots(get_object_store(), PRODUCT_SERIALIZER.to_dict)
+# เก็บ snapshot ที่อ่านมาไว้ใน container สั้นๆ (ไม่ต้องอ่าน Object Storage ทุก request)
+catalog_cache = TTLCache(
+    max_items=1,
+    ttl_seconds=float(os.environ.get("CATALOG_CACHE_TTL_SECONDS", "10")),
+)
+
+
+def get_catalog() -> CatalogSnapshots:
+    """Dependency function ที่จะส่งต่อ global catalog snapshot"""
+    return catalog
+
+
+async def patch_catalog(
+    catalog: CatalogSnapshots,
+    index: SearchIndex,
+    product: dict | None = None,
+    product_id: str | None = None,
+):
+    """
+    (Background task) แก้ snapshot ตามการเขียน 1 ชิ้น
+    index ของ container นี้ upsert/remove ไปแล้ว -> ถ้า index อยู่ที่ snapshot ที่เอามาแก้
+    ก็ขยับ index.source ไปที่ snapshot ใหม่เลย (ไม่ต้อง sync ซ้ำ)
+    """
+    try:
+        patched = await run_in_threadpool(
+            catalog.patch, product=product, product_id=product_id
+        )
+    except Exception as e:
+        print(f"!!! CATALOG SNAPSHOT PATCH FAILED: {repr(e)}")
+        catalog_cache.invalidate(catalog.key)
+        return
+    if patched is None:
+        return
+    base_etag, snapshot = patched
+    catalog_cache.set(catalog.key, snapshot)
+    if index.loaded and index.source == base_etag:
+        index.source = snapshot.etag
+
+
+def rebuild_catalog(catalog: CatalogSnapshots, table):
+    """(Background task) สร้าง snapshot ใหม่ทั้งหมดจาก Table (table แบบ sync)"""
+    try:
+        products = [item for items, _ in iter_pages(table.scan) for item in items]
+        catalog.rebuild(products)
+    except Exception as e:
+        print(f"!!! CATALOG SNAPSHOT REBUILD FAILED: {repr(e)}")
+    finally:
+        catalog_cache.invalidate(catalog.key)
+
+
+async def load_catalog_snapshot(catalog: CatalogSnapshots, table: Table):
+    """
+    Catalog Snapshot ปัจจุบัน (StoredObject) ผ่าน catalog_cache
+    ยังไม่มีใน Object Storage -> scan Table สร้างครั้งแรก
+    """
+    snapshot = catalog_cache.get(catalog.key)
+    if snapshot is MISSING:
+        snapshot = await run_in_threadpool(catalog.get)
+        if snapshot is None:
+            products = []
+            async for items, _ in aiter_pages(table.scan):
+                products.extend(items)
+            snapshot = await run_in_threadpool(catalog.rebuild, products)
+        catalog_cache.set(catalog.key, snapshot)
+    return snapshot
+
+
+# --- Search Index ---
+# Index ค้นหาสินค้า (อยู่ระดับ module เหมือน cache) สร้างจาก Catalog Snapshot
+# (Object Storage ที่ทุก container ใช้ร่วมกัน และถูก patch ทุกครั้งที่เขียนสินค้า)
+# -> container ใหม่ไม่ต้อง scan Table / container อื่นเขียน -> snapshot เปลี่ยน -> sync เฉพาะชิ้นที่เปลี่ยน
+# เช็คว่า snapshot เปลี่ยนไหมไม่เกินทุก CATALOG_CACHE_TTL_SECONDS (ตาม catalog_cache)
+search_index = SearchIndex()
+# ค้นหาพร้อมกันตอน index ยังไม่พร้อม -> โหลดแค่ครั้งเดียว (ที่เหลือรอ)
+# (event loop, lock): asyncio.Lock ผูกกับ loop -> loop เปลี่ยนก็สร้างใหม่
+_search_index_lock: tuple | None = None
+
+
+def get_search_index() -> SearchIndex:
+    """Dependency function ที่จะส่งต่อ global search index"""
+    return search_index
+
+
+def get_search_index_lock() -> asyncio.Lock:
+    global _search_index_lock
+    loop = asyncio.get_running_loop()
+    if _search_index_lock is None or _search_index_lock[0] is not loop:
+        _search_index_lock = (loop, asyncio.Lock())
+    return _search_index_lock[1]
+
+
+async def ensure_search_index(
+    index: SearchIndex, table: Table, catalog: CatalogSnapshots
+):
+    """
+    โหลด index จาก Catalog Snapshot ถ้ายังไม่ได้โหลด
+    snapshot เปลี่ยนไปแล้ว (container อื่นเขียน) -> sync เฉพาะสินค้าที่เปลี่ยน
+    """
+    cached = catalog_cache.get(catalog.key)
+    if index.loaded and cached is not MISSING and cached.etag == index.source:
+        return
+    async with get_search_index_lock():
+        snapshot = await load_catalog_snapshot(catalog, table)
+        if index.loaded and snapshot.etag == index.source:
+            return
+        categories = decode_snapshot(snapshot.data)["Categories"]
+        index.sync(product for products in categories.values() for product in products)
+        index.source = snapshot.etag
+
+
 # --- Helper Function ---
 def get_iso_timestamp():
     """สร้าง timestamp ปัจจุบันในรูปแบบ ISO 8601"""
     return datetime.now(timezone.utc).isoformat()
 
 
+# --- Pagination Helpers ---
+# ขนาดหน้า (page) ของ list_products
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+# Header ที่ใช้ส่ง cursor ของหน้าถัดไปกลับไปให้ Client
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_evaluated_key: dict | None) -> str | None:
+    """
+    แปลง LastEvaluatedKey ของ DynamoDB เป็น cursor แบบ "ทึบ" (opaque)
+    (เก็บเป็น DynamoDB JSON เพื่อให้ Decimal/ชนิดข้อมูลของ Key ไม่เพี้ยน)
+    """
+    if not last_evaluated_key:
+        return None
+    typed_key = {k: serialize(v) for k, v in last_evaluated_key.items()}
+    raw = json.dumps(typed_key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """แปลง cursor กลับเป็น ExclusiveStartKey (ถ้า cursor เสีย ให้ตอบ 400)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        typed_key = json.loads(base64.urlsafe_b64decode(padded))
+        return {k: deserialize(v) for k, v in typed_key.items()}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def iter_pages(operation, start_key: dict | None = None, **kwargs):
+    """
+    (sync สำหรับงานใน thread เช่น bulk export) เดินทีละหน้าของ scan/query โดยใช้ LastEvaluatedKey
+    yield (items, last_evaluated_key) ทีละหน้า (ไม่เก็บทั้ง Table ไว้ใน memory)
+    """
+    while True:
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        response = operation(**kwargs)
+        start_key = response.get("LastEvaluatedKey")
+        yield response.get("Items", []), start_key
+        if not start_key:
+            break
+
+
+# --- HTTP Caching (Conditional GET / Cache-Control) ---
+# Cache-Control ของแต่ละ Route (ปรับผ่าน Environment Variable ได้)
+# ข้อมูลสินค้าเปลี่ยนไม่บ่อย -> ให้ Browser/CDN ใช้ของเดิมซ้ำ แล้วค่อย revalidate เบื้องหลัง
+CACHE_CONTROL = {
+    "get_product": os.environ.get(
+        "CACHE_CONTROL_GET_PRODUCT", "public, max-age=60, stale-while-revalidate=300"
+    ),
+    "list_products": os.environ.get(
+        "CACHE_CONTROL_LIST_PRODUCTS", "public, max-age=30, stale-while-revalidate=120"
+    ),
+    "catalog_snapshot": os.environ.get(
+        "CACHE_CONTROL_CATALOG_SNAPSHOT",
+        "public, max-age=60, stale-while-revalidate=300",
+    ),
+}
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """เช็ค If-None-Match (weak comparison: ไม่สนใจ W/ นำหน้า)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """
+    เช็ค Accept-Encoding ว่ารับ gzip ได้ไหม (อ่าน q-value: q=0 = ปฏิเสธ)
+    เช่น "gzip, br" -> True / "gzip;q=0, br" -> False / "*;q=0.5" -> True
+    """
+    if not accept_encoding:
+        return False
+    qualities = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = entry.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def list_etag(items: list[dict], next_cursor: str | None) -> str:
+    """
+    Weak ETag ของ 1 หน้า: hash จาก (ProductID, Version, UpdatedAt, Stock) ของทุกชิ้น
+    (Stock ของสินค้าที่แบ่ง shard เปลี่ยนโดยที่ Version ไม่เปลี่ยน)
+    """
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(
+            f"{item['ProductID']}|{item.get('Version', 0)}|{item.get('UpdatedAt')}"
+            f"|{item.get('Stock')}\n".encode()
+        )
+    digest.update((next_cursor or "").encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """304 Not Modified (ไม่มี body -> ไม่ต้อง serialize อะไรเลย)"""
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+
 # --- API Endpoints ---
 
 
 @app.post("/products", response_model=ProductResponse, status_code=201)
-def create_product(product_in: ProductInput, table: Table = Depends(get_db_table)):
+async def create_product(
+    product_in: ProductInput,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    table: Table = Depends(get_db_table),
+    search: SearchIndex = Depends(get_search_index),
+    catalog: CatalogSnapshots = Depends(get_catalog),
+):
     """สร้างสินค้าใหม่ (Create)"""
 
     # สร้างข้อมูลที่จะบันทึกลง DB
@@ -78,57 +523,406 @@ def create_product(product_in: ProductInput, table: Table = Depends(get_db_table
     item["ProductID"] = f"PROD-{uuid.uuid4()}"
     item["CreatedAt"] = timestamp
     item["UpdatedAt"] = timestamp
+    item["Version"] = 1
 
     try:
         # บันทึกลง DynamoDB
-        table.put_item(Item=item)
+        await table.put_item(Item=item)
+        search.upsert(item)
+        background_tasks.add_task(patch_catalog, catalog, search, product=item)
+        response.headers["ETag"] = format_etag(item)
         return item
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e, "create_product")
 
 
-@app.get("/products/{product_id}", response_model=ProductResponse)
-def get_product(product_id: str, table: Table = Depends(get_db_table)):
-    """ดึงข้อมูลสินค้าชิ้นเดียว (Read)"""
+@app.post("/products/batch-get", response_model=BatchGetResponse)
+async def batch_get_products(
+    batch_in: BatchGetInput,
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    cache: TTLCache = Depends(get_product_cache),
+):
+    """ดึงสินค้าหลายชิ้นใน request เดียว (คืนตามลำดับที่ขอ พร้อมบอกตัวที่ไม่เจอ)"""
+    found = {}
+    to_fetch = []
+
+    # 1. ดูใน cache ก่อน (และตัด ID ซ้ำ เพราะ BatchGetItem ไม่รับ Key ซ้ำ)
+    for product_id in dict.fromkeys(batch_in.ProductIDs):
+        item = cache.get(product_id)
+        if item is MISSING:
+            to_fetch.append({"ProductID": product_id})
+        else:
+            found[product_id] = item
+
+    # 2. ที่เหลือไปดึงจาก DynamoDB แบบ batch
     try:
-        response = table.get_item(Key={"ProductID": product_id})
-        item = response.get("Item")
+        fetched = await batch_get_items(table, to_fetch)
+        for item in await attach_sharded_stock(fetched, shards_table):
+            found[item["ProductID"]] = item
+            cache.set(item["ProductID"], item)
+    except Exception as e:
+        raise to_http_exception(e, "batch_get_products")
+
+    # 3. เรียงผลลัพธ์ตามลำดับที่ขอ
+    products = [found.get(product_id) for product_id in batch_in.ProductIDs]
+    missing = [
+        product_id
+        for product_id in dict.fromkeys(batch_in.ProductIDs)
+        if product_id not in found
+    ]
+    return {"Products": products, "Missing": missing}
+
+
+def iter_body_from_thread(request: Request):
+    """
+    body ของ request ทีละก้อน แบบ iterator ธรรมดา (ใช้ใน threadpool เท่านั้น)
+    ดึงก้อนถัดไปจาก event loop ทีละครั้ง -> มีแค่ก้อนเดียวใน memory
+    """
+    chunks = request.stream()
+    while (chunk := anyio.from_thread.run(anext, chunks, None)) is not None:
+        if chunk:
+            yield chunk
+
+
+@app.post("/products/import", response_model=BulkImportResponse)
+async def import_products(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    concurrency: int = Query(4, ge=1, le=16),
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    cache: TTLCache = Depends(get_product_cache),
+    catalog: CatalogSnapshots = Depends(get_catalog),
+):
+    """นำเข้าสินค้าจำนวนมาก (body เป็น NDJSON หรือ CSV) พร้อมรายงาน error รายแถว"""
+    from . import bulk  # import เฉพาะตอนใช้ (ไม่เพิ่มเวลา cold start ของ endpoint อื่น)
+
+    # อ่าน body ทีละก้อนระหว่างนำเข้า (ไม่เก็บทั้งไฟล์ไว้ใน memory)
+    lines = bulk.iter_lines(iter_body_from_thread(request))
+    records = bulk.iter_records(lines, format)
+    # งานเขียน DynamoDB เป็น I/O แบบ blocking (batch_writer) -> ย้ายไปทำใน threadpool
+    try:
+        result = await run_in_threadpool(
+            bulk.import_products,
+            table.sync,
+            shards_table.sync,
+            records,
+            concurrency=concurrency,
+        )
+    except UnicodeDecodeError:
+        # แถวก่อนหน้าอาจถูกเขียนไปแล้ว -> ล้าง cache / สร้าง snapshot ใหม่เหมือนนำเข้าสำเร็จ
+        cache.clear()
+        background_tasks.add_task(rebuild_catalog, catalog, table.sync)
+        return FastJSONResponse(
+            {"detail": "Body must be UTF-8 encoded"},
+            status_code=400,
+            background=background_tasks,
+        )
+    # index ตามทันเองตอน rebuild snapshot เสร็จ (sync เฉพาะชิ้นที่เปลี่ยน)
+    # import ทับ ProductID เดิมได้ -> cache ของสินค้าเดิมใช้ไม่ได้แล้ว
+    cache.clear()
+    if result["Imported"]:
+        background_tasks.add_task(rebuild_catalog, catalog, table.sync)
+    return result
+
+
+@app.get("/products/export")
+def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+):
+    """ส่งออกสินค้าทั้งหมดแบบ streaming (NDJSON หรือ CSV)"""
+    from . import bulk
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        bulk.export_products(table.sync, shards_table.sync, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+@app.get("/products/cache/stats")
+def get_cache_stats(cache: TTLCache = Depends(get_product_cache)):
+    """ดูตัวนับ hit/miss/eviction ของ cache (ใช้ประกอบการปรับขนาด cache)"""
+    return cache.stats()
+
+
+@app.get("/products/snapshot")
+async def get_catalog_snapshot(
+    request: Request,
+    if_none_match: str | None = Header(None),
+    table: Table = Depends(get_db_table),
+    catalog: CatalogSnapshots = Depends(get_catalog),
+):
+    """
+    Catalog ทั้งหมดจัดกลุ่มตาม Category (สำหรับหน้าแรก / ผู้ใช้ที่ไม่ได้ล็อกอิน)
+    อ่านจาก Object Storage (ยังไม่มี -> scan Table สร้างครั้งแรก)
+    ส่งแบบ gzip ตรงๆ ถ้า Client รับได้ / ETag ตรง -> 304
+    """
+    try:
+        snapshot = await load_catalog_snapshot(catalog, table)
+    except Exception as e:
+        raise to_http_exception(e, "get_catalog_snapshot")
+
+    cache_control = CACHE_CONTROL["catalog_snapshot"]
+    if etag_matches(if_none_match, snapshot.etag):
+        return not_modified(snapshot.etag, cache_control)
+
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(snapshot.data, media_type="application/json", headers=headers)
+    return Response(
+        gzip.decompress(snapshot.data), media_type="application/json", headers=headers
+    )
 
-        if not item:
-            raise HTTPException(status_code=404, detail="Product not found")
-        return item
 
-    except HTTPException as http_exc:
-        # ปล่อย HTTPException (เช่น 404) ที่เราตั้งใจโยน ให้ผ่านไป
-        raise http_exc
+@app.get("/products/search", response_model=list[ProductSearchHit])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    table: Table = Depends(get_db_table),
+    search: SearchIndex = Depends(get_search_index),
+    catalog: CatalogSnapshots = Depends(get_catalog),
+):
+    """
+    ค้นหาสินค้าจาก Name / Category / Description (รองรับพิมพ์ไม่จบคำ)
+    ค้นจาก index ใน memory ที่สร้างจาก Catalog Snapshot -> ไม่อ่าน Table
+    (ยกเว้นครั้งแรกสุดที่ยังไม่มี Catalog Snapshot เลย)
+    (ต้องประกาศก่อน /products/{product_id} ไม่งั้น "search" จะถูกมองเป็น product_id)
+    """
+    try:
+        await ensure_search_index(search, table, catalog)
     except Exception as e:
-        # จับ Exception "อื่นๆ" ที่ไม่คาดคิด (เช่น Boto3 พัง)
-        print(f"!!! UNEXPECTED ERROR (get_product): {repr(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        raise to_http_exception(e, "search_products")
+    return search.search(q, limit)
+
+
+@app.get("/products/{product_id}", response_model=ProductResponse)
+async def get_product(
+    product_id: str,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    cache: TTLCache = Depends(get_product_cache),
+):
+    """
+    ดึงข้อมูลสินค้าชิ้นเดียว (Read) - ดูใน cache ก่อน ถ้าไม่มีค่อยไป DynamoDB
+    ถ้า If-None-Match ตรงกับ ETag ปัจจุบัน ตอบ 304 (ไม่ส่ง body)
+    (สินค้าที่แบ่ง shard: Stock = ผลรวมทุก shard และไม่ตอบ 304 เพราะ ETag ไม่ได้ตาม Stock)
+    """
+    cache_control = CACHE_CONTROL["get_product"]
+
+    item = cache.get(product_id)
+    if item is MISSING:
+        try:
+            db_response = await table.get_item(Key={"ProductID": product_id})
+            item = db_response.get("Item")
+
+            if not item:
+                raise HTTPException(status_code=404, detail="Product not found")
+            await attach_sharded_stock([item], shards_table)
+            cache.set(product_id, item)
+
+        except Exception as e:
+            # HTTPException (เช่น 404) ผ่านไปตามเดิม / throttle -> 503 / อื่นๆ -> 500
+            raise to_http_exception(e, "get_product")
+
+    etag = format_etag(item)
+    if not item.get(SHARD_COUNT_ATTRIBUTE) and etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return item
+
+
+def build_list_operation(
+    table: Table,
+    category: str | None,
+    min_price: Decimal | None,
+    max_price: Decimal | None,
+    name_prefix: str | None,
+):
+    """
+    เลือกว่าจะ "scan" ทั้ง Table หรือ "query" GSI ตาม Category
+    คืนค่า (operation, kwargs) ให้ list_products เอาไปเรียกทีละหน้า
+    """
+    if category is None:
+        if min_price is not None or max_price is not None or name_prefix:
+            raise HTTPException(
+                status_code=400,
+                detail="min_price, max_price and name_prefix require category",
+            )
+        return table.scan, {}
+
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price must be <= max_price")
+
+    # เงื่อนไขช่วงราคา (ใช้เป็น Sort Key condition หรือ Filter แล้วแต่ GSI)
+    names = {"#cat": "Category"}
+    values = {":cat": category}
+    price_condition = None
+    if min_price is not None and max_price is not None:
+        price_condition = "#price BETWEEN :min_price AND :max_price"
+    elif min_price is not None:
+        price_condition = "#price >= :min_price"
+    elif max_price is not None:
+        price_condition = "#price <= :max_price"
+    if price_condition:
+        names["#price"] = "Price"
+        if min_price is not None:
+            values[":min_price"] = min_price
+        if max_price is not None:
+            values[":max_price"] = max_price
+
+    if name_prefix:
+        # Query ด้วย Name prefix บน CategoryNameIndex (ช่วงราคา = Filter)
+        # ("Name" เป็น Reserved Keyword ของ DynamoDB -> ต้องใช้ #name)
+        names["#name"] = "Name"
+        values[":prefix"] = name_prefix
+        query_kwargs = {
+            "IndexName": CATEGORY_NAME_INDEX,
+            "KeyConditionExpression": "#cat = :cat AND begins_with(#name, :prefix)",
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }
+        if price_condition:
+            query_kwargs["FilterExpression"] = price_condition
+        return table.query, query_kwargs
+
+    # Query ตามช่วงราคาบน CategoryPriceIndex
+    key_condition = "#cat = :cat"
+    if price_condition:
+        key_condition += f" AND {price_condition}"
+    return table.query, {
+        "IndexName": CATEGORY_PRICE_INDEX,
+        "KeyConditionExpression": key_condition,
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
 
 
 @app.get("/products", response_model=list[ProductResponse])
-def list_products(table: Table = Depends(get_db_table)):
-    """ดึงสินค้าทั้งหมด (List)"""
+async def list_products(
+    response: Response,
+    if_none_match: str | None = Header(None),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: str | None = None,
+    stream: bool = False,
+    category: str | None = Query(None, min_length=1),
+    min_price: Decimal | None = Query(None, ge=0),
+    max_price: Decimal | None = Query(None, ge=0),
+    name_prefix: str | None = Query(None, min_length=1),
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+):
+    """
+    ดึงสินค้าทีละหน้า (List)
+    - ปกติ: คืนสินค้า 1 หน้า (ไม่เกิน `limit` ชิ้น) และส่ง cursor หน้าถัดไปใน Header X-Next-Cursor
+    - stream=true: ส่งสินค้า "ทั้งหมด" (ตั้งแต่ cursor) เป็น NDJSON ทีละหน้า
+    - category=...: Query เฉพาะ Category นั้นผ่าน GSI (กรองราคา/ชื่อขึ้นต้นได้)
+    - ส่ง If-None-Match มา และหน้านั้นไม่เปลี่ยน -> 304 (ไม่ต้อง serialize/ส่ง body)
+    """
+    start_key = decode_cursor(cursor) if cursor else None
+    operation, op_kwargs = build_list_operation(
+        table, category, min_price, max_price, name_prefix
+    )
+
+    if stream:
+        return StreamingResponse(
+            stream_products_ndjson(
+                operation, op_kwargs, start_key, limit, shards_table
+            ),
+            media_type="application/x-ndjson",
+        )
+
     try:
-        # หมายเหตุ: .scan() จะดึงข้อมูล *ทั้งหมด* ไม่เหมาะกับข้อมูลปริมาณมาก
-        # แต่สำหรับ PoC (Proof of Concept) ถือว่าใช้ได้ครับ
-        response = table.scan()
-        return response.get("Items", [])
+        if start_key:
+            op_kwargs["ExclusiveStartKey"] = start_key
+        page = await operation(Limit=limit, **op_kwargs)
+        items, last_key = page.get("Items", []), page.get("LastEvaluatedKey")
+        await attach_sharded_stock(items, shards_table)
+
+        next_cursor = encode_cursor(last_key)
+        cache_control = CACHE_CONTROL["list_products"]
+        etag = list_etag(items, next_cursor)
+        if etag_matches(if_none_match, etag):
+            not_modified_response = not_modified(etag, cache_control)
+            if next_cursor:
+                not_modified_response.headers[NEXT_CURSOR_HEADER] = next_cursor
+            return not_modified_response
+
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = cache_control
+        if FAST_RESPONSES:
+            return FastJSONResponse(
+                PRODUCT_SERIALIZER.dump_json_many(items), headers=response.headers
+            )
+        return items
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e, "list_products")
+
+
+async def stream_products_ndjson(
+    operation,
+    op_kwargs: dict,
+    start_key: dict | None,
+    page_size: int,
+    shards_table: Table,
+):
+    """Async generator สำหรับ StreamingResponse: 1 บรรทัด = สินค้า 1 ชิ้น"""
+    pages = aiter_pages(operation, start_key=start_key, Limit=page_size, **op_kwargs)
+    async for items, _ in pages:
+        await attach_sharded_stock(items, shards_table)
+        if FAST_RESPONSES:
+            chunk = b"".join(
+                PRODUCT_SERIALIZER.dump_json(item) + b"\n" for item in items
+            )
+        else:
+            chunk = "".join(
+                ProductResponse.model_validate(item).model_dump_json() + "\n"
+                for item in items
+            )
+        if chunk:
+            yield chunk
 
 
 @app.put("/products/{product_id}", response_model=ProductResponse)
-def update_product(
-    product_id: str, product_in: ProductInput, table: Table = Depends(get_db_table)
+async def update_product(
+    product_id: str,
+    product_in: ProductInput,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    if_match: str | None = Header(None),
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    cache: TTLCache = Depends(get_product_cache),
+    search: SearchIndex = Depends(get_search_index),
+    catalog: CatalogSnapshots = Depends(get_catalog),
 ):
-    """อัปเดตข้อมูลสินค้า (Update)"""
+    """
+    อัปเดตข้อมูลสินค้า (Update)
+    - เช็คว่ามีของจริง (และ Version ตรงกับ If-Match ถ้าส่งมา) ด้วย ConditionExpression
+      ในการเขียนครั้งเดียว (ไม่ต้อง get_item ก่อน)
+    """
 
-    # 1. ตรวจสอบก่อนว่ามีของจริงไหม
-    response = table.get_item(Key={"ProductID": product_id})
-    if not response.get("Item"):
-        raise HTTPException(status_code=404, detail="Product not found")
+    # 1. เงื่อนไขการเขียน (มีของจริง + version ตรง)
+    versions = parse_if_match(if_match)
+    condition, condition_names, condition_values = build_write_condition(
+        "ProductID", versions
+    )
 
     # 2. สร้าง Expression
     update_data = product_in.model_dump(exclude_unset=True)
@@ -140,62 +934,212 @@ def update_product(
         update_data["Price"] = Decimal(str(update_data["Price"]))
     # --- สิ้นสุดส่วนที่เพิ่ม ---
 
-    # --- (Fix 4) นี่คือวิธีแก้ "Reserved Keyword" (เหมือนเดิม) ---
-    expression_attr_values = {}
-    expression_attr_names = {}
-    update_expression_parts = []
+    # --- (Fix 4) Placeholder ทุก Key/Value กัน "Reserved Keyword" (ดู build_update) ---
+    # ทุกการเขียน +1 ให้ Version
+    update_expression, expression_attr_names, expression_attr_values = build_update(
+        update_data, {"Version": 1}
+    )
+    expression_attr_names.update(condition_names)
+    expression_attr_values.update(condition_values)
+    if "Stock" in update_data:
+        # สินค้าที่แบ่ง shard: Stock จริงอยู่ใน shard -> ห้ามเขียน Stock ลง Item ของสินค้า
+        # (Condition ไม่ผ่าน -> ไปทาง Transaction ด้านล่างแทน)
+        condition += " AND attribute_not_exists(#shards)"
+        expression_attr_names["#shards"] = SHARD_COUNT_ATTRIBUTE
+
+    try:
+        try:
+            # 3. สั่งอัปเดตและขอข้อมูลใหม่ (ReturnValues="ALL_NEW")
+            db_response = await table.update_item(
+                Key={"ProductID": product_id},
+                UpdateExpression=update_expression,
+                ConditionExpression=condition,
+                ExpressionAttributeValues=expression_attr_values,
+                ExpressionAttributeNames=expression_attr_names,  # <-- เพิ่มอันนี้!
+                ReturnValues="ALL_NEW",
+                # ถ้า Condition ไม่ผ่าน ให้คืน Item เดิมมา (ใช้แยก 404 กับ 412)
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+            item = db_response.get("Attributes")
+        except ConditionalCheckFailed as e:
+            old = e.item
+            if not (old and old.get(SHARD_COUNT_ATTRIBUTE) and "Stock" in update_data):
+                raise
+            if versions is not None and int(old.get("Version", 0)) not in versions:
+                raise
+            # สินค้าที่แบ่ง shard: แก้สินค้า + แบ่ง Stock ใหม่ลงทุก shard ใน Transaction เดียว
+            from . import inventory
 
-    # สร้าง Placeholder ที่ปลอดภัยสำหรับทุก Key/Value
-    for i, (key, value) in enumerate(update_data.items()):
-        val_placeholder = f":val{i}"  # e.g., :val0, :val1
-        key_placeholder = f"#key{i}"  # e.g., #key0, #key1
+            item = await run_in_threadpool(
+                inventory.update_with_total,
+                table.sync,
+                shards_table.sync,
+                old,
+                update_data,
+            )
+        # ข้อมูลเก่าใน cache ใช้ไม่ได้แล้ว
+        cache.invalidate(product_id)
+        search.upsert(item)
+        background_tasks.add_task(patch_catalog, catalog, search, product=item)
+        response.headers["ETag"] = format_etag(item)
+        return item
+    except TransactionCanceled:
+        # มีคนแก้สินค้า / เปลี่ยนจำนวน shard แทรกระหว่างอ่านกับเขียน
+        raise HTTPException(
+            status_code=409, detail="Product changed while updating, please retry"
+        )
+    except Exception as e:
+        # Condition ไม่ผ่าน -> 404 (ไม่มีของ) / 412 (Version ไม่ตรง)
+        raise to_http_exception(e, "update_product", "Product not found")
 
-        # ตอนนี้ 'value' ของ 'Price' จะเป็น Decimal แล้ว
-        expression_attr_values[val_placeholder] = value
-        expression_attr_names[key_placeholder] = key  # e.g., {"#key0": "Name"}
-        update_expression_parts.append(f"{key_placeholder} = {val_placeholder}")
 
-    update_expression = "SET " + ", ".join(update_expression_parts)
-    # --- สิ้นสุด Fix 4 ---
+@app.delete("/products/{product_id}", status_code=204)
+async def delete_product(
+    product_id: str,
+    background_tasks: BackgroundTasks,
+    if_match: str | None = Header(None),
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    cache: TTLCache = Depends(get_product_cache),
+    search: SearchIndex = Depends(get_search_index),
+    catalog: CatalogSnapshots = Depends(get_catalog),
+):
+    """ลบสินค้า (Delete) - เช็คว่ามีของ (+ Version) ใน ConditionExpression ครั้งเดียว"""
+    condition, condition_names, condition_values = build_write_condition(
+        "ProductID", parse_if_match(if_match)
+    )
+    delete_kwargs = {"ConditionExpression": condition}
+    if condition_names:
+        delete_kwargs["ExpressionAttributeNames"] = condition_names
+        delete_kwargs["ExpressionAttributeValues"] = condition_values
 
     try:
-        # 3. สั่งอัปเดตและขอข้อมูลใหม่ (ReturnValues="ALL_NEW")
-        response = table.update_item(
+        db_response = await table.delete_item(
             Key={"ProductID": product_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attr_values,
-            ExpressionAttributeNames=expression_attr_names,  # <-- เพิ่มอันนี้!
-            ReturnValues="ALL_NEW",
+            ReturnValues="ALL_OLD",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            **delete_kwargs,
         )
-        return response.get("Attributes")
-    except HTTPException as http_exc:
-        # ปล่อย HTTPException (เช่น 404) ที่เราตั้งใจโยน ให้ผ่านไป
-        raise http_exc
+        cache.invalidate(product_id)
+        search.remove(product_id)
+        background_tasks.add_task(patch_catalog, catalog, search, product_id=product_id)
+        if db_response.get("Attributes", {}).get(SHARD_COUNT_ATTRIBUTE):
+            background_tasks.add_task(
+                remove_stock_shards, shards_table.sync, product_id
+            )
+
     except Exception as e:
-        # (ลบ print() debug เก่าทิ้งได้เลย)
-        print(f"!!! UNEXPECTED ERROR (update_product): {repr(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        raise to_http_exception(e, "delete_product", "Product not found")
 
 
-@app.delete("/products/{product_id}", status_code=204)
-def delete_product(product_id: str, table: Table = Depends(get_db_table)):
-    """ลบสินค้า (Delete)"""
+@app.get("/products/{product_id}/stock-shards", response_model=StockShardsResponse)
+async def get_stock_shards(
+    product_id: str,
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+):
+    """ดู Stock แยกตาม shard ของสินค้า (อ่านแบบ ConsistentRead)"""
+    from . import inventory
+
     try:
-        # 1. ตรวจสอบก่อนว่ามีของ
-        response = table.get_item(Key={"ProductID": product_id})
-        if not response.get("Item"):
+        db_response = await table.get_item(
+            Key={"ProductID": product_id}, ConsistentRead=True
+        )
+        item = db_response.get("Item")
+        if not item:
             raise HTTPException(status_code=404, detail="Product not found")
+        if not item.get(SHARD_COUNT_ATTRIBUTE):
+            return inventory.summarize(product_id, {0: item["Stock"]})
+        levels = await run_in_threadpool(
+            inventory.read_levels, shards_table.sync, product_id
+        )
+        return inventory.summarize(product_id, levels)
+    except Exception as e:
+        raise to_http_exception(e, "get_stock_shards")
+
+
+@app.put("/products/{product_id}/stock-shards", response_model=StockShardsResponse)
+async def update_stock_shards(
+    product_id: str,
+    shards_in: StockShardsInput,
+    table: Table = Depends(get_db_table),
+    shards_table: Table = Depends(get_stock_shards_table),
+    cache: TTLCache = Depends(get_product_cache),
+):
+    """
+    เปลี่ยนจำนวน shard ของ Stock (เช่น เปิดก่อน Flash Sale แล้วปิดหลังจบ)
+    Shards > 1 = แบ่ง Stock ไปไว้ใน N Item (Order กระจายไปตัดหลาย Item แทนที่จะชน Item เดียว)
+    Shards = 1 = รวมกลับไปไว้ใน Item ของสินค้าตามเดิม
+    """
+    from . import inventory
+
+    try:
+        summary = await run_in_threadpool(
+            inventory.reshard,
+            table.sync,
+            shards_table.sync,
+            product_id,
+            shards_in.Shards,
+        )
+    except TransactionCanceled:
+        # Order ตัด Stock แทรกตลอดจนครบจำนวนครั้งที่ลอง
+        raise HTTPException(
+            status_code=409, detail="Stock kept changing while resharding, please retry"
+        )
+    except Exception as e:
+        raise to_http_exception(e, "update_stock_shards")
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    cache.invalidate(product_id)
+    return summary
+
 
-        # 2. สั่งลบ
-        table.delete_item(Key={"ProductID": product_id})
+@app.post(
+    "/products/{product_id}/stock-shards/rebalance",
+    response_model=StockShardsResponse,
+)
+async def rebalance_stock_shards(
+    product_id: str,
+    shards_table: Table = Depends(get_stock_shards_table),
+):
+    """เกลี่ย Stock ให้ทุก shard เท่าๆ กันทันที (ปกติทำเองตามรอบเวลา ดู rebalance_handler)"""
+    from . import inventory
 
-    except HTTPException as http_exc:
-        # ปล่อย HTTPException (เช่น 404) ที่เราตั้งใจโยน ให้ผ่านไป
-        raise http_exc
+    try:
+        levels = await run_in_threadpool(
+            inventory.read_levels, shards_table.sync, product_id
+        )
+        if not levels:
+            raise HTTPException(status_code=404, detail="Product has no stock shards")
+        if await run_in_threadpool(
+            inventory.rebalance, shards_table.sync, product_id, levels
+        ):
+            levels = await run_in_threadpool(
+                inventory.read_levels, shards_table.sync, product_id
+            )
+        return inventory.summarize(product_id, levels)
+    except TransactionCanceled:
+        raise HTTPException(
+            status_code=409,
+            detail="Stock kept changing while rebalancing, please retry",
+        )
     except Exception as e:
-        print(f"!!! UNEXPECTED ERROR (delete_product): {repr(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        raise to_http_exception(e, "rebalance_stock_shards")
 
 
 # ตัวแปลง Lambda
-handler = Mangum(app)
+# lifespan="off": Mangum รัน lifespan รอบทุก invocation -> จะปิด connection pool ทุก request
+# (บน Lambda ไม่มี shutdown ให้รออยู่แล้ว / lifespan ใช้ตอนรันด้วย uvicorn)
+handler = Mangum(app, lifespan="off")
+
+
+def rebalance_handler(event, context):
+    """
+    (Lambda ตามรอบเวลา - EventBridge Schedule ใน template.yaml)
+    เกลี่ย Stock ของทุกสินค้าที่แบ่ง shard ให้ shard ที่โดนสุ่มตัดบ่อยไม่หมดก่อนตัวอื่น
+    """
+    from . import inventory
+
+    result = inventory.rebalance_all(stock_shards_table.sync)
+    print(json.dumps({"StockRebalance": result}))
+    return result
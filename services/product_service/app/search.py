@@ -0,0 +1,197 @@
+"""
+ค้นหาสินค้าด้วย Inverted Index ใน memory (ไม่อ่าน Table ตอนค้นหา)
+
+- ตัดคำจาก Name / Category / Description (ตัวพิมพ์เล็ก, แยกตามตัวอักษร/ตัวเลข)
+- postings: token -> {ProductID: น้ำหนัก}  (Name > Category > Description)
+- prefix matching: คำค้นทุกคำจับกับ token ที่ "ขึ้นต้นด้วย" คำนั้นได้ (พิมพ์ไม่จบก็เจอ)
+  ใช้ vocabulary ที่เรียงไว้ + bisect -> ไม่ต้องไล่ทุก token
+- ต้องเจอ "ทุกคำ" ที่ค้น (AND) แล้วเรียงตามคะแนนรวม (ตรงทั้งคำ > แค่ขึ้นต้น)
+
+สร้างจาก Catalog Snapshot (ดู ensure_search_index ใน main.py)
+แล้วอัปเดตทีละชิ้นตอน create/update/delete ใน container เดียวกันทันที
+การเขียนจาก container อื่นจะเห็นเมื่อ Catalog Snapshot เปลี่ยน
+(sync: แก้เฉพาะสินค้าที่ UpdatedAt เปลี่ยน / หายไป ไม่สร้าง index ใหม่ทั้งหมด)
+"""
+
+import bisect
+import heapq
+import re
+
+# น้ำหนักของแต่ละ field (token เดียวกันอยู่หลาย field -> ใช้ค่ามากสุด)
+FIELD_WEIGHTS = {"Name": 3.0, "Category": 2.0, "Description": 1.0}
+# ตรงแค่ขึ้นต้น (เช่น "shi" -> "shirt") ได้คะแนนน้อยกว่าตรงทั้งคำ
+PREFIX_FACTOR = 0.5
+# prefix สั้นมาก (เช่น "a") อาจตรงกับ token เป็นพัน -> จำกัดไว้ให้ค้นหาได้เร็วเสมอ
+MAX_PREFIX_EXPANSIONS = 64
+MAX_QUERY_TERMS = 8
+# ยังไม่มีใน index (ต่างจาก UpdatedAt = None)
+MISSING_REVISION = object()
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str | None) -> list[str]:
+    """แยกข้อความเป็น token ตัวพิมพ์เล็ก (casefold)"""
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.casefold())
+
+
+class SearchIndex:
+    """
+    Inverted index ของสินค้า (สร้างไว้ที่ module scope ใช้ซ้ำข้าม invocation)
+    แก้ไข/ค้นหาใน event loop เดียวกันเท่านั้น (ไม่มี Lock)
+    """
+
+    def __init__(self):
+        self.loaded = False
+        # ETag ของ Catalog Snapshot ที่ใช้สร้าง index นี้
+        self.source: str | None = None
+        self._postings: dict[str, dict[str, float]] = {}
+        # token ทั้งหมด เรียงตามตัวอักษร (ไว้หา prefix)
+        self._vocabulary: list[str] = []
+        # ProductID -> ข้อมูลที่คืนในผลค้นหา
+        self._docs: dict[str, dict] = {}
+        # ProductID -> token ของชิ้นนั้น (ไว้ลบ posting ตอน update/delete)
+        self._doc_tokens: dict[str, tuple[str, ...]] = {}
+        # ProductID -> UpdatedAt ของข้อมูลที่อยู่ใน index (ไว้เทียบตอน sync)
+        self._revisions: dict[str, str | None] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def clear(self):
+        """ล้าง index (ครั้งหน้าที่ค้นหาจะโหลดใหม่)"""
+        self.loaded = False
+        self.source = None
+        self._postings = {}
+        self._vocabulary = []
+        self._docs = {}
+        self._doc_tokens = {}
+        self._revisions = {}
+
+    # --- สร้าง / อัปเดต ---
+    def load(self, products):
+        """สร้าง index ใหม่ทั้งหมดจากรายการสินค้า (แทนของเดิม)"""
+        self.clear()
+        for product in products:
+            self._add(product)
+        self._vocabulary = sorted(self._postings)
+        self.loaded = True
+
+    def sync(self, products) -> int:
+        """
+        ทำให้ index ตรงกับสินค้าทั้งหมด (เช่นจาก Catalog Snapshot ใหม่)
+        ยังไม่ได้โหลด -> load / โหลดแล้ว -> upsert เฉพาะชิ้นที่ UpdatedAt เปลี่ยน + ลบชิ้นที่หายไป
+        คืนจำนวนชิ้นที่แก้ (load = ทั้งหมด)
+        """
+        if not self.loaded:
+            products = list(products)
+            self.load(products)
+            return len(products)
+        changed = 0
+        seen = set()
+        for product in products:
+            product_id = product["ProductID"]
+            seen.add(product_id)
+            if self._revisions.get(product_id, MISSING_REVISION) != product.get(
+                "UpdatedAt"
+            ):
+                self.upsert(product)
+                changed += 1
+        for product_id in [p for p in self._docs if p not in seen]:
+            self.remove(product_id)
+            changed += 1
+        return changed
+
+    def upsert(self, product: dict):
+        """เพิ่ม/แก้สินค้า 1 ชิ้น (ยังไม่ได้โหลด -> ข้าม เพราะตอนโหลดจะได้ข้อมูลล่าสุดเอง)"""
+        if not self.loaded:
+            return
+        self.remove(product["ProductID"])
+        for token in self._add(product):
+            if len(self._postings[token]) == 1:  # token ใหม่ -> แทรกแบบยังเรียงอยู่
+                bisect.insort(self._vocabulary, token)
+
+    def remove(self, product_id: str):
+        if not self.loaded or product_id not in self._docs:
+            return
+        del self._docs[product_id]
+        del self._revisions[product_id]
+        for token in self._doc_tokens.pop(product_id):
+            postings = self._postings[token]
+            del postings[product_id]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _add(self, product: dict) -> tuple[str, ...]:
+        product_id = product["ProductID"]
+        weights: dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field)):
+                if weight > weights.get(token, 0.0):
+                    weights[token] = weight
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[product_id] = weight
+
+        self._docs[product_id] = {
+            "ProductID": product_id,
+            "Name": product.get("Name", ""),
+            "Category": product.get("Category", ""),
+            "Price": product.get("Price"),
+            "Description": product.get("Description"),
+        }
+        self._doc_tokens[product_id] = tuple(weights)
+        self._revisions[product_id] = product.get("UpdatedAt")
+        return self._doc_tokens[product_id]
+
+    # --- ค้นหา ---
+    def _expand(self, term: str):
+        """token ที่ขึ้นต้นด้วย term (รวมตัว term เอง) ไม่เกิน MAX_PREFIX_EXPANSIONS ตัว"""
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start : start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            yield token
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        """ผลค้นหาเรียงตามคะแนน (มาก -> น้อย, เท่ากันเรียงตามชื่อ)"""
+        terms = dict.fromkeys(tokenize(query[:200])[:MAX_QUERY_TERMS])
+        expanded = [(term, list(self._expand(term))) for term in terms]
+        if not expanded:
+            return []
+        # คำที่เจอน้อยสุดก่อน -> คำถัดไปแค่เช็คกับผู้สมัครที่เหลือ (ไม่ต้องไล่ postings ยาวๆ)
+        expanded.sort(key=lambda e: sum(len(self._postings[t]) for t in e[1]))
+
+        term, tokens = expanded[0]
+        scores: dict[str, float] = {}
+        for token in tokens:
+            factor = 1.0 if token == term else PREFIX_FACTOR
+            for product_id, weight in self._postings[token].items():
+                if weight * factor > scores.get(product_id, 0.0):
+                    scores[product_id] = weight * factor
+
+        for term, tokens in expanded[1:]:
+            if not scores:
+                return []
+            matched = {}  # ต้องเจอทุกคำ (AND)
+            for product_id, total in scores.items():
+                best = 0.0
+                for token in tokens:
+                    weight = self._postings[token].get(product_id)
+                    if weight:
+                        factor = 1.0 if token == term else PREFIX_FACTOR
+                        best = max(best, weight * factor)
+                if best:
+                    matched[product_id] = total + best
+            scores = matched
+
+        best = heapq.nsmallest(
+            limit,
+            scores.items(),
+            key=lambda entry: (-entry[1], self._docs[entry[0]]["Name"], entry[0]),
+        )
+        return [
+            {**self._docs[product_id], "Score": score} for product_id, score in best
+        ]
@@ -9,6 +9,10 @@ PROJECT_ROOT = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "..", "..")
 )
 sys.path.insert(0, PROJECT_ROOT)
+# Shared Layer (ตอน deploy จะอยู่ที่ /opt/python ของ Lambda)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "services", "shared"))
+
+from ecom_shared.dynamo import DynamoClient, DynamoTable  # noqa: E402
 
 
 @pytest.fixture(scope="function")
@@ -29,7 +33,58 @@ def mock_dynamodb_table(aws_credentials):
         dynamodb.create_table(
             TableName="TestProducts",
             KeySchema=[{"AttributeName": "ProductID", "KeyType": "HASH"}],
-            AttributeDefinitions=[{"AttributeName": "ProductID", "AttributeType": "S"}],
+            AttributeDefinitions=[
+                {"AttributeName": "ProductID", "AttributeType": "S"},
+                {"AttributeName": "Category", "AttributeType": "S"},
+                {"AttributeName": "Price", "AttributeType": "N"},
+                {"AttributeName": "Name", "AttributeType": "S"},
+            ],
+            # GSI ให้ตรงกับ template.yaml
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "CategoryPriceIndex",
+                    "KeySchema": [
+                        {"AttributeName": "Category", "KeyType": "HASH"},
+                        {"AttributeName": "Price", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 5,
+                        "WriteCapacityUnits": 5,
+                    },
+                },
+                {
+                    "IndexName": "CategoryNameIndex",
+                    "KeySchema": [
+                        {"AttributeName": "Category", "KeyType": "HASH"},
+                        {"AttributeName": "Name", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 5,
+                        "WriteCapacityUnits": 5,
+                    },
+                },
+            ],
             ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
         )
-        yield dynamodb.Table("TestProducts")
+        yield DynamoTable("TestProducts", DynamoClient(boto3.client("dynamodb")))
+
+
+@pytest.fixture(scope="function")
+def mock_stock_shards_table(mock_dynamodb_table):
+    """สร้าง StockShardsTable จำลอง (Stock ของสินค้าที่แบ่ง shard) ใน Moto ตัวเดียวกัน"""
+    dynamodb = boto3.resource("dynamodb")
+    dynamodb.create_table(
+        TableName="TestStockShards",
+        KeySchema=[
+            {"AttributeName": "ProductID", "KeyType": "HASH"},
+            {"AttributeName": "Shard", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "ProductID", "AttributeType": "S"},
+            {"AttributeName": "Shard", "AttributeType": "N"},
+        ],
+        ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+    )
+    yield DynamoTable("TestStockShards", DynamoClient(boto3.client("dynamodb")))
@@ -1,26 +1,58 @@
+import csv
+import io
+import json
+from decimal import Decimal
 import pytest
 from fastapi.testclient import TestClient
 
+from ecom_shared.aio import AsyncDynamoTable
+
 
 # --- Fixture ---
 @pytest.fixture
-def test_client(mock_dynamodb_table):  # <-- mock_dynamodb_table มาจาก conftest
+def test_client(
+    mock_dynamodb_table, mock_stock_shards_table, tmp_path
+):  # <-- mock_dynamodb_table มาจาก conftest
     """
     สร้าง TestClient และ "Override" (ทับที่) Dependency ของ get_db_table
     """
 
     # Import app และ dependency function ที่นี่
-    from services.product_service.app.main import app, get_db_table
+    from services.product_service.app.main import (
+        PRODUCT_SERIALIZER,
+        app,
+        catalog_cache,
+        get_catalog,
+        get_db_table,
+        get_stock_shards_table,
+        product_cache,
+        search_index,
+    )
+    from services.product_service.app.catalog import CatalogSnapshots
+    from ecom_shared.storage import LocalObjectStore
 
     # นี่คือ "Mock" dependency function
     def get_mock_table():
         """ส่งต่อ table จำลอง (จาก conftest)"""
-        return mock_dynamodb_table
+        return AsyncDynamoTable.from_sync(mock_dynamodb_table)
 
     # --- นี่คือการ "Inject" ที่ถูกต้อง ---
     # บอก FastAPI ว่า: "เมื่อไหร่ก็ตามที่โค้ดเรียก get_db_table,
     # ให้เรียก get_mock_table (ที่คืนค่า mock) แทน"
     app.dependency_overrides[get_db_table] = get_mock_table
+    app.dependency_overrides[get_stock_shards_table] = (
+        lambda: AsyncDynamoTable.from_sync(mock_stock_shards_table)
+    )
+    # Catalog Snapshot เก็บเป็นไฟล์ในโฟลเดอร์ชั่วคราวของเทสนี้ (แทน S3)
+    catalog = CatalogSnapshots(
+        LocalObjectStore(str(tmp_path / "objects")), PRODUCT_SERIALIZER.to_dict
+    )
+    app.dependency_overrides[get_catalog] = lambda: catalog
+
+    # cache อยู่ระดับ module -> ล้างทุกเทส ไม่ให้ข้อมูลข้ามเทสกัน
+    product_cache.clear()
+    search_index.clear()
+    catalog_cache.clear()
 
     client = TestClient(app)
     yield client
@@ -127,3 +159,927 @@ def test_product_full_lifecycle(test_client):
     verify_get_response = test_client.get(f"/products/{product_id}")
     assert verify_get_response.status_code == 404
     assert verify_get_response.json()["detail"] == "Product not found"
+
+
+def _create_products(test_client, count, category="Tests"):
+    """Helper: สร้างสินค้าหลายชิ้น แล้วคืนรายการ ProductID"""
+    product_ids = []
+    for i in range(count):
+        response = test_client.post(
+            "/products",
+            json={
+                "Name": f"Product {i}",
+                "Price": 10.00 + i,
+                "Stock": 10,
+                "Category": category,
+            },
+        )
+        assert response.status_code == 201
+        product_ids.append(response.json()["ProductID"])
+    return product_ids
+
+
+def test_list_products_pagination(test_client):
+    """เทสการแบ่งหน้า (limit + cursor) ของ list_products"""
+    product_ids = _create_products(test_client, 5)
+
+    # 1. หน้าแรก: ต้องได้ 2 ชิ้น และมี cursor ของหน้าถัดไป
+    first_page = test_client.get("/products", params={"limit": 2})
+    assert first_page.status_code == 200
+    assert len(first_page.json()) == 2
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    # 2. เดินตาม cursor ไปจนหมด ต้องได้สินค้าครบทุกชิ้น (ไม่ซ้ำ)
+    seen = [p["ProductID"] for p in first_page.json()]
+    while cursor:
+        page = test_client.get("/products", params={"limit": 2, "cursor": cursor})
+        assert page.status_code == 200
+        seen.extend(p["ProductID"] for p in page.json())
+        cursor = page.headers.get("X-Next-Cursor")
+
+    assert sorted(seen) == sorted(product_ids)
+
+
+def test_list_products_invalid_cursor(test_client):
+    """เทส cursor ที่ไม่ถูกต้อง ต้องได้ 400"""
+    response = test_client.get("/products", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_list_products_stream_ndjson(test_client):
+    """เทสโหมด stream: ต้องได้สินค้าทั้งหมดเป็น NDJSON (1 บรรทัดต่อ 1 ชิ้น)"""
+    product_ids = _create_products(test_client, 5)
+
+    response = test_client.get("/products", params={"stream": "true", "limit": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(p["ProductID"] for p in lines) == sorted(product_ids)
+    assert all(isinstance(p["Price"], float) for p in lines)
+
+
+def test_list_products_fast_responses(test_client, monkeypatch):
+    """FAST_RESPONSES: body / Header ต้องเหมือนทางปกติของ FastAPI ทุก byte"""
+    from services.product_service.app import main
+
+    _create_products(test_client, 3)
+    params = {"limit": 2}
+    normal = test_client.get("/products", params=params)
+    normal_stream = test_client.get("/products", params={"stream": "true"})
+
+    monkeypatch.setattr(main, "FAST_RESPONSES", True)
+    fast = test_client.get("/products", params=params)
+    fast_stream = test_client.get("/products", params={"stream": "true"})
+
+    assert fast.status_code == 200
+    assert fast.content == normal.content
+    assert fast.headers["content-type"] == "application/json"
+    for header in ("ETag", "Cache-Control", "X-Next-Cursor"):
+        assert fast.headers[header] == normal.headers[header]
+    assert fast_stream.content == normal_stream.content
+
+
+def test_list_products_by_category(test_client):
+    """เทสการ Query ตาม Category (GSI) พร้อมเงื่อนไขราคา/ชื่อ"""
+    _create_products(test_client, 3, category="Shoes")  # ราคา 10, 11, 12
+    _create_products(test_client, 2, category="Hats")
+
+    # 1. เฉพาะ Category (เรียงตามราคา)
+    response = test_client.get("/products", params={"category": "Shoes"})
+    assert response.status_code == 200
+    prices = [p["Price"] for p in response.json()]
+    assert prices == [10.0, 11.0, 12.0]
+
+    # 2. ช่วงราคา
+    response = test_client.get(
+        "/products", params={"category": "Shoes", "min_price": 10.5, "max_price": 12}
+    )
+    assert [p["Price"] for p in response.json()] == [11.0, 12.0]
+
+    # 3. ชื่อขึ้นต้นด้วย (+ กรองราคา)
+    response = test_client.get(
+        "/products",
+        params={"category": "Hats", "name_prefix": "Product 1", "max_price": 20},
+    )
+    assert [p["Name"] for p in response.json()] == ["Product 1"]
+
+    # 4. แบ่งหน้าใน Category ได้เหมือนกัน
+    first_page = test_client.get("/products", params={"category": "Shoes", "limit": 2})
+    assert len(first_page.json()) == 2
+    next_page = test_client.get(
+        "/products",
+        params={
+            "category": "Shoes",
+            "limit": 2,
+            "cursor": first_page.headers["X-Next-Cursor"],
+        },
+    )
+    assert [p["Price"] for p in next_page.json()] == [12.0]
+
+
+def test_list_products_filters_require_category(test_client):
+    """เทสกรองราคา/ชื่อ โดยไม่ระบุ Category ต้องได้ 400"""
+    response = test_client.get("/products", params={"min_price": 10})
+    assert response.status_code == 400
+
+
+def test_get_product_uses_cache(test_client, mock_dynamodb_table):
+    """เทส cache ของ get_product: ครั้งที่ 2 ต้องไม่ไป DynamoDB + update/delete ต้องล้าง cache"""
+    (product_id,) = _create_products(test_client, 1)
+
+    # 1. ครั้งแรก miss, ครั้งที่สอง hit
+    assert test_client.get(f"/products/{product_id}").status_code == 200
+    assert test_client.get(f"/products/{product_id}").status_code == 200
+    stats = test_client.get("/products/cache/stats").json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+    # 2. Update -> ต้องเห็นข้อมูลใหม่ทันที (ไม่ติด cache เก่า)
+    test_client.put(
+        f"/products/{product_id}",
+        json={"Name": "Fresh", "Price": 1.0, "Stock": 1, "Category": "Tests"},
+    )
+    assert test_client.get(f"/products/{product_id}").json()["Name"] == "Fresh"
+
+    # 3. Delete -> ต้องได้ 404 ทันที
+    test_client.delete(f"/products/{product_id}")
+    assert test_client.get(f"/products/{product_id}").status_code == 404
+
+
+def test_batch_get_products(test_client, mock_dynamodb_table):
+    """เทส batch-get: คืนตามลำดับที่ขอ, บอกตัวที่ไม่เจอ, รองรับ ID ซ้ำ และเกิน 100 ชิ้น"""
+    # ใส่สินค้าตรงลง Table 150 ชิ้น (ต้องแบ่งเป็น 2 chunk)
+    with mock_dynamodb_table.batch_writer() as batch:
+        for i in range(150):
+            batch.put_item(
+                Item={
+                    "ProductID": f"PROD-{i:03d}",
+                    "Name": f"Product {i}",
+                    "Price": Decimal("9.99"),
+                    "Stock": 1,
+                    "Category": "Bulk",
+                    "CreatedAt": "2024-01-01T00:00:00+00:00",
+                    "UpdatedAt": "2024-01-01T00:00:00+00:00",
+                    "UpdatedAt": "2024-01-01T00:00:00+00:00",
+                }
+            )
+
+    requested = [f"PROD-{i:03d}" for i in reversed(range(150))]
+    requested += ["PROD-MISSING", "PROD-000"]  # ไม่มีจริง + ID ซ้ำ
+
+    response = test_client.post("/products/batch-get", json={"ProductIDs": requested})
+    assert response.status_code == 200
+    data = response.json()
+
+    products = data["Products"]
+    assert len(products) == len(requested)
+    assert [p["ProductID"] for p in products[:150]] == requested[:150]
+    assert products[150] is None
+    assert products[151]["ProductID"] == "PROD-000"
+    assert data["Missing"] == ["PROD-MISSING"]
+
+
+def test_batch_get_products_too_many_ids(test_client):
+    """เทส batch-get เกินจำนวนที่กำหนด ต้องได้ 422"""
+    from services.product_service.app.main import MAX_BATCH_GET_IDS
+
+    ids = [f"PROD-{i}" for i in range(MAX_BATCH_GET_IDS + 1)]
+    response = test_client.post("/products/batch-get", json={"ProductIDs": ids})
+    assert response.status_code == 422
+
+
+def test_bulk_import_ndjson_reports_row_errors(test_client):
+    """เทส bulk import (NDJSON): แถวที่ผิดต้องถูกรายงาน แถวที่ถูกต้องต้องเข้า DB"""
+    body = "\n".join(
+        [
+            json.dumps({"Name": "A", "Price": 1.5, "Stock": 1, "Category": "Bulk"}),
+            json.dumps({"Name": "B", "Price": -1, "Stock": 1, "Category": "Bulk"}),
+            "{not json",
+            "",
+            json.dumps(
+                {
+                    "ProductID": "PROD-FIXED",
+                    "Name": "C",
+                    "Price": 2,
+                    "Stock": 3,
+                    "Category": "Bulk",
+                }
+            ),
+        ]
+    )
+    response = test_client.post("/products/import", content=body)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["Total"] == 4
+    assert report["Imported"] == 2
+    assert report["Failed"] == 2
+    assert [error["Row"] for error in report["Errors"]] == [2, 3]
+    assert "Price" in report["Errors"][0]["Errors"][0]
+
+    # ProductID ที่ส่งมาต้องถูกใช้ตามนั้น (ใช้ sync ของเดิมได้)
+    assert test_client.get("/products/PROD-FIXED").json()["Name"] == "C"
+
+
+def test_bulk_iter_lines_decodes_incrementally():
+    """แยกบรรทัดจาก byte ทีละก้อน: ตัวอักษรหลาย byte / BOM / CRLF ที่ขาดกลางก้อนต้องไม่เสีย"""
+    from services.product_service.app.bulk import iter_lines
+
+    data = '\ufeffName,Category\r\nเสื้อ,"A\nB"\r\nหมวก,C'.encode("utf-8")
+    expected = ["Name,Category\r\n", 'เสื้อ,"A\n', 'B"\r\n', "หมวก,C"]
+    for size in (1, 2, 5, len(data)):
+        chunks = [data[i : i + size] for i in range(0, len(data), size)]
+        assert list(iter_lines(chunks)) == expected
+
+    with pytest.raises(UnicodeDecodeError):
+        list(iter_lines([b"ok\n", b"\xff\n"]))
+
+
+def test_bulk_import_streams_request_body(test_client, monkeypatch):
+    """import อ่าน body ทีละก้อน (ไม่เรียก request.body() ทั้งก้อน) / ไม่ใช่ UTF-8 -> 400"""
+    from starlette.requests import Request
+
+    async def no_body(self):
+        raise AssertionError("import must stream the request body")
+
+    monkeypatch.setattr(Request, "body", no_body)
+
+    data = "Name,Price,Stock,Category\nเสื้อ,1,2,Bulk\n".encode()
+    split = data.index("เ".encode()) + 1  # ตัดกลางตัวอักษร
+
+    def chunked():
+        yield data[:split]
+        yield data[split:]
+
+    response = test_client.post("/products/import?format=csv", content=chunked())
+    assert response.status_code == 200
+    assert response.json()["Imported"] == 1
+
+    response = test_client.post("/products/import", content=b"\xff\xfe")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Body must be UTF-8 encoded"
+
+
+def test_bulk_import_csv_and_export(test_client):
+    """เทส bulk import (CSV) แล้ว export กลับออกมาทั้ง CSV และ NDJSON"""
+    body = (
+        "Name,Description,Price,Stock,Category,ImageUrl\n"
+        "Mug,,4.50,10,Kitchen,\n"
+        "Plate,Big plate,7.25,5,Kitchen,https://img/plate.jpg\n"
+    )
+    response = test_client.post("/products/import?format=csv", content=body)
+    assert response.json()["Imported"] == 2
+
+    export_ndjson = test_client.get("/products/export")
+    assert export_ndjson.status_code == 200
+    exported = [json.loads(line) for line in export_ndjson.text.splitlines()]
+    assert sorted(p["Name"] for p in exported) == ["Mug", "Plate"]
+    assert next(p for p in exported if p["Name"] == "Mug")["Description"] is None
+
+    export_csv = test_client.get("/products/export", params={"format": "csv"})
+    assert export_csv.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(export_csv.text)))
+    assert sorted(row["Name"] for row in rows) == ["Mug", "Plate"]
+    assert {row["Price"] for row in rows} == {"4.5", "7.25"}
+
+
+def test_bulk_import_over_existing_product_bumps_version(test_client):
+    """import ทับสินค้าเดิม -> ETag ต้องเดินหน้า (If-Match เดิมใช้ไม่ได้) และ CreatedAt คงเดิม"""
+    product_id = _create_product(test_client, "Mug", "Kitchen")
+    before = test_client.get(f"/products/{product_id}")
+    old_etag = before.headers["ETag"]
+    test_client.put(
+        f"/products/{product_id}",
+        json={"Name": "Mug", "Price": 2, "Stock": 1, "Category": "Kitchen"},
+        headers={"If-Match": old_etag},
+    )
+    current = test_client.get(f"/products/{product_id}")
+
+    # ไฟล์มี Version เก่า (export ไว้ก่อนแก้) -> ต้องไม่ทำให้ Version ถอยหลัง
+    record = {k: v for k, v in before.json().items() if v is not None}
+    record.update({"Name": "Big Mug", "Version": 1})
+    report = test_client.post("/products/import", content=json.dumps(record)).json()
+    assert report["Imported"] == 1
+
+    after = test_client.get(f"/products/{product_id}")
+    assert after.json()["Name"] == "Big Mug"
+    assert after.json()["CreatedAt"] == before.json()["CreatedAt"]
+    assert int(after.headers["ETag"].strip('"')) > int(
+        current.headers["ETag"].strip('"')
+    )
+    # ETag ที่ client ถืออยู่ก่อน import ต้องใช้ไม่ได้แล้ว
+    stale = test_client.put(
+        f"/products/{product_id}",
+        json={"Name": "X", "Price": 1, "Stock": 1, "Category": "Kitchen"},
+        headers={"If-Match": current.headers["ETag"]},
+    )
+    assert stale.status_code == 412
+
+
+def test_bulk_import_products_concurrent_chunks(
+    mock_dynamodb_table, mock_stock_shards_table
+):
+    """เทส import_products: แบ่งหลาย chunk และเขียนพร้อมกันหลาย worker ได้ครบ"""
+    from services.product_service.app.bulk import import_products
+
+    records = (
+        (i, {"Name": f"P{i}", "Price": 1, "Stock": 1, "Category": "Bulk"})
+        for i in range(1, 10)
+    )
+    report = import_products(
+        mock_dynamodb_table,
+        mock_stock_shards_table,
+        records,
+        concurrency=2,
+        chunk_size=2,
+    )
+
+    assert report == {"Total": 9, "Imported": 9, "Failed": 0, "Errors": []}
+    assert mock_dynamodb_table.scan()["Count"] == 9
+
+
+def test_product_optimistic_concurrency(test_client, mock_dynamodb_table):
+    """เทส ETag/If-Match: เขียนทับได้เฉพาะ version ล่าสุด (ไม่งั้น 412)"""
+    (product_id,) = _create_products(test_client, 1)
+    update_body = {"Name": "V2", "Price": 1.0, "Stock": 1, "Category": "Tests"}
+
+    # 1. GET ได้ ETag = version 1
+    etag = test_client.get(f"/products/{product_id}").headers["ETag"]
+    assert etag == '"1"'
+
+    # 2. PUT ด้วย ETag ล่าสุด -> สำเร็จ และได้ ETag ใหม่
+    response = test_client.put(
+        f"/products/{product_id}", json=update_body, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    assert response.json()["Version"] == 2
+
+    # 3. PUT/DELETE ด้วย ETag เก่า -> 412 (ไม่ทับของคนอื่น)
+    stale = test_client.put(
+        f"/products/{product_id}", json=update_body, headers={"If-Match": etag}
+    )
+    assert stale.status_code == 412
+    stale_delete = test_client.delete(
+        f"/products/{product_id}", headers={"If-Match": etag}
+    )
+    assert stale_delete.status_code == 412
+
+    # 4. DELETE ด้วย ETag ล่าสุด -> สำเร็จ
+    response = test_client.delete(
+        f"/products/{product_id}", headers={"If-Match": '"2"'}
+    )
+    assert response.status_code == 204
+
+
+def test_product_writes_on_missing_product(test_client):
+    """เทส PUT/DELETE สินค้าที่ไม่มีอยู่ -> 404 (ไม่ต้อง get_item ก่อน)"""
+    update_body = {"Name": "X", "Price": 1.0, "Stock": 1, "Category": "Tests"}
+
+    response = test_client.put("/products/PROD-NOPE", json=update_body)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Product not found"
+
+    response = test_client.delete("/products/PROD-NOPE", headers={"If-Match": '"1"'})
+    assert response.status_code == 404
+
+
+def test_product_legacy_item_without_version(test_client, mock_dynamodb_table):
+    """เทสสินค้าเก่าที่ยังไม่มี Version: ETag = "0" และใช้ If-Match "0" ได้"""
+    mock_dynamodb_table.put_item(
+        Item={
+            "ProductID": "PROD-OLD",
+            "Name": "Old",
+            "Price": Decimal("1"),
+            "Stock": 1,
+            "Category": "Tests",
+            "CreatedAt": "2024-01-01T00:00:00+00:00",
+            "UpdatedAt": "2024-01-01T00:00:00+00:00",
+            "UpdatedAt": "2024-01-01T00:00:00+00:00",
+        }
+    )
+    assert test_client.get("/products/PROD-OLD").headers["ETag"] == '"0"'
+
+    response = test_client.put(
+        "/products/PROD-OLD",
+        json={"Name": "New", "Price": 1.0, "Stock": 1, "Category": "Tests"},
+        headers={"If-Match": '"0"'},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"1"'
+
+
+def test_get_product_conditional_get(test_client):
+    """เทส If-None-Match ของ get_product: ไม่เปลี่ยน -> 304, เปลี่ยนแล้ว -> 200"""
+    (product_id,) = _create_products(test_client, 1)
+
+    first = test_client.get(f"/products/{product_id}")
+    etag = first.headers["ETag"]
+    assert "max-age" in first.headers["Cache-Control"]
+
+    not_modified = test_client.get(
+        f"/products/{product_id}", headers={"If-None-Match": etag}
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    test_client.put(
+        f"/products/{product_id}",
+        json={"Name": "Changed", "Price": 1.0, "Stock": 1, "Category": "Tests"},
+    )
+    changed = test_client.get(
+        f"/products/{product_id}", headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.json()["Name"] == "Changed"
+
+
+def test_list_products_conditional_get(test_client):
+    """เทส If-None-Match ของ list_products: หน้าเดิม -> 304, มีสินค้าใหม่ -> 200"""
+    _create_products(test_client, 2)
+
+    first = test_client.get("/products")
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    assert (
+        test_client.get("/products", headers={"If-None-Match": etag}).status_code == 304
+    )
+
+    _create_products(test_client, 1)
+    changed = test_client.get("/products", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert len(changed.json()) == 3
+
+
+def test_throttled_read_returns_503(test_client, mock_dynamodb_table, monkeypatch):
+    """DynamoDB throttle (retry ครบแล้ว) -> 503 + Retry-After แทน 500"""
+    from ecom_shared.errors import Throttled
+
+    def throttled_get_item(**kwargs):
+        raise Throttled(
+            {"Error": {"Code": "ProvisionedThroughputExceededException"}}, "GetItem"
+        )
+
+    monkeypatch.setattr(mock_dynamodb_table.client, "get_item", throttled_get_item)
+
+    response = test_client.get("/products/PROD-busy")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def _create_product(test_client, name, category, description=None):
+    body = {"Name": name, "Price": 10.5, "Stock": 1, "Category": category}
+    if description:
+        body["Description"] = description
+    response = test_client.post("/products", json=body)
+    assert response.status_code == 201
+    return response.json()["ProductID"]
+
+
+def test_search_products_ranking_and_incremental_updates(
+    test_client, mock_dynamodb_table, monkeypatch
+):
+    """เทส /products/search: prefix + ranking และ index ตามการเขียนโดยไม่อ่าน Table"""
+    shirt = _create_product(test_client, "Cotton Shirt", "Apparel")
+    jacket = _create_product(
+        test_client, "Denim Jacket", "Apparel", "Warm cotton lining"
+    )
+    mug = _create_product(test_client, "Coffee Mug", "Kitchen")
+
+    # ค้นหาครั้งแรก -> โหลด index (scan ครั้งเดียว)
+    hits = test_client.get("/products/search", params={"q": "cot"}).json()
+    # ชื่อขึ้นต้นด้วย "cot" ต้องมาก่อน Description
+    assert [h["ProductID"] for h in hits] == [shirt, jacket]
+    assert hits[0]["Price"] == 10.5 and hits[0]["Score"] > hits[1]["Score"]
+
+    # หลังจากนี้ค้นหาต้องไม่อ่าน Table เลย
+    def no_reads(**kwargs):
+        raise AssertionError("search must not read the table")
+
+    monkeypatch.setattr(mock_dynamodb_table.client, "scan", no_reads)
+    monkeypatch.setattr(mock_dynamodb_table.client, "get_item", no_reads)
+
+    # ต้องเจอทุกคำ (AND) / ตรงทั้งคำได้คะแนนมากกว่า
+    hits = test_client.get("/products/search", params={"q": "APPAREL denim"}).json()
+    assert [h["ProductID"] for h in hits] == [jacket]
+    assert test_client.get("/products/search", params={"q": "zzz"}).json() == []
+
+    # update / delete -> index เปลี่ยนตามทันที
+    test_client.put(
+        f"/products/{mug}",
+        json={"Name": "Cotton Mug", "Price": 5, "Stock": 1, "Category": "Kitchen"},
+    )
+    test_client.delete(f"/products/{shirt}")
+    hits = test_client.get("/products/search", params={"q": "cotton"}).json()
+    assert [h["ProductID"] for h in hits] == [mug, jacket]
+    assert test_client.get("/products/search", params={"q": "coffee"}).json() == []
+
+
+def test_search_products_loads_from_catalog_snapshot(
+    test_client, mock_dynamodb_table, monkeypatch
+):
+    """index สร้างจาก Catalog Snapshot: container ใหม่ไม่ scan / เห็นการเขียนจาก container อื่น"""
+    from services.product_service.app import main
+
+    product_id = _create_product(test_client, "เสื้อยืด Basic", "Apparel")
+    # ค้นหาครั้งแรกสุด (ยังไม่มี Catalog Snapshot) -> scan แล้วสร้าง snapshot ไว้
+    assert test_client.get("/products/search", params={"q": "basic"}).json()
+
+    # container ใหม่ (index ว่าง) -> ต้องโหลดจาก Catalog Snapshot ไม่ใช่ scan
+    main.search_index.clear()
+    main.catalog_cache.clear()
+
+    def no_scan(**kwargs):
+        raise AssertionError("should load from the catalog snapshot")
+
+    monkeypatch.setattr(mock_dynamodb_table.client, "scan", no_scan)
+    hits = test_client.get("/products/search", params={"q": "เสื้อ"}).json()
+    assert [h["ProductID"] for h in hits] == [product_id]
+    assert hits[0]["Price"] == 10.5
+
+    # container อื่นเขียนสินค้า (patch snapshot ใน Object Storage โดยตรง)
+    catalog = test_client.app.dependency_overrides[main.get_catalog]()
+    other = {
+        "ProductID": "other-container",
+        "Name": "Basic Hoodie",
+        "Price": 20,
+        "Stock": 1,
+        "Category": "Apparel",
+        "CreatedAt": "2024-01-01T00:00:00+00:00",
+        "UpdatedAt": "2024-01-01T00:00:00+00:00",
+        "Version": 1,
+    }
+    catalog.patch(product=other)
+
+    # แก้เฉพาะชิ้นที่เปลี่ยน ไม่สร้าง index ใหม่ทั้งหมด
+    def no_load(products):
+        raise AssertionError("should apply only the changed products")
+
+    monkeypatch.setattr(main.search_index, "load", no_load)
+    upserts = []
+    original_upsert = main.search_index.upsert
+    monkeypatch.setattr(
+        main.search_index,
+        "upsert",
+        lambda product: upserts.append(product["ProductID"])
+        or original_upsert(product),
+    )
+    # cache ของ container นี้หมดอายุ -> ค้นหาครั้งถัดไปต้องเห็นสินค้าใหม่
+    main.catalog_cache.clear()
+    hits = test_client.get("/products/search", params={"q": "basic"}).json()
+    assert {h["ProductID"] for h in hits} == {product_id, "other-container"}
+    assert upserts == ["other-container"]
+
+    # container นี้เขียนเอง -> index ขยับไปที่ snapshot ใหม่ทันที (ไม่ต้อง sync)
+    upserts.clear()
+    mine = _create_product(test_client, "Basic Cap", "Apparel")
+    assert upserts == [mine]
+    assert main.search_index.source == catalog.get().etag
+    hits = test_client.get("/products/search", params={"q": "basic"}).json()
+    assert len(hits) == 3 and upserts == [mine]
+
+
+def test_search_index_loads_once_for_concurrent_requests(
+    test_client, mock_dynamodb_table
+):
+    """ค้นหาพร้อมกันตอน index ยังไม่พร้อม -> โหลด Catalog Snapshot ครั้งเดียว"""
+    import asyncio
+
+    from services.product_service.app import main
+
+    _create_product(test_client, "Shirt", "Apparel")
+    catalog = test_client.app.dependency_overrides[main.get_catalog]()
+    table = test_client.app.dependency_overrides[main.get_db_table]()
+    loads = []
+    original_load = main.search_index.load
+
+    def counting_load(products):
+        loads.append(1)
+        original_load(products)
+
+    main.search_index.load = counting_load
+    try:
+
+        async def search_concurrently():
+            await asyncio.gather(
+                *(
+                    main.ensure_search_index(main.search_index, table, catalog)
+                    for _ in range(5)
+                )
+            )
+
+        asyncio.run(search_concurrently())
+    finally:
+        del main.search_index.load
+    assert len(loads) == 1
+    assert main.search_index.search("shirt", 10)
+
+
+def test_search_route_is_not_a_product_id(test_client):
+    """/products/search ต้องไม่ถูกจับเป็น /products/{product_id}"""
+    response = test_client.get("/products/search")
+    assert response.status_code == 422  # ไม่ได้ส่ง q
+
+
+def test_catalog_snapshot_built_once_then_patched(
+    test_client, mock_dynamodb_table, monkeypatch
+):
+    """เทส /products/snapshot: สร้างครั้งแรกจาก Table แล้วหลังจากนั้นแก้ตามการเขียน"""
+    shirt = _create_product(test_client, "Shirt", "Apparel")
+    mug = _create_product(test_client, "Mug", "Kitchen")
+
+    first = test_client.get("/products/snapshot")
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    snapshot = first.json()
+    assert snapshot["Version"] == 1 and snapshot["Count"] == 2
+    assert [p["ProductID"] for p in snapshot["Categories"]["Apparel"]] == [shirt]
+
+    # ETag เดิม -> 304
+    cached = test_client.get(
+        "/products/snapshot", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert cached.status_code == 304
+
+    # หลังจากนี้อ่าน snapshot ต้องไม่ scan Table อีก
+    def no_scan(**kwargs):
+        raise AssertionError("snapshot reads must not scan the table")
+
+    monkeypatch.setattr(mock_dynamodb_table.client, "scan", no_scan)
+
+    apron = _create_product(test_client, "Apron", "Kitchen")
+    test_client.put(
+        f"/products/{mug}",
+        json={"Name": "Mug", "Price": 3, "Stock": 1, "Category": "Homeware"},
+    )
+    test_client.delete(f"/products/{shirt}")
+
+    snapshot = test_client.get("/products/snapshot").json()
+    assert snapshot["Version"] == 4 and snapshot["Count"] == 2
+    assert list(snapshot["Categories"]) == [
+        "Homeware",
+        "Kitchen",
+    ]  # Apparel ว่าง -> หายไป
+    assert [p["ProductID"] for p in snapshot["Categories"]["Kitchen"]] == [apron]
+    assert snapshot["Categories"]["Homeware"][0]["Price"] == 3.0
+    # Stock / Version เปลี่ยนได้โดยไม่ผ่าน ProductService (Order) -> ไม่อยู่ใน snapshot
+    assert not {"Stock", "Version"} & set(snapshot["Categories"]["Homeware"][0])
+
+
+def test_catalog_snapshot_without_gzip(test_client):
+    """Client ที่ไม่รับ gzip -> ส่ง JSON ธรรมดา"""
+    _create_product(test_client, "Shirt", "Apparel")
+    response = test_client.get(
+        "/products/snapshot", headers={"Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.json()["Count"] == 1
+
+    # gzip;q=0 = ปฏิเสธ gzip
+    refused = test_client.get(
+        "/products/snapshot", headers={"Accept-Encoding": "gzip;q=0, br"}
+    )
+    assert "Content-Encoding" not in refused.headers
+    assert refused.json()["Count"] == 1
+
+
+def test_accepts_gzip_reads_q_values():
+    """เทส accepts_gzip: q=0 = ปฏิเสธ / * ครอบคลุม gzip ถ้าไม่ได้ระบุ gzip ตรงๆ"""
+    from services.product_service.app.main import accepts_gzip
+
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, GZIP;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip(None)
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("gzip; q=0.000, *")
+    assert not accepts_gzip("*;q=0")
+    assert not accepts_gzip("gzip;q=0, *;q=1")
+
+
+def test_catalog_rebuild_is_conditional(tmp_path):
+    """rebuild ชนกับคนอื่นที่เขียนแทรก -> อ่านใหม่แล้วเขียนต่อจาก Version ของเขา"""
+    from services.product_service.app.catalog import CatalogSnapshots, decode_snapshot
+    from ecom_shared.storage import LocalObjectStore
+
+    def product(product_id):
+        return {"ProductID": product_id, "Name": product_id, "Category": "C"}
+
+    store = LocalObjectStore(str(tmp_path))
+    puts = []
+
+    class RacingStore:
+        """put ครั้งแรก: อีก container สร้าง snapshot ไปก่อน"""
+
+        def get(self, key):
+            return store.get(key)
+
+        def put(self, key, data, **kwargs):
+            puts.append(kwargs)
+            if len(puts) == 1:
+                CatalogSnapshots(store, to_public=dict).rebuild([product("P1")])
+            return store.put(key, data, **kwargs)
+
+    CatalogSnapshots(RacingStore(), to_public=dict).rebuild([product("P2")])
+
+    # ครั้งแรกยังไม่มี snapshot -> If-None-Match / ครั้งที่สอง -> If-Match ของอีกคน
+    assert puts[0]["if_none_match"] is True and puts[0]["if_match"] is None
+    assert puts[1]["if_match"] is not None
+    snapshot = decode_snapshot(store.get("catalog/snapshot.json.gz").data)
+    assert snapshot["Version"] == 2
+    assert [p["ProductID"] for p in snapshot["Categories"]["C"]] == ["P2"]
+
+
+def test_catalog_patch_retries_on_concurrent_write(tmp_path):
+    """มีคนเขียน snapshot แทรกระหว่างอ่าน-เขียน -> อ่านใหม่แล้ว patch ซ้ำ (ไม่ทับของเขา)"""
+    from services.product_service.app.catalog import CatalogSnapshots, decode_snapshot
+    from ecom_shared.storage import LocalObjectStore
+
+    def product(product_id, name):
+        return {"ProductID": product_id, "Name": name, "Category": "C"}
+
+    store = LocalObjectStore(str(tmp_path))
+    catalog = CatalogSnapshots(store, to_public=dict)
+    catalog.rebuild([product("P1", "One")])
+
+    class RacingStore:
+        """put ครั้งแรก: ให้อีก container patch แทรกเข้ามาก่อน"""
+
+        raced = False
+
+        def get(self, key):
+            return store.get(key)
+
+        def put(self, key, data, **kwargs):
+            if not self.raced:
+                self.raced = True
+                CatalogSnapshots(store, to_public=dict).patch(product("P2", "Two"))
+            return store.put(key, data, **kwargs)
+
+    assert CatalogSnapshots(RacingStore(), to_public=dict).patch(product("P3", "Three"))
+
+    snapshot = decode_snapshot(store.get(catalog.key).data)
+    assert snapshot["Version"] == 3
+    assert [p["ProductID"] for p in snapshot["Categories"]["C"]] == ["P1", "P3", "P2"]
+
+
+def _shard_stock(shards_table, product_id):
+    items = shards_table.query(
+        KeyConditionExpression="ProductID = :pid",
+        ExpressionAttributeValues={":pid": product_id},
+    )["Items"]
+    return [item["Stock"] for item in sorted(items, key=lambda i: i["Shard"])]
+
+
+def test_stock_shards_enable_aggregate_and_disable(
+    test_client, mock_dynamodb_table, mock_stock_shards_table
+):
+    """เทสเปิด shard -> Stock ที่อ่านได้ = ผลรวมทุก shard -> แก้ Stock -> ปิด shard"""
+    body = {"Name": "Hot", "Price": 99.0, "Stock": 10, "Category": "Sale"}
+    product_id = test_client.post("/products", json=body).json()["ProductID"]
+
+    response = test_client.put(
+        f"/products/{product_id}/stock-shards", json={"Shards": 3}
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "ProductID": product_id,
+        "Shards": 3,
+        "Stock": 10,
+        "ShardStock": [4, 3, 3],
+    }
+
+    # Order ตัด Stock ที่ shard (ไม่แตะ Item ของสินค้า)
+    mock_stock_shards_table.update_item(
+        Key={"ProductID": product_id, "Shard": 1},
+        UpdateExpression="SET Stock = Stock - :qty",
+        ExpressionAttributeValues={":qty": 3},
+    )
+    assert test_client.get(f"/products/{product_id}").json()["Stock"] == 7
+    assert test_client.get("/products").json()[0]["Stock"] == 7
+    batch = test_client.post("/products/batch-get", json={"ProductIDs": [product_id]})
+    assert batch.json()["Products"][0]["Stock"] == 7
+    streamed = test_client.get("/products", params={"stream": "true"})
+    assert json.loads(streamed.text.splitlines()[0])["Stock"] == 7
+
+    # PUT สินค้า -> Stock ใหม่แบ่งลงทุก shard (Transaction เดียวกับการแก้สินค้า)
+    etag = test_client.get(f"/products/{product_id}").headers["ETag"]
+    response = test_client.put(
+        f"/products/{product_id}",
+        json={**body, "Name": "Hotter", "Stock": 20},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["Stock"] == 20
+    assert response.headers["ETag"] != etag
+    assert _shard_stock(mock_stock_shards_table, product_id) == [7, 7, 6]
+    # Stock ไม่ถูกเขียนลง Item ของสินค้า (ยังเป็นค่าตอนเปิด shard)
+    item = mock_dynamodb_table.get_item(Key={"ProductID": product_id})["Item"]
+    assert item["Name"] == "Hotter" and item["Stock"] == 10
+
+    # If-Match เก่า -> 412 และไม่แตะทั้งสินค้าและ shard
+    stale = test_client.put(
+        f"/products/{product_id}",
+        json={**body, "Stock": 99},
+        headers={"If-Match": etag},
+    )
+    assert stale.status_code == 412
+    assert _shard_stock(mock_stock_shards_table, product_id) == [7, 7, 6]
+
+    # ปิด shard -> Stock กลับไปอยู่ใน Item ของสินค้า
+    response = test_client.put(
+        f"/products/{product_id}/stock-shards", json={"Shards": 1}
+    )
+    assert response.json()["ShardStock"] == [20]
+    item = mock_dynamodb_table.get_item(Key={"ProductID": product_id})["Item"]
+    assert item["Stock"] == 20
+    assert "StockShards" not in item
+    assert _shard_stock(mock_stock_shards_table, product_id) == []
+
+    assert (
+        test_client.put(
+            "/products/PROD-NOPE/stock-shards", json={"Shards": 2}
+        ).status_code
+        == 404
+    )
+    assert (
+        test_client.put(
+            f"/products/{product_id}/stock-shards", json={"Shards": 0}
+        ).status_code
+        == 422
+    )
+
+
+def test_stock_shards_catalog_export_and_import_use_shard_totals(
+    test_client, mock_dynamodb_table, mock_stock_shards_table
+):
+    """สินค้าที่แบ่ง shard: export ใช้ Stock รวม / snapshot ไม่มี Stock / import ไม่ทำให้ shard หาย"""
+    body = {"Name": "Hot", "Price": 99.0, "Stock": 10, "Category": "Sale"}
+    product_id = test_client.post("/products", json=body).json()["ProductID"]
+    test_client.put(f"/products/{product_id}/stock-shards", json={"Shards": 2})
+    mock_stock_shards_table.update_item(
+        Key={"ProductID": product_id, "Shard": 0},
+        UpdateExpression="SET Stock = Stock - :qty",
+        ExpressionAttributeValues={":qty": 4},
+    )
+
+    # snapshot ไม่มี Stock (อ่านสดจาก batch-get) / export ใช้ Stock รวมจาก shard
+    snapshot = test_client.get("/products/snapshot").json()
+    assert "Stock" not in snapshot["Categories"]["Sale"][0]
+    live = test_client.post("/products/batch-get", json={"ProductIDs": [product_id]})
+    assert live.json()["Products"][0]["Stock"] == 6
+    exported = json.loads(test_client.get("/products/export").text.splitlines()[0])
+    assert exported["Stock"] == 6
+
+    # แก้ราคา -> patch snapshot (ยังไม่มี Stock)
+    test_client.put(
+        f"/products/{product_id}",
+        json={"Name": "Hot", "Price": 79.0, "Stock": 6, "Category": "Sale"},
+    )
+    snapshot = test_client.get("/products/snapshot").json()
+    assert snapshot["Categories"]["Sale"][0]["Price"] == 79.0
+    assert "Stock" not in snapshot["Categories"]["Sale"][0]
+
+    # import ทับ -> ยังแบ่ง shard อยู่ และ Stock ใหม่ไปแบ่งลง shard
+    record = {**body, "ProductID": product_id, "Stock": 30}
+    report = test_client.post("/products/import", content=json.dumps(record)).json()
+    assert report["Imported"] == 1
+    item = mock_dynamodb_table.get_item(Key={"ProductID": product_id})["Item"]
+    assert item["StockShards"] == 2
+    assert _shard_stock(mock_stock_shards_table, product_id) == [15, 15]
+    assert test_client.get(f"/products/{product_id}").json()["Stock"] == 30
+
+
+def test_stock_shards_rebalance(test_client, mock_stock_shards_table):
+    """เทสเกลี่ย Stock: ทีละสินค้า (API) และทุกสินค้า (ตามรอบเวลา)"""
+    from services.product_service.app import inventory
+
+    body = {"Name": "Hot", "Price": 99.0, "Stock": 8, "Category": "Sale"}
+    product_ids = [
+        test_client.post("/products", json=body).json()["ProductID"] for _ in range(2)
+    ]
+    for product_id in product_ids:
+        test_client.put(f"/products/{product_id}/stock-shards", json={"Shards": 4})
+        # shard ที่โดนสุ่มตัดบ่อยหมดก่อน
+        for shard, stock in enumerate([0, 0, 1, 7]):
+            mock_stock_shards_table.put_item(
+                Item={"ProductID": product_id, "Shard": shard, "Stock": stock}
+            )
+
+    response = test_client.post(f"/products/{product_ids[0]}/stock-shards/rebalance")
+    assert response.status_code == 200
+    assert response.json()["ShardStock"] == [2, 2, 2, 2]
+
+    result = inventory.rebalance_all(mock_stock_shards_table)
+    assert result == {"Products": 2, "Rebalanced": 1, "Failed": 0}
+    assert _shard_stock(mock_stock_shards_table, product_ids[1]) == [2, 2, 2, 2]
+
+    # ลบสินค้า -> shard ถูกลบตามไปด้วย
+    assert test_client.delete(f"/products/{product_ids[1]}").status_code == 204
+    assert _shard_stock(mock_stock_shards_table, product_ids[1]) == []
@@ -0,0 +1 @@
+"""โค้ดที่ใช้ร่วมกันระหว่าง Service (deploy เป็น Lambda Layer: SharedLayer)"""
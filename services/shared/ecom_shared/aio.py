@@ -0,0 +1,280 @@
+"""
+DynamoDB แบบ async (ใช้กับ endpoint ที่เป็น `async def`)
+
+มี 2 backend (เลือกด้วย DYNAMO_ASYNC_BACKEND):
+- "thread" (ค่าเริ่มต้น): เรียก botocore client ตัวเดียวกับฝั่ง sync ผ่าน asyncio.to_thread
+  ไม่ต้องมี dependency เพิ่ม -> cold start ของ Lambda ไม่เพิ่ม
+  (บน Lambda 1 container รับทีละ 1 request อยู่แล้ว แต่ fan-out ด้วย gather ยังได้ประโยชน์)
+- "aiobotocore": I/O แบบ non-blocking จริง (ไม่กิน thread ระหว่างรอ DynamoDB)
+  เหมาะกับตอนรันบน ASGI server (uvicorn ฯลฯ) ที่รับหลาย request พร้อมกัน
+  ต้องติดตั้ง aiobotocore เพิ่ม (import เฉพาะตอนใช้จริง)
+
+API หน้าตาเหมือน DynamoClient / DynamoTable ฝั่ง sync แต่ต้อง `await`
+"""
+
+import asyncio
+import contextlib
+import os
+import random
+import time
+
+from botocore.exceptions import ClientError
+
+from .dynamo import (
+    BATCH_GET_BASE_DELAY_SECONDS,
+    BATCH_GET_CHUNK_SIZE,
+    BATCH_GET_MAX_RETRIES,
+    DynamoClient,
+    DynamoTable,
+    _transform_request,
+    _transform_response,
+    client_config,
+)
+from .errors import Throttled, translate_error
+from .metrics import current_metrics
+
+ASYNC_BACKENDS = ("thread", "aiobotocore")
+
+
+class AsyncDynamoClient:
+    """
+    Client แบบ async (รับ/คืนค่าเป็น Python ธรรมดา เหมือน DynamoClient)
+    - backend="thread": ใช้ `sync_client` (DynamoClient) ผ่าน asyncio.to_thread
+    - backend="aiobotocore": สร้าง aiobotocore client ตอนใช้ครั้งแรก (1 ตัวต่อ event loop)
+    """
+
+    def __init__(
+        self, backend: str | None = None, sync_client: DynamoClient | None = None
+    ):
+        self.backend = backend or os.environ.get("DYNAMO_ASYNC_BACKEND", "thread")
+        if self.backend not in ASYNC_BACKENDS:
+            raise ValueError(f"Unsupported async backend: {self.backend}")
+        self.sync_client = sync_client or DynamoClient()
+
+        self._raw = None
+        self._raw_loop = None
+        self._exit_stack = None
+        self._lock = None
+
+    def _open_raw(self):
+        """context manager ที่สร้าง aiobotocore client (import ตอนใช้จริง)"""
+        from aiobotocore.session import get_session
+
+        return get_session().create_client("dynamodb", config=client_config())
+
+    async def _get_raw(self):
+        """aiobotocore client ของ event loop ปัจจุบัน (สร้างครั้งเดียวต่อ loop)"""
+        loop = asyncio.get_running_loop()
+        if self._raw_loop is not loop:
+            # client ของ aiobotocore ผูกกับ event loop -> loop ใหม่ต้องสร้างใหม่
+            # (ปิดตัวเก่าก่อน ไม่งั้น connection ของ loop เก่าค้างไว้ทุกครั้งที่เปลี่ยน loop)
+            old_stack, old_loop = self._exit_stack, self._raw_loop
+            self._raw = self._exit_stack = None
+            self._raw_loop, self._lock = loop, asyncio.Lock()
+            if old_stack is not None:
+                await self._close_stack(old_stack, old_loop)
+        if self._raw is None:
+            async with self._lock:
+                if self._raw is None:
+                    self._exit_stack = contextlib.AsyncExitStack()
+                    self._raw = await self._exit_stack.enter_async_context(
+                        self._open_raw()
+                    )
+        return self._raw
+
+    @staticmethod
+    async def _close_stack(stack: contextlib.AsyncExitStack, loop):
+        """
+        ปิด client ของ loop เก่า
+        loop เก่ายังรันอยู่ (thread อื่น) -> ส่งไปปิดใน loop นั้น / ปิดไปแล้ว -> ปิดใน loop นี้
+        """
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(stack.aclose(), loop)
+            return
+        try:
+            await stack.aclose()
+        except Exception as e:
+            print(f"!!! CLOSING STALE AIOBOTOCORE CLIENT FAILED: {repr(e)}")
+
+    async def close(self):
+        """ปิด connection ของ aiobotocore (เรียกตอน shutdown ของ ASGI app ผ่าน close_async_client)"""
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._raw = self._raw_loop = self._exit_stack = self._lock = None
+
+    async def _call(self, operation: str, **params):
+        if self.backend == "thread":
+            return await asyncio.to_thread(
+                getattr(self.sync_client, operation), **params
+            )
+
+        raw = await self._get_raw()
+        metrics = current_metrics()
+        if metrics is not None:
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+            started = time.perf_counter()
+        response = None
+        try:
+            response = await getattr(raw, operation)(**_transform_request(params))
+        except ClientError as e:
+            raise translate_error(e) from e
+        finally:
+            if metrics is not None:
+                metrics.record_dynamo_call(
+                    operation, time.perf_counter() - started, response
+                )
+        return _transform_response(response)
+
+    async def get_item(self, **params):
+        return await self._call("get_item", **params)
+
+    async def put_item(self, **params):
+        return await self._call("put_item", **params)
+
+    async def update_item(self, **params):
+        return await self._call("update_item", **params)
+
+    async def delete_item(self, **params):
+        return await self._call("delete_item", **params)
+
+    async def query(self, **params):
+        return await self._call("query", **params)
+
+    async def scan(self, **params):
+        return await self._call("scan", **params)
+
+    async def batch_get_item(self, **params):
+        return await self._call("batch_get_item", **params)
+
+    async def transact_write_items(self, **params):
+        return await self._call("transact_write_items", **params)
+
+
+_shared_client: AsyncDynamoClient | None = None
+
+
+def get_async_client() -> AsyncDynamoClient:
+    """
+    AsyncDynamoClient ตัวเดียวทั้ง process (สร้างตอนใช้ครั้งแรก)
+    ทุก Table / ทุก Service ใน process เดียวกันใช้ connection pool ชุดเดียวกัน
+    (สำคัญตอนรวมหลาย Service ไว้ใน process เดียว - ดู services/gateway)
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncDynamoClient()
+    return _shared_client
+
+
+async def close_async_client():
+    """ปิด client ที่ใช้ร่วมกันทั้ง process (ยังไม่เคยสร้าง -> ไม่ทำอะไร)"""
+    if _shared_client is not None:
+        await _shared_client.close()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """
+    Lifespan ของ FastAPI app แต่ละ Service: ปิด client ที่ใช้ร่วมกันตอน shutdown
+    (Gateway รับ lifespan เองแล้วเรียก close_async_client - ดู services/gateway)
+    """
+    yield
+    await close_async_client()
+
+
+class AsyncDynamoTable:
+    """Table เดียวแบบ async (คู่กับ DynamoTable ฝั่ง sync)"""
+
+    def __init__(self, name: str, client: AsyncDynamoClient | None = None):
+        self.name = name
+        self.client = client or get_async_client()
+
+    @classmethod
+    def from_sync(cls, table: DynamoTable) -> "AsyncDynamoTable":
+        """ห่อ DynamoTable (sync) ที่มีอยู่แล้วด้วย backend "thread" (เช่น Table จำลองในเทส)"""
+        return cls(table.name, AsyncDynamoClient("thread", table.client))
+
+    @property
+    def sync(self) -> DynamoTable:
+        """Table เดียวกันแบบ sync (สำหรับงานที่รันใน thread เช่น bulk import/export)"""
+        return DynamoTable(self.name, self.client.sync_client)
+
+    async def get_item(self, **params):
+        return await self.client.get_item(TableName=self.name, **params)
+
+    async def put_item(self, **params):
+        return await self.client.put_item(TableName=self.name, **params)
+
+    async def update_item(self, **params):
+        return await self.client.update_item(TableName=self.name, **params)
+
+    async def delete_item(self, **params):
+        return await self.client.delete_item(TableName=self.name, **params)
+
+    async def query(self, **params):
+        return await self.client.query(TableName=self.name, **params)
+
+    async def scan(self, **params):
+        return await self.client.scan(TableName=self.name, **params)
+
+
+async def aiter_pages(operation, start_key: dict | None = None, **kwargs):
+    """
+    (async) เดินทีละหน้าของ scan/query โดยใช้ LastEvaluatedKey
+    yield (items, last_evaluated_key) ทีละหน้า
+    """
+    while True:
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
+        response = await operation(**kwargs)
+        start_key = response.get("LastEvaluatedKey")
+        yield response.get("Items", []), start_key
+        if not start_key:
+            break
+
+
+async def _batch_get_chunk(table: AsyncDynamoTable, request_items: dict) -> list:
+    """BatchGetItem 1 ก้อน (<= 100 Key) + retry UnprocessedKeys แบบ backoff"""
+    items = []
+    for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+        response = await table.client.batch_get_item(RequestItems=request_items)
+        items.extend(response.get("Responses", {}).get(table.name, []))
+
+        request_items = response.get("UnprocessedKeys") or {}
+        if not request_items:
+            return items
+        if attempt < BATCH_GET_MAX_RETRIES:
+            # โดน throttle -> รอแบบ exponential backoff (full jitter) โดยไม่บล็อก loop
+            await asyncio.sleep(
+                random.uniform(0, BATCH_GET_BASE_DELAY_SECONDS * 2**attempt)
+            )
+    raise Throttled(
+        {
+            "Error": {
+                "Code": "ProvisionedThroughputExceededException",
+                "Message": "BatchGetItem still has unprocessed keys",
+            }
+        },
+        "BatchGetItem",
+    )
+
+
+async def batch_get_items(
+    table: AsyncDynamoTable, keys: list[dict], **get_kwargs
+) -> list[dict]:
+    """
+    (async) ดึงหลาย Item ด้วย BatchGetItem
+    แบ่งทีละ 100 Key แล้วยิงทุกก้อน "พร้อมกัน" ด้วย asyncio.gather
+    """
+    chunks = [
+        {
+            table.name: {
+                "Keys": keys[start : start + BATCH_GET_CHUNK_SIZE],
+                **get_kwargs,
+            }
+        }
+        for start in range(0, len(keys), BATCH_GET_CHUNK_SIZE)
+    ]
+    results = await asyncio.gather(
+        *(_batch_get_chunk(table, chunk) for chunk in chunks)
+    )
+    return [item for items in results for item in items]
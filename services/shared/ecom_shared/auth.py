@@ -0,0 +1,328 @@
+"""
+ดึง Claims ของ User ที่ล็อกอิน (sub, email ฯลฯ) จาก request
+
+เลือกวิธีด้วย AUTH_MODE:
+- "apigateway" (ค่าเริ่มต้น): API Gateway (Cognito Authorizer) ตรวจ JWT ให้แล้ว
+  Mangum เก็บ event ของ Lambda ไว้ใน request.scope["aws.event"] -> อ่าน Claims จากตรงนั้น
+- "jwt": รันเป็น container / ASGI server ทั่วไป (ไม่มี API Gateway) -> ตรวจ JWT เองใน process
+    Authorization: Bearer <token>  (RS256, ลายเซ็นตรวจด้วย JWKS ของ Cognito)
+    COGNITO_ISSUER=https://cognito-idp.<region>.amazonaws.com/<user-pool-id>
+    COGNITO_AUDIENCE=<app-client-id>[,<app-client-id>...]
+    JWKS_URL=...                     (ค่าเริ่มต้น <issuer>/.well-known/jwks.json)
+    JWKS_REFRESH_SECONDS=3600        (โหลด JWKS ใหม่เป็นระยะ รองรับการหมุน key)
+    TOKEN_CACHE_MAX_ITEMS=4096       (token ที่ตรวจผ่านแล้ว ไม่ต้องตรวจลายเซ็นซ้ำ)
+
+ต้องมี `cryptography` เฉพาะโหมด "jwt" (import ตอนใช้จริง)
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+import urllib.request
+from typing import Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from .cache import MISSING, TTLCache
+
+AUTH_MODES = ("apigateway", "jwt")
+# Cognito ใช้ RS256 อย่างเดียว (ไม่รับ alg อื่น กัน "alg": "none" / HS256 ปลอม)
+SUPPORTED_ALGORITHMS = ("RS256",)
+# ยอมให้นาฬิกาเหลื่อมกันได้เล็กน้อย (exp / nbf)
+CLOCK_LEEWAY_SECONDS = 30
+# kid ที่ไม่รู้จัก -> โหลด JWKS ใหม่ได้ไม่ถี่กว่านี้ (กันยิง token มั่วให้ไปโหลดรัวๆ)
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = 60
+JWKS_FETCH_TIMEOUT_SECONDS = 5
+
+
+class InvalidToken(Exception):
+    """ไม่มี token / token ผิดรูปแบบ / ลายเซ็นไม่ถูก / หมดอายุ / ไม่ได้ออกให้ระบบนี้"""
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64url_int(segment: str) -> int:
+    return int.from_bytes(_b64url_decode(segment), "big")
+
+
+def fetch_json(url: str) -> dict:
+    with urllib.request.urlopen(url, timeout=JWKS_FETCH_TIMEOUT_SECONDS) as response:
+        return json.loads(response.read())
+
+
+class JWKSCache:
+    """
+    Public key ของ Cognito (JWKS) เก็บไว้ใน process
+    - โหลดใหม่ทุก refresh_seconds (key ใหม่ที่ Cognito หมุนมาจะเห็นเอง)
+    - เจอ kid ที่ไม่รู้จัก -> โหลดใหม่ทันที (แต่ไม่ถี่กว่า min_refresh_interval)
+    fetch: ฟังก์ชันที่คืน JWKS (dict) - ในเทสส่ง key set ในเครื่องมาแทน
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], dict],
+        refresh_seconds: float = 3600,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL_SECONDS,
+        clock=time.monotonic,
+    ):
+        self._fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_interval = min_refresh_interval
+        self._clock = clock
+        self._keys: dict[str, object] = {}  # kid -> RSAPublicKey
+        self._loaded_at: float | None = None
+        # dependency แบบ sync รันใน threadpool -> หลาย thread อาจโหลดพร้อมกัน
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    @classmethod
+    def from_url(cls, url: str, refresh_seconds: float = 3600) -> "JWKSCache":
+        return cls(lambda: fetch_json(url), refresh_seconds)
+
+    def _refresh(self):
+        try:
+            self._load()
+        except Exception as e:
+            if not self._keys:
+                raise
+            # โหลดไม่ได้ (เช่น network) แต่มี key เดิมอยู่ -> ใช้ต่อไปก่อน แล้วค่อยลองใหม่รอบหน้า
+            print(f"!!! JWKS refresh failed, keeping cached keys: {e}")
+            self._loaded_at = self._clock()
+
+    def _load(self):
+        from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
+
+        keys = {}
+        for jwk in self._fetch().get("keys", []):
+            if jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig":
+                continue
+            numbers = RSAPublicNumbers(_b64url_int(jwk["e"]), _b64url_int(jwk["n"]))
+            keys[jwk["kid"]] = numbers.public_key()
+        self._keys = keys
+        self._loaded_at = self._clock()
+        self.refreshes += 1
+
+    def get_key(self, kid: str):
+        """Public key ของ kid นี้ (ไม่มี -> InvalidToken)"""
+        with self._lock:
+            now = self._clock()
+            age = None if self._loaded_at is None else now - self._loaded_at
+            if age is None or age >= self.refresh_seconds:
+                self._refresh()
+            elif kid not in self._keys and age >= self.min_refresh_interval:
+                self._refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidToken(f"Unknown signing key: {kid}")
+        return key
+
+
+class JWTVerifier:
+    """
+    ตรวจ JWT ของ Cognito ใน process (แทน Cognito Authorizer ของ API Gateway)
+    ตรวจ: alg, ลายเซ็น (JWKS), exp/nbf, iss, token_use และ aud (id token) / client_id (access token)
+    token ที่ผ่านแล้วเก็บใน LRU cache (ยังเช็ค exp ทุกครั้งที่ใช้)
+    """
+
+    def __init__(
+        self,
+        issuer: str,
+        audience: list[str],
+        jwks: JWKSCache,
+        token_cache: TTLCache | None = None,
+        clock=time.time,
+    ):
+        self.issuer = issuer
+        self.audience = set(audience)
+        self.jwks = jwks
+        self.token_cache = token_cache or TTLCache(max_items=4096, ttl_seconds=300)
+        self._clock = clock
+
+    def verify(self, token: str) -> dict:
+        """คืน Claims ของ token ที่ถูกต้อง (ไม่ถูกต้อง -> InvalidToken)"""
+        claims = self.token_cache.get(token)
+        if claims is MISSING:
+            claims = self._verify_signature(token)
+            self._check_claims(claims)
+            self.token_cache.set(token, claims)
+        elif claims["exp"] + CLOCK_LEEWAY_SECONDS < self._clock():
+            self.token_cache.invalidate(token)
+            raise InvalidToken("Token expired")
+        return claims
+
+    def _verify_signature(self, token: str) -> dict:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            header = json.loads(_b64url_decode(header_segment))
+            payload = json.loads(_b64url_decode(payload_segment))
+            signature = _b64url_decode(signature_segment)
+        except ValueError:
+            raise InvalidToken("Malformed token")
+        if not isinstance(header, dict) or not isinstance(payload, dict):
+            raise InvalidToken("Malformed token")
+
+        if header.get("alg") not in SUPPORTED_ALGORITHMS:
+            raise InvalidToken(f"Unsupported algorithm: {header.get('alg')}")
+        key = self.jwks.get_key(header.get("kid", ""))
+        try:
+            key.verify(
+                signature,
+                f"{header_segment}.{payload_segment}".encode(),
+                padding.PKCS1v15(),
+                hashes.SHA256(),
+            )
+        except InvalidSignature:
+            raise InvalidToken("Invalid signature")
+        return payload
+
+    def _check_claims(self, claims: dict):
+        now = self._clock()
+        if not isinstance(claims.get("exp"), (int, float)):
+            raise InvalidToken("Missing exp")
+        if claims["exp"] + CLOCK_LEEWAY_SECONDS < now:
+            raise InvalidToken("Token expired")
+        if claims.get("nbf", 0) - CLOCK_LEEWAY_SECONDS > now:
+            raise InvalidToken("Token not yet valid")
+        if claims.get("iss") != self.issuer:
+            raise InvalidToken("Invalid issuer")
+
+        # id token มี aud = App Client ID, access token มี client_id แทน
+        token_use = claims.get("token_use")
+        if token_use == "id":
+            audience = claims.get("aud")
+        elif token_use == "access":
+            audience = claims.get("client_id")
+        else:
+            raise InvalidToken(f"Unsupported token_use: {token_use}")
+        if audience not in self.audience:
+            raise InvalidToken("Invalid audience")
+
+
+def bearer_token(request: Request) -> str:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise InvalidToken("Missing bearer token")
+    return token.strip()
+
+
+# --- Authenticator: request -> Claims ---
+def api_gateway_claims(request: Request) -> dict:
+    """Claims ที่ Cognito Authorizer ของ API Gateway ตรวจแล้ว (ผ่าน Mangum)"""
+    try:
+        lambda_event = request.scope["aws.event"]
+        return lambda_event["requestContext"]["authorizer"]["jwt"]["claims"]
+    except KeyError:
+        raise InvalidToken("No authorizer claims in request")
+
+
+class LocalJWTAuthenticator:
+    """ตรวจ Bearer token เองด้วย JWTVerifier (โหมด container)"""
+
+    def __init__(self, verifier: JWTVerifier):
+        self.verifier = verifier
+
+    def __call__(self, request: Request) -> dict:
+        return self.verifier.verify(bearer_token(request))
+
+
+def authenticator_from_env() -> Callable[[Request], dict]:
+    mode = os.environ.get("AUTH_MODE", "apigateway")
+    if mode not in AUTH_MODES:
+        raise ValueError(f"Unsupported AUTH_MODE: {mode}")
+    if mode == "apigateway":
+        return api_gateway_claims
+
+    issuer = os.environ["COGNITO_ISSUER"].rstrip("/")
+    audience = [
+        client_id.strip()
+        for client_id in os.environ["COGNITO_AUDIENCE"].split(",")
+        if client_id.strip()
+    ]
+    jwks = JWKSCache.from_url(
+        os.environ.get("JWKS_URL", f"{issuer}/.well-known/jwks.json"),
+        refresh_seconds=float(os.environ.get("JWKS_REFRESH_SECONDS", "3600")),
+    )
+    token_cache = TTLCache(
+        max_items=int(os.environ.get("TOKEN_CACHE_MAX_ITEMS", "4096")),
+        ttl_seconds=float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", "300")),
+    )
+    return LocalJWTAuthenticator(JWTVerifier(issuer, audience, jwks, token_cache))
+
+
+# สร้างตอนใช้ครั้งแรก (เหมือน DynamoDB client) / เทสเปลี่ยนได้ด้วย set_authenticator()
+_authenticator: Callable[[Request], dict] | None = None
+
+
+def set_authenticator(authenticator: Callable[[Request], dict] | None):
+    """เปลี่ยนวิธีตรวจ (None = กลับไปเลือกจาก Environment ตอนใช้ครั้งถัดไป)"""
+    global _authenticator
+    _authenticator = authenticator
+
+
+def get_request_claims(request: Request) -> dict:
+    """Claims ของ request นี้ (ไม่มี / ไม่ถูกต้อง -> InvalidToken)"""
+    global _authenticator
+    claims = request.scope.get(CLAIMS_SCOPE_KEY)
+    if claims is not None:  # RequireAuthMiddleware ตรวจให้แล้ว
+        return claims
+    if _authenticator is None:
+        _authenticator = authenticator_from_env()
+    return _authenticator(request)
+
+
+# --- ยาม (แทน Cognito Authorizer ของ API Gateway ในโหมด container) ---
+CLAIMS_SCOPE_KEY = "auth.claims"
+
+
+class RequireAuthMiddleware:
+    """
+    ASGI middleware: ทุก path ต้องมี token ที่ถูกต้อง (ยกเว้น public_paths) ไม่งั้น 401
+    เหมือน Route ที่ตั้ง Authorizer: CognitoAuthorizer ใน template.yaml
+    """
+
+    def __init__(self, app, public_paths: frozenset[str] = frozenset()):
+        self.app = app
+        self.public_paths = public_paths
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"  # CORS preflight ไม่มี token
+            or scope["path"] in self.public_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            # อาจต้องโหลด JWKS (network) -> ไม่ block event loop
+            claims = await run_in_threadpool(get_request_claims, Request(scope))
+        except InvalidToken:
+            response = JSONResponse(
+                {"detail": "Unauthorized"},
+                status_code=401,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            await response(scope, receive, send)
+            return
+        scope[CLAIMS_SCOPE_KEY] = claims
+        await self.app(scope, receive, send)
+
+
+def protect(app: FastAPI, public_paths: tuple[str, ...] = ()):
+    """
+    บังคับล็อกอินทุก Route ของ app (ยกเว้น public_paths) เฉพาะ AUTH_MODE=jwt
+    บน Lambda (ค่าเริ่มต้น) API Gateway เป็นคนตรวจตาม template.yaml -> ไม่ทำอะไร
+    """
+    if os.environ.get("AUTH_MODE", "apigateway") != "jwt":
+        return
+    app.add_middleware(RequireAuthMiddleware, public_paths=frozenset(public_paths))
@@ -0,0 +1,89 @@
+"""
+Cache ใน memory ของ container (ใช้ซ้ำข้าม Lambda invocation ตอน warm)
+ใช้ร่วมกันหลาย Service เช่น product_service (สินค้า/Catalog), user_service (โปรไฟล์)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel สำหรับแยก "ไม่เจอใน cache" ออกจากค่า None
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache ใน memory แบบมีขนาดจำกัด (LRU) + หมดอายุ (TTL)
+    ออกแบบให้สร้างไว้ที่ module scope เพื่อใช้ซ้ำข้าม Lambda invocation (warm container)
+    """
+
+    def __init__(self, max_items: int, ttl_seconds: float, clock=time.monotonic):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        # FastAPI รัน endpoint แบบ sync ใน threadpool จึงต้องมี Lock
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0 and self.ttl_seconds > 0
+
+    def get(self, key):
+        """คืนค่าใน cache หรือ MISSING (ถ้าไม่มี/หมดอายุแล้ว)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+
+            self._data.move_to_end(key)  # ใช้ล่าสุด -> ย้ายไปท้าย
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            # เกินขนาด -> ทิ้งตัวที่ไม่ได้ใช้นานที่สุด (ต้นคิว)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """ล้างข้อมูลและตัวนับทั้งหมด"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,428 @@
+"""
+DynamoDB แบบเบา (ใช้ botocore client ตรงๆ แทน boto3.resource)
+
+ทำไมไม่ใช้ boto3.resource("dynamodb"):
+- import boto3 ลาก s3transfer และ resource model มาด้วย (หลายร้อย ms ตอน cold start)
+- resource ต้องโหลด resource model + สร้าง class ตอน runtime อีกรอบ
+
+ที่นี่จึงมี:
+- get_client(): สร้าง botocore client ครั้งแรกที่ถูกใช้จริง (lazy) แล้วใช้ซ้ำทั้ง process
+  (ตั้งค่า connection pool / keepalive / retry / timeout ได้จาก Environment Variable)
+- serialize()/deserialize(): แปลง Python <-> DynamoDB JSON (แทน TypeSerializer ของ boto3)
+- DynamoClient / DynamoTable: API หน้าตาเหมือน boto3 Table (Key=..., Item=...)
+  แต่ Expression ต้องเป็น string (ไม่รองรับ Key()/Attr() ของ boto3)
+  Error จะถูกแปลงเป็น class ใน ecom_shared.errors (เช่น ConditionalCheckFailed)
+  ระหว่าง request จะบันทึกเวลา/ConsumedCapacity ลง ecom_shared.metrics
+- build_update(): สร้าง UpdateExpression จาก dict (cache โครง Expression ไว้ใช้ซ้ำ)
+- batch_get_items(): BatchGetItem ทีละ 100 Key + retry UnprocessedKeys
+"""
+
+import functools
+import os
+import random
+import threading
+import time
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+from .errors import Throttled, translate_error
+from .metrics import current_metrics
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def client_config():
+    """
+    botocore Config ของ DynamoDB client (ปรับได้จาก Environment Variable)
+    - DYNAMO_MAX_POOL_CONNECTIONS: จำนวน connection สูงสุด (ควร >= จำนวน thread ที่ใช้พร้อมกัน)
+    - DYNAMO_TCP_KEEPALIVE:        เปิด TCP keepalive (กัน connection idle ถูกตัดระหว่าง invocation)
+    - DYNAMO_RETRY_MODE:           "adaptive" = retry + ชะลอฝั่ง client เองเมื่อโดน throttle
+    - DYNAMO_MAX_ATTEMPTS:         จำนวนครั้งสูงสุด (รวมครั้งแรก)
+    - DYNAMO_CONNECT_TIMEOUT / DYNAMO_READ_TIMEOUT: วินาที (ต้องน้อยกว่า Timeout ของ Lambda)
+    """
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=int(os.environ.get("DYNAMO_MAX_POOL_CONNECTIONS", "25")),
+        tcp_keepalive=os.environ.get("DYNAMO_TCP_KEEPALIVE", "true").lower() == "true",
+        retries={
+            "mode": os.environ.get("DYNAMO_RETRY_MODE", "adaptive"),
+            "max_attempts": int(os.environ.get("DYNAMO_MAX_ATTEMPTS", "5")),
+        },
+        connect_timeout=float(os.environ.get("DYNAMO_CONNECT_TIMEOUT", "2")),
+        read_timeout=float(os.environ.get("DYNAMO_READ_TIMEOUT", "5")),
+    )
+
+
+def get_client():
+    """botocore DynamoDB client (สร้างครั้งเดียวตอนถูกใช้ครั้งแรก แล้วใช้ซ้ำทั้ง process)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import botocore.session  # import เฉพาะตอนต้องใช้จริง
+
+                _client = botocore.session.get_session().create_client(
+                    "dynamodb", config=client_config()
+                )
+    return _client
+
+
+# --- Python <-> DynamoDB JSON ---
+def serialize(value) -> dict:
+    """แปลงค่า Python เป็น DynamoDB AttributeValue (เช่น "a" -> {"S": "a"})"""
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, bool):  # ต้องเช็คก่อน int (bool เป็น subclass ของ int)
+        return {"BOOL": value}
+    if isinstance(value, (int, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, float):
+        # เหมือน boto3: ไม่รับ float (ความแม่นยำหาย) ให้แปลงเป็น Decimal ก่อน
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(v, str) for v in value):
+            return {"SS": list(value)}
+        if all(isinstance(v, (int, Decimal)) for v in value):
+            return {"NS": [str(v) for v in value]}
+        if all(isinstance(v, (bytes, bytearray)) for v in value):
+            return {"BS": [bytes(v) for v in value]}
+        raise TypeError(f"Unsupported set type: {value!r}")
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize(v) for v in value]}
+    if isinstance(value, dict):
+        return {"M": {k: serialize(v) for k, v in value.items()}}
+    raise TypeError(f"Unsupported type: {type(value)}")
+
+
+def deserialize(attribute: dict):
+    """แปลง DynamoDB AttributeValue กลับเป็นค่า Python (ตัวเลขเป็น Decimal เหมือน boto3)"""
+    type_code, value = next(iter(attribute.items()))
+    if type_code == "S":
+        return value
+    if type_code == "N":
+        return Decimal(value)
+    if type_code == "BOOL":
+        return value
+    if type_code == "NULL":
+        return None
+    if type_code == "M":
+        return {k: deserialize(v) for k, v in value.items()}
+    if type_code == "L":
+        return [deserialize(v) for v in value]
+    if type_code == "B":
+        return value
+    if type_code == "SS":
+        return set(value)
+    if type_code == "NS":
+        return {Decimal(v) for v in value}
+    if type_code == "BS":
+        return set(value)
+    raise TypeError(f"Unsupported DynamoDB type: {type_code}")
+
+
+def serialize_item(item: dict) -> dict:
+    return {k: serialize(v) for k, v in item.items()}
+
+
+def deserialize_item(item: dict) -> dict:
+    return {k: deserialize(v) for k, v in item.items()}
+
+
+# Key ใน request/response ที่เป็น "Item" (map ของ AttributeValue)
+_ITEM_KEYS = {"Key", "Item", "ExclusiveStartKey", "ExpressionAttributeValues"}
+_RESPONSE_ITEM_KEYS = {"Key", "Item", "Attributes", "LastEvaluatedKey"}
+_RESPONSE_ITEM_LIST_KEYS = {"Items", "Keys"}
+
+
+def _transform_request(params):
+    """เดินทั้ง request แล้ว serialize เฉพาะส่วนที่เป็นข้อมูล (Key/Item/Values)"""
+    if isinstance(params, dict):
+        result = {}
+        for k, v in params.items():
+            if k in _ITEM_KEYS:
+                result[k] = serialize_item(v)
+            elif k == "Keys":
+                result[k] = [serialize_item(key) for key in v]
+            else:
+                result[k] = _transform_request(v)
+        return result
+    if isinstance(params, list):
+        return [_transform_request(v) for v in params]
+    return params
+
+
+def _transform_response(data):
+    """เดินทั้ง response แล้ว deserialize เฉพาะส่วนที่เป็นข้อมูล"""
+    if isinstance(data, dict):
+        result = {}
+        for k, v in data.items():
+            if k in _RESPONSE_ITEM_KEYS:
+                result[k] = deserialize_item(v)
+            elif k in _RESPONSE_ITEM_LIST_KEYS:
+                result[k] = [deserialize_item(item) for item in v]
+            elif k == "Responses":  # BatchGetItem: {table: [items]}
+                result[k] = {
+                    table: [deserialize_item(item) for item in items]
+                    for table, items in v.items()
+                }
+            elif k == "ResponseMetadata":
+                result[k] = v
+            else:
+                result[k] = _transform_response(v)
+        return result
+    if isinstance(data, list):
+        return [_transform_response(v) for v in data]
+    return data
+
+
+class DynamoClient:
+    """
+    ห่อ botocore client ให้รับ/คืนค่าเป็น Python ธรรมดา (เหมือน boto3 resource)
+    client=None -> ใช้ get_client() (สร้างแบบ lazy ครั้งเดียวต่อ process)
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def raw(self):
+        """botocore client ตัวจริง"""
+        if self._client is None:
+            self._client = get_client()
+        return self._client
+
+    def _call(self, operation: str, **params):
+        metrics = current_metrics()
+        if metrics is not None:
+            # อยู่ใน request ที่วัดอยู่ -> ขอ Capacity ที่ใช้ไปกลับมาด้วย
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+            started = time.perf_counter()
+        response = None
+        try:
+            response = getattr(self.raw, operation)(**_transform_request(params))
+        except ClientError as e:
+            raise translate_error(e) from e
+        finally:
+            if metrics is not None:
+                metrics.record_dynamo_call(
+                    operation, time.perf_counter() - started, response
+                )
+        return _transform_response(response)
+
+    def get_item(self, **params):
+        return self._call("get_item", **params)
+
+    def put_item(self, **params):
+        return self._call("put_item", **params)
+
+    def update_item(self, **params):
+        return self._call("update_item", **params)
+
+    def delete_item(self, **params):
+        return self._call("delete_item", **params)
+
+    def query(self, **params):
+        return self._call("query", **params)
+
+    def scan(self, **params):
+        return self._call("scan", **params)
+
+    def batch_get_item(self, **params):
+        return self._call("batch_get_item", **params)
+
+    def batch_write_item(self, **params):
+        return self._call("batch_write_item", **params)
+
+    def transact_write_items(self, **params):
+        return self._call("transact_write_items", **params)
+
+    def Table(self, name: str) -> "DynamoTable":
+        return DynamoTable(name, self)
+
+
+class DynamoTable:
+    """Table เดียว (ใช้แทน boto3 Table ได้ใน API ที่ Service เราใช้)"""
+
+    def __init__(self, name: str, client: DynamoClient | None = None):
+        self.name = name
+        self.client = client or DynamoClient()
+
+    def get_item(self, **params):
+        return self.client.get_item(TableName=self.name, **params)
+
+    def put_item(self, **params):
+        return self.client.put_item(TableName=self.name, **params)
+
+    def update_item(self, **params):
+        return self.client.update_item(TableName=self.name, **params)
+
+    def delete_item(self, **params):
+        return self.client.delete_item(TableName=self.name, **params)
+
+    def query(self, **params):
+        return self.client.query(TableName=self.name, **params)
+
+    def scan(self, **params):
+        return self.client.scan(TableName=self.name, **params)
+
+    def batch_writer(self, overwrite_by_pkeys: list[str] | None = None):
+        return BatchWriter(self, overwrite_by_pkeys)
+
+
+class BatchWriter:
+    """
+    เขียนทีละ 25 Item ด้วย BatchWriteItem (แทน boto3 batch_writer)
+    - retry UnprocessedItems แบบ exponential backoff
+    - overwrite_by_pkeys: Item ที่ Key ซ้ำใน buffer เดียวกัน เก็บเฉพาะตัวหลังสุด
+    """
+
+    FLUSH_AMOUNT = 25
+    MAX_RETRIES = 8
+    BASE_DELAY_SECONDS = 0.05
+
+    def __init__(self, table: DynamoTable, overwrite_by_pkeys: list[str] | None):
+        self._table = table
+        self._overwrite_by_pkeys = overwrite_by_pkeys
+        self._buffer: list[dict] = []
+
+    def put_item(self, Item: dict):
+        self._add({"PutRequest": {"Item": Item}})
+
+    def delete_item(self, Key: dict):
+        self._add({"DeleteRequest": {"Key": Key}})
+
+    def _add(self, request: dict):
+        if self._overwrite_by_pkeys:
+            self._remove_duplicate(request)
+        self._buffer.append(request)
+        if len(self._buffer) >= self.FLUSH_AMOUNT:
+            self._flush()
+
+    def _remove_duplicate(self, request: dict):
+        new_key = self._pkey(request)
+        self._buffer = [r for r in self._buffer if self._pkey(r) != new_key]
+
+    def _pkey(self, request: dict):
+        data = (
+            request.get("PutRequest", {}).get("Item") or request["DeleteRequest"]["Key"]
+        )
+        return tuple(data.get(k) for k in self._overwrite_by_pkeys)
+
+    def _flush(self):
+        request_items = {self._table.name: self._buffer[: self.FLUSH_AMOUNT]}
+        self._buffer = self._buffer[self.FLUSH_AMOUNT :]
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            response = self._table.client.batch_write_item(RequestItems=request_items)
+            request_items = response.get("UnprocessedItems") or {}
+            if not request_items:
+                return
+            if attempt < self.MAX_RETRIES:
+                time.sleep(random.uniform(0, self.BASE_DELAY_SECONDS * 2**attempt))
+        raise Throttled(
+            {
+                "Error": {
+                    "Code": "ProvisionedThroughputExceededException",
+                    "Message": "BatchWriteItem still has unprocessed items",
+                }
+            },
+            "BatchWriteItem",
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        while self._buffer:
+            self._flush()
+
+
+# --- Update Expression ---
+@functools.lru_cache(maxsize=256)
+def _update_template(
+    set_attrs: tuple[str, ...], add_attrs: tuple[str, ...]
+) -> tuple[str, tuple[tuple[str, str], ...]]:
+    """โครง Expression ของชุด Attribute นี้ (ชุดเดิมถูกใช้ซ้ำบ่อย -> cache ไว้)"""
+    names = []
+    clauses = []
+    if set_attrs:
+        parts = []
+        for i, attr in enumerate(set_attrs):
+            names.append((f"#s{i}", attr))
+            parts.append(f"#s{i} = :s{i}")
+        clauses.append("SET " + ", ".join(parts))
+    if add_attrs:
+        parts = []
+        for i, attr in enumerate(add_attrs):
+            names.append((f"#a{i}", attr))
+            parts.append(f"#a{i} :a{i}")
+        clauses.append("ADD " + ", ".join(parts))
+    return " ".join(clauses), tuple(names)
+
+
+def build_update(
+    set_values: dict, add_values: dict | None = None
+) -> tuple[str, dict, dict]:
+    """
+    สร้าง UpdateExpression จาก dict (ใช้ placeholder ทุกตัว -> ไม่ชน Reserved Keyword)
+    เช่น build_update({"Name": "A"}, {"Version": 1})
+      -> ("SET #s0 = :s0 ADD #a0 :a0", {"#s0": "Name", "#a0": "Version"}, {":s0": "A", ":a0": 1})
+    คืนค่า (expression, names, values)
+    """
+    add_values = add_values or {}
+    expression, names = _update_template(tuple(set_values), tuple(add_values))
+    values = {f":s{i}": value for i, value in enumerate(set_values.values())}
+    values.update({f":a{i}": value for i, value in enumerate(add_values.values())})
+    return expression, dict(names), values
+
+
+# --- Batch Read ---
+# BatchGetItem รับได้สูงสุด 100 Key ต่อครั้ง
+BATCH_GET_CHUNK_SIZE = 100
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BASE_DELAY_SECONDS = 0.05
+
+
+def batch_get_items(table: DynamoTable, keys: list[dict], **get_kwargs) -> list[dict]:
+    """
+    ดึงหลาย Item ด้วย BatchGetItem (แบ่งทีละ 100 Key)
+    และ retry เฉพาะ UnprocessedKeys แบบ exponential backoff + jitter
+    (retry ครบแล้วยังเหลือ -> Throttled)
+    """
+    items = []
+    for start in range(0, len(keys), BATCH_GET_CHUNK_SIZE):
+        request_items = {
+            table.name: {
+                "Keys": keys[start : start + BATCH_GET_CHUNK_SIZE],
+                **get_kwargs,
+            }
+        }
+
+        for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+            response = table.client.batch_get_item(RequestItems=request_items)
+            items.extend(response.get("Responses", {}).get(table.name, []))
+
+            request_items = response.get("UnprocessedKeys") or {}
+            if not request_items:
+                break
+            if attempt < BATCH_GET_MAX_RETRIES:
+                # โดน throttle -> รอแบบ exponential backoff (full jitter)
+                time.sleep(random.uniform(0, BATCH_GET_BASE_DELAY_SECONDS * 2**attempt))
+        else:
+            raise Throttled(
+                {
+                    "Error": {
+                        "Code": "ProvisionedThroughputExceededException",
+                        "Message": "BatchGetItem still has unprocessed keys",
+                    }
+                },
+                "BatchGetItem",
+            )
+    return items
@@ -0,0 +1,76 @@
+"""
+Error ของ DynamoDB แบบมีชนิด (typed)
+
+DynamoClient จะแปลง botocore ClientError เป็น class ด้านล่างให้อัตโนมัติ
+ทุกตัวยังเป็น subclass ของ ClientError (โค้ดเก่าที่ `except ClientError` ใช้ได้เหมือนเดิม)
+แต่ Service แยกกรณีได้ด้วย `except ConditionalCheckFailed` แทนการเทียบ Error Code เอง
+"""
+
+from botocore.exceptions import ClientError
+
+
+class DynamoError(ClientError):
+    """Error จาก DynamoDB ที่ไม่มีชนิดเฉพาะ"""
+
+    @property
+    def code(self) -> str:
+        return self.response.get("Error", {}).get("Code", "")
+
+
+class ConditionalCheckFailed(DynamoError):
+    """
+    ConditionExpression ไม่ผ่าน
+    `item` = Item เดิม (ถ้าเรียกด้วย ReturnValuesOnConditionCheckFailure="ALL_OLD")
+    None = ไม่มี Item นั้นอยู่เลย
+    """
+
+    @property
+    def item(self) -> dict | None:
+        from .dynamo import deserialize_item
+
+        item = self.response.get("Item")
+        return deserialize_item(item) if item else None
+
+
+class TransactionCanceled(DynamoError):
+    """Transaction ถูกยกเลิก (reasons เรียงตามลำดับ TransactItems)"""
+
+    @property
+    def reasons(self) -> list[str]:
+        """Code ของแต่ละ action เช่น ["None", "ConditionalCheckFailed"]"""
+        return [
+            reason.get("Code", "None")
+            for reason in self.response.get("CancellationReasons", [])
+        ]
+
+
+class Throttled(DynamoError):
+    """โดน throttle (retry ครบตาม retry mode แล้วก็ยังไม่ผ่าน)"""
+
+
+class ValidationFailed(DynamoError):
+    """Request ผิดรูปแบบ (เช่น Expression ผิด / ชนิดข้อมูลไม่ตรงกับ Key)"""
+
+
+class ResourceNotFound(DynamoError):
+    """ไม่มี Table/Index นั้น (มักเป็นปัญหาการตั้งค่า Environment)"""
+
+
+ERROR_TYPES: dict[str, type[DynamoError]] = {
+    "ConditionalCheckFailedException": ConditionalCheckFailed,
+    "TransactionCanceledException": TransactionCanceled,
+    "ProvisionedThroughputExceededException": Throttled,
+    "ThrottlingException": Throttled,
+    "RequestLimitExceeded": Throttled,
+    "ValidationException": ValidationFailed,
+    "ResourceNotFoundException": ResourceNotFound,
+}
+
+
+def translate_error(error: ClientError) -> DynamoError:
+    """แปลง ClientError ของ botocore เป็น DynamoError ชนิดที่ตรงกับ Error Code"""
+    if isinstance(error, DynamoError):
+        return error
+    code = error.response.get("Error", {}).get("Code", "")
+    error_type = ERROR_TYPES.get(code, DynamoError)
+    return error_type(error.response, error.operation_name)
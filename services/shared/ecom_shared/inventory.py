@@ -0,0 +1,102 @@
+"""
+Stock แบบแบ่ง shard (สำหรับสินค้าขายดี / Flash Sale)
+
+ปกติ Stock เป็น Attribute เดียวใน Item ของสินค้า -> ทุก Order ที่ซื้อสินค้าชิ้นเดียวกัน
+เขียน Item เดียวกันหมด (hot key) พอคนซื้อพร้อมกันมากๆ จะโดน throttle / Transaction ชนกัน
+
+สินค้าที่เปิดแบบ shard (Attribute StockShards = N ใน ProductsTable):
+Stock ถูกแบ่งไว้ใน StockShardsTable N Item -> (ProductID, Shard=0..N-1, Stock)
+- Order: สุ่ม shard มาตัด 1 ตัว (ไม่พอ -> อ่านทุก shard แล้วแบ่งตัดหลายตัว)
+  Transaction ของ Order ไม่แตะ Item ของสินค้าเลย (แม้แต่ ConditionCheck ก็ทำให้
+  Transaction ที่ซื้อสินค้าเดียวกันชนกันเอง) -> เช็คกับ ProductVersion ที่ shard แทน
+- ยกเลิก Order: คืน Stock เข้า shard ที่สุ่มได้ 1 ตัว
+- อ่าน: Stock ของสินค้า = ผลรวมของทุก shard
+- เกลี่ย (rebalance): ตามรอบเวลา ให้ทุก shard มี Stock ใกล้เคียงกัน
+
+ไฟล์นี้มีแค่ส่วนที่ทั้ง Product Service และ Order Service ใช้ร่วมกัน
+(การเปิด/ปิด/เกลี่ย shard อยู่ที่ product_service/app/inventory.py)
+"""
+
+import random
+
+# Attribute ใน ProductsTable: จำนวน shard (ไม่มี = Stock อยู่ใน Item ของสินค้าตามปกติ)
+SHARD_COUNT_ATTRIBUTE = "StockShards"
+# Attribute ใน StockShardsTable: Version ของสินค้าตอนเขียน shard ชุดนี้
+# (เขียนตอนเปิด/เปลี่ยน shard และตอนแก้สินค้า -> ราคา/จำนวน shard เปลี่ยนแล้ว Version ไม่ตรง)
+SHARD_VERSION_ATTRIBUTE = "ProductVersion"
+MAX_STOCK_SHARDS = 20
+
+
+def shard_key(product_id: str, shard: int) -> dict:
+    return {"ProductID": product_id, "Shard": shard}
+
+
+def split_stock(total: int, shard_count: int) -> list[int]:
+    """แบ่ง Stock ให้เท่าๆ กัน (เศษไปอยู่ที่ shard แรกๆ) เช่น 10 / 3 -> [4, 3, 3]"""
+    base, remainder = divmod(total, shard_count)
+    return [base + (1 if shard < remainder else 0) for shard in range(shard_count)]
+
+
+def random_shard(shard_count: int) -> int:
+    """สุ่ม shard (กระจาย Order ไปทุก Item เท่าๆ กัน)"""
+    return random.randrange(shard_count)
+
+
+def allocate(quantity: int, levels: dict[int, int]) -> dict[int, int] | None:
+    """
+    แบ่งจำนวนที่จะตัดไปหลาย shard (เริ่มจาก shard ที่เหลือมากสุด -> ใช้ shard น้อยที่สุด)
+    levels: {Shard: Stock} -> คืน {Shard: จำนวนที่ตัด} / None = รวมทุก shard ยังไม่พอ
+    """
+    allocation = {}
+    remaining = quantity
+    for shard, stock in sorted(levels.items(), key=lambda kv: (-kv[1], kv[0])):
+        if remaining <= 0:
+            break
+        if stock <= 0:
+            continue
+        taken = min(stock, remaining)
+        allocation[shard] = taken
+        remaining -= taken
+    return allocation if remaining <= 0 else None
+
+
+def shard_levels(items: list[dict]) -> dict[int, int]:
+    """Item ของ shard (จาก Query) -> {Shard: Stock}"""
+    return {int(item["Shard"]): int(item["Stock"]) for item in items}
+
+
+def reserve_action(
+    table_name: str, product_id: str, shard: int, quantity: int, version: int
+):
+    """
+    Action (สำหรับ TransactWriteItems) ที่ตัด Stock ของ shard เดียว
+    เงื่อนไข: ต้องเหลือพอ และ shard ยังเป็นของสินค้า Version ที่อ่านราคามา
+    """
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": shard_key(product_id, shard),
+            "UpdateExpression": "SET Stock = Stock - :qty",
+            "ConditionExpression": (
+                "attribute_exists(ProductID) AND Stock >= :qty AND #ver = :version"
+            ),
+            "ExpressionAttributeNames": {"#ver": SHARD_VERSION_ATTRIBUTE},
+            "ExpressionAttributeValues": {":qty": quantity, ":version": version},
+        }
+    }
+
+
+def release_action(table_name: str, product_id: str, shard: int, quantity: int):
+    """
+    Action (สำหรับ TransactWriteItems) ที่คืน Stock เข้า shard เดียว (เช่น ยกเลิก Order)
+    Stock ของทุก shard ใช้แทนกันได้ -> ไม่ต้องเช็ค Version (แค่ shard ต้องยังมีอยู่)
+    """
+    return {
+        "Update": {
+            "TableName": table_name,
+            "Key": shard_key(product_id, shard),
+            "UpdateExpression": "ADD Stock :qty",
+            "ConditionExpression": "attribute_exists(ProductID)",
+            "ExpressionAttributeValues": {":qty": quantity},
+        }
+    }
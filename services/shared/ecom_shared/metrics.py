@@ -0,0 +1,127 @@
+"""
+วัดเวลา / Capacity ของ DynamoDB ต่อ request แล้ว log เป็น CloudWatch Embedded Metric Format (EMF)
+
+- RequestMetrics ของ request ปัจจุบันเก็บใน contextvar
+  (ตามไปถึง thread ของ asyncio.to_thread / run_in_threadpool ด้วย)
+- DynamoClient ขอ ReturnConsumedCapacity="TOTAL" และบันทึกเวลา/Capacity ทุก call
+  ที่เกิดระหว่าง request (นอก request เช่นสคริปต์ seed -> ไม่ทำอะไร)
+- ฝั่ง HTTP (middleware + route) อยู่ใน ecom_shared.web.instrument()
+
+Log 1 บรรทัดต่อ request (CloudWatch Logs แปลงเป็น Metric ให้เอง ไม่ต้องเรียก PutMetricData):
+    {"_aws": {...}, "Service": "product_service", "Route": "GET /products/{product_id}",
+     "StatusCode": 200, "Latency": 12.3, "ValidationTime": 0.4, "DynamoTime": 9.8,
+     "SerializationTime": 0.6, "DynamoCalls": 1, "ConsumedRCU": 0.5, "ConsumedWCU": 0.0,
+     "ConsumedCapacity": {"ProductsTable": {"RCU": 0.5, "WCU": 0.0}}}
+
+ช่วงเวลา (ms):
+- ValidationTime:    รับ request -> ก่อนเข้า endpoint (parse/validate body, query, dependency)
+- DynamoTime:        รวมเวลาทุก call ไป DynamoDB (ถ้ายิงพร้อมกันด้วย gather อาจรวมแล้วเกิน Latency)
+- SerializationTime: endpoint return -> ส่ง response ครบ (response_model + JSON / stream)
+"""
+
+import contextvars
+import os
+import threading
+import time
+
+# ConsumedCapacity แบบ TOTAL บอกแค่ CapacityUnits -> แยก RCU/WCU จากชนิดของ operation
+READ_OPERATIONS = {"get_item", "query", "scan", "batch_get_item"}
+
+_current: contextvars.ContextVar["RequestMetrics | None"] = contextvars.ContextVar(
+    "request_metrics", default=None
+)
+
+
+class RequestMetrics:
+    """ตัวเลขของ request เดียว (เวลาเป็น time.perf_counter())"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.endpoint_started: float | None = None
+        self.endpoint_finished: float | None = None
+        self.finished: float | None = None
+        self.dynamo_seconds = 0.0
+        self.dynamo_calls = 0
+        self.capacity: dict[str, dict[str, float]] = {}
+        # call ไป DynamoDB อาจมาจากหลาย thread พร้อมกัน (gather + to_thread)
+        self._lock = threading.Lock()
+
+    def record_dynamo_call(self, operation: str, seconds: float, response: dict | None):
+        consumed = (response or {}).get("ConsumedCapacity") or []
+        if isinstance(consumed, dict):  # Batch/Transact คืนเป็น list, ที่เหลือเป็น dict
+            consumed = [consumed]
+        with self._lock:
+            self.dynamo_calls += 1
+            self.dynamo_seconds += seconds
+            for entry in consumed:
+                table = self.capacity.setdefault(
+                    entry.get("TableName", "unknown"), {"RCU": 0.0, "WCU": 0.0}
+                )
+                if "ReadCapacityUnits" in entry or "WriteCapacityUnits" in entry:
+                    table["RCU"] += entry.get("ReadCapacityUnits", 0.0)
+                    table["WCU"] += entry.get("WriteCapacityUnits", 0.0)
+                elif operation in READ_OPERATIONS:
+                    table["RCU"] += entry.get("CapacityUnits", 0.0)
+                else:
+                    table["WCU"] += entry.get("CapacityUnits", 0.0)
+
+    def timings_ms(self) -> dict[str, float]:
+        """Latency และเวลาแต่ละช่วง (ไม่ได้เข้า endpoint เช่น 422/404 -> นับเป็น validation ทั้งหมด)"""
+        finished = self.finished or time.perf_counter()
+        endpoint_started = self.endpoint_started or finished
+        endpoint_finished = self.endpoint_finished or finished
+        return {
+            "Latency": round((finished - self.started) * 1000, 3),
+            "ValidationTime": round((endpoint_started - self.started) * 1000, 3),
+            "DynamoTime": round(self.dynamo_seconds * 1000, 3),
+            "SerializationTime": round((finished - endpoint_finished) * 1000, 3),
+        }
+
+    def to_emf(self, service: str, route: str, status_code: int) -> dict:
+        """log 1 บรรทัดในรูปแบบ CloudWatch Embedded Metric Format"""
+        timings = self.timings_ms()
+        capacity = {
+            table: {unit: round(value, 3) for unit, value in units.items()}
+            for table, units in self.capacity.items()
+        }
+        metrics = [{"Name": name, "Unit": "Milliseconds"} for name in timings]
+        metrics += [
+            {"Name": "DynamoCalls", "Unit": "Count"},
+            {"Name": "ConsumedRCU", "Unit": "Count"},
+            {"Name": "ConsumedWCU", "Unit": "Count"},
+        ]
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": os.environ.get("METRICS_NAMESPACE", "Ecommerce"),
+                        "Dimensions": [["Service", "Route"]],
+                        "Metrics": metrics,
+                    }
+                ],
+            },
+            "Service": service,
+            "Route": route,
+            "StatusCode": status_code,
+            **timings,
+            "DynamoCalls": self.dynamo_calls,
+            "ConsumedRCU": round(sum(u["RCU"] for u in capacity.values()), 3),
+            "ConsumedWCU": round(sum(u["WCU"] for u in capacity.values()), 3),
+            "ConsumedCapacity": capacity,
+        }
+
+
+def current_metrics() -> RequestMetrics | None:
+    """RequestMetrics ของ request ปัจจุบัน (None = ไม่ได้อยู่ใน request ที่วัดอยู่)"""
+    return _current.get()
+
+
+def start_request() -> tuple[RequestMetrics, contextvars.Token]:
+    """เริ่มวัด request ใหม่ (คืน token ไว้ส่งให้ end_request)"""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token: contextvars.Token):
+    _current.reset(token)
@@ -0,0 +1,145 @@
+"""
+ทางลัดตอนส่ง Response (ใช้กับ endpoint ที่คืนหลาย Item เช่น list)
+
+ปกติ endpoint คืน dict จาก DynamoDB (ตัวเลขเป็น Decimal) แล้ว FastAPI จะ
+validate ทุกชิ้นผ่าน response_model (Decimal -> float/int) ก่อนค่อย encode เป็น JSON
+ข้อมูลที่อ่านจาก Table ของเราเอง "เชื่อถือได้" อยู่แล้ว (ผ่าน validation ตอนเขียน)
+-> FastSerializer แปลงตาม field ของ response_model ตรงๆ โดยไม่ validate ซ้ำ
+   (โครงการแปลงของแต่ละ Model ถูก compile ครั้งเดียว) แล้ว encode ด้วย orjson (ถ้ามี)
+
+JSON ที่ได้เหมือนทางปกติทุก byte: field ตามลำดับใน Model, ไม่มี field เกิน, ค่าว่างเป็น null
+ข้อจำกัด: ไม่เช็คชนิด/constraint (เช่น int ที่มีทศนิยมจะถูกตัด) -> ใช้กับข้อมูลจาก Table เท่านั้น
+
+เปิดด้วย FAST_RESPONSES=true (ค่าเริ่มต้นปิด ใช้ทางปกติของ FastAPI)
+"""
+
+import json
+import os
+import types
+from decimal import Decimal
+from typing import Any, Callable, Union, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:  # orjson เร็วกว่า json มาก แต่เป็น optional (ไม่มีก็ใช้ json ปกติ)
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def fast_responses_enabled() -> bool:
+    return os.environ.get("FAST_RESPONSES", "false").lower() == "true"
+
+
+def _default(value):
+    """ค่าที่ JSON encoder ไม่รู้จัก (Decimal ที่หลุดมาใน field ที่ไม่ได้ประกาศชนิดไว้)"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    """JSON แบบ compact (รูปแบบเดียวกับ FastAPI/pydantic) เป็น bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON Response ที่ encode ด้วย dumps() (รับ bytes ที่ encode แล้วได้ด้วย)
+    หมายเหตุ: คืน Response เองแล้ว FastAPI จะไม่รวม Header จาก `response: Response`
+    ที่ inject มา -> ส่ง headers=response.headers มาด้วย
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+# --- Compile: annotation ของ field -> ฟังก์ชันแปลงค่า (None = ใช้ค่าเดิม) ---
+_SCALARS: dict[Any, Callable | None] = {
+    str: None,
+    bool: None,
+    float: float,
+    int: int,
+}
+
+
+def _optional(convert: Callable | None) -> Callable | None:
+    if convert is None:
+        return None
+    return lambda value: None if value is None else convert(value)
+
+
+def _list_of(convert: Callable | None) -> Callable:
+    if convert is None:
+        return list
+    return lambda values: [convert(value) for value in values]
+
+
+def _compile(annotation) -> Callable | None:
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return _optional(_compile(args[0]))
+        # Union หลาย Model ต้องรู้ว่าจะใช้ตัวไหน -> ให้ endpoint เลือก Model เอง
+        raise TypeError(f"Unsupported union in fast serializer: {annotation}")
+    if origin is list:
+        return _list_of(_compile(get_args(annotation)[0]))
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _compile_model(annotation)
+    if annotation in _SCALARS:
+        return _SCALARS[annotation]
+    raise TypeError(f"Unsupported type in fast serializer: {annotation}")
+
+
+def _compile_model(model: type[BaseModel]) -> Callable[[dict], dict]:
+    """
+    สร้างฟังก์ชันแปลง Item ของ Model นี้ เป็น dict literal บรรทัดเดียว
+    (เร็วกว่าวน loop ทีละ field ราว 1.5 เท่า) เช่น ProductResponse ->
+        lambda item: {"ProductID": item["ProductID"], "Price": c3(item["Price"]), ...}
+    """
+    namespace, entries = {}, []
+    for i, (name, field) in enumerate(model.model_fields.items()):
+        if field.is_required():
+            value = (
+                f"item[{name!r}]"  # ไม่มี field บังคับ -> KeyError (500 เหมือนทางปกติ)
+            )
+        else:
+            namespace[f"d{i}"] = field.get_default()
+            value = f"item.get({name!r}, d{i})"
+        convert = _compile(field.annotation)
+        if convert is not None:
+            namespace[f"c{i}"] = convert
+            value = f"c{i}({value})"
+        entries.append(f"{name!r}: {value}")
+    return eval(f"lambda item: {{{', '.join(entries)}}}", namespace)
+
+
+class FastSerializer:
+    """
+    แปลง Item จาก DynamoDB เป็น JSON ตาม response_model (ไม่ validate ซ้ำ)
+    สร้างครั้งเดียวต่อ Model ตอน import เช่น PRODUCT_SERIALIZER = FastSerializer(ProductResponse)
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self._convert = _compile_model(model)
+
+    def to_dict(self, item: dict) -> dict:
+        return self._convert(item)
+
+    def dump_json(self, item: dict) -> bytes:
+        return dumps(self._convert(item))
+
+    def dump_json_many(self, items: list[dict]) -> bytes:
+        convert = self._convert
+        return dumps([convert(item) for item in items])
@@ -0,0 +1,145 @@
+"""
+Object Storage แบบง่าย (get/put ทั้งก้อน + เขียนแบบมีเงื่อนไขด้วย ETag)
+
+- S3ObjectStore:    ใช้งานจริง (botocore S3 client สร้างตอนใช้ครั้งแรก เหมือน DynamoDB)
+- LocalObjectStore: เก็บเป็นไฟล์ในเครื่อง (ใช้ในเทส / รันในเครื่อง)
+- get_object_store(): เลือกจาก Environment
+    OBJECT_STORE_BUCKET=...  -> S3
+    ไม่ตั้ง                   -> ไฟล์ใน OBJECT_STORE_DIR (ค่าเริ่มต้น /tmp/ecom-objects)
+
+เขียนแบบมีเงื่อนไข (กันเขียนทับกันเมื่อหลาย Lambda แก้ object เดียวกันพร้อมกัน):
+- if_match=etag:      เขียนได้เฉพาะถ้า object ยังเป็น version ที่อ่านมา
+- if_none_match=True: เขียนได้เฉพาะถ้ายังไม่มี object นี้
+ไม่ผ่าน -> PreconditionFailed
+"""
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+
+
+class PreconditionFailed(Exception):
+    """เงื่อนไข If-Match / If-None-Match ไม่ผ่าน (มีคนเขียนไปก่อนแล้ว)"""
+
+
+@dataclass
+class StoredObject:
+    data: bytes
+    etag: str
+    content_type: str | None = None
+
+
+class LocalObjectStore:
+    """
+    เก็บ object เป็นไฟล์ใต้ root (key "a/b.json" -> root/a/b.json)
+    เงื่อนไข ETag ปลอดภัยภายใน process เดียว (พอสำหรับเทส/รันในเครื่อง)
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    @staticmethod
+    def _etag(data: bytes) -> str:
+        return f'"{hashlib.md5(data).hexdigest()}"'  # รูปแบบเดียวกับ ETag ของ S3
+
+    def get(self, key: str) -> StoredObject | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return StoredObject(data, self._etag(data))
+
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str | None = None,
+        if_match: str | None = None,
+        if_none_match: bool = False,
+    ) -> str:
+        path = self._path(key)
+        with self._lock:
+            current = self.get(key)
+            if if_none_match and current is not None:
+                raise PreconditionFailed(key)
+            if if_match is not None and (current is None or current.etag != if_match):
+                raise PreconditionFailed(key)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # เขียนไฟล์ชั่วคราวแล้วค่อย rename -> คนอ่านไม่เห็นไฟล์ครึ่งๆ กลางๆ
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return self._etag(data)
+
+
+class S3ObjectStore:
+    """Object ใน S3 bucket เดียว"""
+
+    def __init__(self, bucket: str, client=None):
+        self.bucket = bucket
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import botocore.session  # import เฉพาะตอนต้องใช้จริง
+
+            self._client = botocore.session.get_session().create_client("s3")
+        return self._client
+
+    def get(self, key: str) -> StoredObject | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "NoSuchKey":
+                return None
+            raise
+        with response["Body"] as body:
+            data = body.read()
+        return StoredObject(data, response["ETag"], response.get("ContentType"))
+
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str | None = None,
+        if_match: str | None = None,
+        if_none_match: bool = False,
+    ) -> str:
+        from botocore.exceptions import ClientError
+
+        params = {"Bucket": self.bucket, "Key": key, "Body": data}
+        if content_type:
+            params["ContentType"] = content_type
+        if if_match is not None:
+            params["IfMatch"] = if_match
+        if if_none_match:
+            params["IfNoneMatch"] = "*"
+        try:
+            return self.client.put_object(**params)["ETag"]
+        except ClientError as e:
+            # 409 ConditionalRequestConflict = มีคนเขียน key เดียวกันอยู่พร้อมกัน
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise PreconditionFailed(key) from e
+            raise
+
+
+def get_object_store() -> LocalObjectStore | S3ObjectStore:
+    bucket = os.environ.get("OBJECT_STORE_BUCKET")
+    if bucket:
+        return S3ObjectStore(bucket)
+    return LocalObjectStore(os.environ.get("OBJECT_STORE_DIR", "/tmp/ecom-objects"))
@@ -0,0 +1,187 @@
+"""
+Helper ฝั่ง HTTP ที่ทุก Service ใช้เหมือนกัน
+- Optimistic Concurrency: Version <-> ETag / If-Match
+- แปลง Error (DynamoDB / อื่นๆ) เป็น HTTPException แบบเดียวกันทุก Service
+- instrument(): วัดเวลา/Capacity ต่อ request แล้ว log แบบ EMF (ดู ecom_shared/metrics.py)
+"""
+
+import functools
+import inspect
+import json
+import os
+import time
+
+from fastapi import FastAPI, HTTPException
+from fastapi.routing import APIRoute
+
+from .errors import ConditionalCheckFailed, Throttled
+from .metrics import current_metrics, end_request, start_request
+
+
+# --- Optimistic Concurrency (Version / ETag) ---
+# ทุกครั้งที่เขียน Item จะ +1 ให้ Version แล้วส่งกลับเป็น ETag (เช่น "3")
+# Client ส่ง If-Match: "3" มาตอน PUT/DELETE -> เขียนได้เฉพาะถ้ายังเป็น version เดิม
+def format_etag(item: dict) -> str:
+    """ETag ของ Item (Item เก่าที่ยังไม่มี Version ถือเป็น version 0)"""
+    return f'"{int(item.get("Version", 0))}"'
+
+
+def parse_if_match(if_match: str | None) -> list[int] | None:
+    """
+    แปลง Header If-Match เป็นรายการ version ที่ยอมรับ
+    None = ไม่ได้ส่งมา หรือส่ง * (ไม่ต้องเช็ค version)
+    (If-Match ใช้ strong comparison -> ETag แบบ W/ จะไม่ match)
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+            versions.append(int(tag[1:-1]))
+    return versions
+
+
+def build_write_condition(
+    key_attr: str, versions: list[int] | None
+) -> tuple[str, dict, dict]:
+    """
+    สร้าง ConditionExpression: Item ต้องมีอยู่ (+ Version ต้องตรงกับ If-Match)
+    คืนค่า (expression, names, values)
+    """
+    if versions is not None and not versions:
+        # ส่ง If-Match มาแต่ไม่มี ETag ไหนที่เป็นไปได้เลย
+        raise HTTPException(status_code=412, detail="Precondition Failed")
+
+    condition = f"attribute_exists({key_attr})"
+    names, values = {}, {}
+    if versions is not None:
+        names["#ver"] = "Version"
+        placeholders = []
+        for i, version in enumerate(versions):
+            values[f":ver{i}"] = version
+            placeholders.append(f":ver{i}")
+        checks = [f"#ver IN ({', '.join(placeholders)})"]
+        if 0 in versions:
+            checks.append("attribute_not_exists(#ver)")  # Item เก่าก่อนมี Version
+        condition += f" AND ({' OR '.join(checks)})"
+    return condition, names, values
+
+
+# --- Error -> HTTP ---
+# โดน throttle (retry ของ client ครบแล้ว) -> บอก Client ให้ลองใหม่
+THROTTLED_RETRY_AFTER_SECONDS = "1"
+
+
+def to_http_exception(
+    error: Exception, where: str, not_found_detail: str | None = None
+) -> HTTPException:
+    """
+    แปลง Exception เป็น HTTPException (ใช้ใน `except Exception as e: raise ...`)
+    - HTTPException ที่เราตั้งใจโยน -> ปล่อยผ่าน
+    - ConditionalCheckFailed (ถ้าส่ง not_found_detail มา) -> 404 หรือ 412
+      (ต้องเรียกด้วย ReturnValuesOnConditionCheckFailure="ALL_OLD":
+       ไม่มี Item อยู่เลย -> 404, มี Item แต่ Version ไม่ตรง -> 412)
+    - Throttled -> 503 + Retry-After
+    - อื่นๆ -> log แล้ว 500
+    """
+    if isinstance(error, HTTPException):
+        return error
+    if isinstance(error, ConditionalCheckFailed) and not_found_detail:
+        if error.item:
+            return HTTPException(status_code=412, detail="Precondition Failed")
+        return HTTPException(status_code=404, detail=not_found_detail)
+    if isinstance(error, Throttled):
+        print(f"!!! THROTTLED ({where}): {repr(error)}")
+        return HTTPException(
+            status_code=503,
+            detail="Service is busy, please retry",
+            headers={"Retry-After": THROTTLED_RETRY_AFTER_SECONDS},
+        )
+    print(f"!!! UNEXPECTED ERROR ({where}): {repr(error)}")
+    return HTTPException(status_code=500, detail=f"Internal Server Error: {error}")
+
+
+# --- Metrics ต่อ request ---
+def _timed_endpoint(endpoint):
+    """ห่อ endpoint ให้จดเวลาเข้า/ออก (แยก validation / serialization ออกจากตัว endpoint)"""
+
+    def mark(attr: str):
+        metrics = current_metrics()
+        if metrics is not None:
+            setattr(metrics, attr, time.perf_counter())
+
+    # functools.wraps -> FastAPI ยังอ่าน signature (parameter / Depends) ของ endpoint เดิม
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            mark("endpoint_started")
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                mark("endpoint_finished")
+
+    else:
+
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            mark("endpoint_started")
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                mark("endpoint_finished")
+
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """APIRoute ที่จดเวลาเข้า/ออก endpoint ลง RequestMetrics"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware: เริ่มวัดตอนรับ request แล้ว print EMF 1 บรรทัดตอนส่ง response ครบ"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics, token = start_request()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.finished = time.perf_counter()
+            end_request(token)
+            # ใช้ path แบบ template (/products/{product_id}) -> Dimension ไม่บานตาม ID
+            route = getattr(scope.get("route"), "path", "UNMATCHED")
+            emf = metrics.to_emf(
+                self.service, f"{scope['method']} {route}", status_code
+            )
+            print(json.dumps(emf))
+
+
+def instrument(app: FastAPI, service: str):
+    """
+    เปิดการวัด per-request ให้ app (ต้องเรียกก่อนประกาศ route)
+    ปิดได้ด้วย METRICS_ENABLED=false
+    """
+    if os.environ.get("METRICS_ENABLED", "true").lower() != "true":
+        return
+    app.router.route_class = TimedRoute
+    app.add_middleware(RequestMetricsMiddleware, service=service)
@@ -0,0 +1,40 @@
+import os
+import sys
+import pytest
+import boto3
+from moto import mock_aws
+
+# เพิ่ม services/shared ใน sys.path (ตอน deploy อยู่ใน Lambda Layer)
+SHARED_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, SHARED_ROOT)
+
+
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "ap-southeast-1"
+
+
+@pytest.fixture(scope="function")
+def mock_dynamodb_table(aws_credentials):
+    """สร้าง Table จำลอง (PK + SK) แล้วคืนเป็น DynamoTable"""
+    from ecom_shared.dynamo import DynamoClient, DynamoTable
+
+    with mock_aws():
+        client = boto3.client("dynamodb")
+        client.create_table(
+            TableName="TestShared",
+            KeySchema=[
+                {"AttributeName": "PK", "KeyType": "HASH"},
+                {"AttributeName": "SK", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "PK", "AttributeType": "S"},
+                {"AttributeName": "SK", "AttributeType": "S"},
+            ],
+            ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+        )
+        yield DynamoTable("TestShared", DynamoClient(client))
@@ -0,0 +1,159 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from ecom_shared.aio import (
+    AsyncDynamoClient,
+    AsyncDynamoTable,
+    aiter_pages,
+    batch_get_items,
+)
+
+
+def test_thread_backend_wraps_sync_table(mock_dynamodb_table):
+    """backend "thread": ใช้ client เดียวกับ Table ฝั่ง sync (ใช้กับ moto ในเทสได้เลย)"""
+    table = AsyncDynamoTable.from_sync(mock_dynamodb_table)
+
+    async def scenario():
+        await table.put_item(Item={"PK": "U1", "SK": "O1", "Total": Decimal("5")})
+        await table.put_item(Item={"PK": "U1", "SK": "O2", "Total": Decimal("7")})
+        item = (await table.get_item(Key={"PK": "U1", "SK": "O1"}))["Item"]
+        pages = [
+            [i["SK"] for i in items]
+            async for items, _ in aiter_pages(
+                table.query,
+                KeyConditionExpression="PK = :pk",
+                ExpressionAttributeValues={":pk": "U1"},
+                Limit=1,
+            )
+        ]
+        return item, pages
+
+    item, pages = asyncio.run(scenario())
+    assert item["Total"] == Decimal("5")
+    # หน้าสุดท้ายอาจว่าง (DynamoDB ยังไม่รู้ว่าหมดจนกว่าจะลองอ่านต่อ)
+    assert [sk for page in pages for sk in page] == ["O1", "O2"]
+
+
+def test_batch_get_items_fetches_chunks_concurrently():
+    """Key เกิน 100 -> แบ่งก้อนแล้วยิงพร้อมกัน (ไม่รอทีละก้อน)"""
+
+    class SlowClient:
+        def __init__(self):
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+        async def batch_get_item(self, RequestItems):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return {"Responses": {"Products": list(RequestItems["Products"]["Keys"])}}
+
+    class FakeTable:
+        name = "Products"
+        client = SlowClient()
+
+    keys = [{"ProductID": f"P{i}"} for i in range(250)]
+    items = asyncio.run(batch_get_items(FakeTable(), keys))
+
+    assert len(items) == 250
+    assert FakeTable.client.max_in_flight == 3
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        AsyncDynamoClient(backend="nope")
+
+
+def test_aiobotocore_client_closed_when_event_loop_changes():
+    """loop เปลี่ยน (เช่น asyncio.run ใหม่) -> ปิด client ของ loop เก่าก่อนสร้างตัวใหม่"""
+    opened, closed = [], []
+
+    class FakeRaw:
+        async def __aenter__(self):
+            opened.append(self)
+            return self
+
+        async def __aexit__(self, *exc):
+            closed.append(self)
+
+    class FakeClient(AsyncDynamoClient):
+        def _open_raw(self):
+            return FakeRaw()
+
+    client = FakeClient(backend="aiobotocore", sync_client=object())
+    first = asyncio.run(client._get_raw())
+    assert asyncio.run(client._get_raw()) is not first
+    assert closed == [first]
+
+    # loop เดิม -> ใช้ตัวเดิม ไม่ปิด
+    async def same_loop():
+        return await client._get_raw(), await client._get_raw()
+
+    third, again = asyncio.run(same_loop())
+    assert third is again
+    assert closed == opened[:2]
+
+    asyncio.run(client.close())
+    assert closed == opened
+
+
+def test_lifespan_closes_shared_client(monkeypatch):
+    """shutdown ของ FastAPI app -> ปิด client ที่ใช้ร่วมกัน / ยังไม่เคยสร้าง -> ไม่สร้างใหม่"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from ecom_shared import aio
+
+    monkeypatch.setattr(aio, "_shared_client", None)
+    with TestClient(FastAPI(lifespan=aio.lifespan)):
+        pass
+    assert aio._shared_client is None
+
+    closed = []
+
+    async def fake_close(self):
+        closed.append(self)
+
+    monkeypatch.setattr(aio.AsyncDynamoClient, "close", fake_close)
+    client = aio.get_async_client()
+    with TestClient(FastAPI(lifespan=aio.lifespan)):
+        assert closed == []
+    assert closed == [client]
+
+
+def test_aiobotocore_backend_against_moto_server(aws_credentials, monkeypatch):
+    """backend "aiobotocore" (non-blocking จริง) ทดสอบกับ moto server ในเครื่อง"""
+    pytest.importorskip("aiobotocore")
+    moto_server = pytest.importorskip("moto.server")
+    import boto3
+
+    server = moto_server.ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        monkeypatch.setenv("AWS_ENDPOINT_URL_DYNAMODB", f"http://{host}:{port}")
+        boto3.client("dynamodb").create_table(
+            TableName="AsyncTest",
+            KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+        async def scenario():
+            client = AsyncDynamoClient(backend="aiobotocore")
+            table = AsyncDynamoTable("AsyncTest", client)
+            try:
+                await asyncio.gather(
+                    *(table.put_item(Item={"PK": f"K{i}", "N": i}) for i in range(5))
+                )
+                return await batch_get_items(table, [{"PK": f"K{i}"} for i in range(5)])
+            finally:
+                await client.close()
+
+        items = asyncio.run(scenario())
+        assert sorted(item["N"] for item in items) == [0, 1, 2, 3, 4]
+    finally:
+        server.stop()
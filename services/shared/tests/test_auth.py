@@ -0,0 +1,249 @@
+import base64
+import json
+
+import pytest
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from ecom_shared import auth
+from ecom_shared.auth import (
+    InvalidToken,
+    JWKSCache,
+    JWTVerifier,
+    LocalJWTAuthenticator,
+    get_request_claims,
+    set_authenticator,
+)
+
+ISSUER = "https://cognito-idp.ap-southeast-1.amazonaws.com/ap-southeast-1_test"
+CLIENT_ID = "test-client"
+NOW = 1_700_000_000
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+class LocalKeySet:
+    """JWKS ในเครื่อง (แทน endpoint ของ Cognito) + ออก token ที่เซ็นด้วย key ของตัวเอง"""
+
+    def __init__(self):
+        self.keys = {}
+        self.fetches = 0
+
+    def add_key(self, kid: str):
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def jwks(self) -> dict:
+        self.fetches += 1
+        keys = []
+        for kid, private_key in self.keys.items():
+            numbers = private_key.public_key().public_numbers()
+            keys.append(
+                {
+                    "kid": kid,
+                    "kty": "RSA",
+                    "alg": "RS256",
+                    "use": "sig",
+                    "e": b64url(numbers.e.to_bytes(3, "big")),
+                    "n": b64url(numbers.n.to_bytes(256, "big")),
+                }
+            )
+        return {"keys": keys}
+
+    def sign(self, kid: str, alg="RS256", **overrides) -> str:
+        claims = {
+            "sub": "user-1",
+            "email": "user@example.com",
+            "iss": ISSUER,
+            "aud": CLIENT_ID,
+            "token_use": "id",
+            "iat": NOW,
+            "exp": NOW + 3600,
+            **overrides,
+        }
+        header = b64url(json.dumps({"kid": kid, "alg": alg}).encode())
+        payload = b64url(json.dumps(claims).encode())
+        signature = self.keys[kid].sign(
+            f"{header}.{payload}".encode(), padding.PKCS1v15(), hashes.SHA256()
+        )
+        return f"{header}.{payload}.{b64url(signature)}"
+
+
+@pytest.fixture
+def key_set():
+    keys = LocalKeySet()
+    keys.add_key("key-1")
+    return keys
+
+
+@pytest.fixture
+def verifier(key_set):
+    jwks = JWKSCache(key_set.jwks, refresh_seconds=3600, min_refresh_interval=0)
+    return JWTVerifier(ISSUER, [CLIENT_ID], jwks, clock=lambda: NOW)
+
+
+def test_verify_valid_token_and_cache(verifier, key_set):
+    token = key_set.sign("key-1")
+    assert verifier.verify(token)["sub"] == "user-1"
+    assert verifier.verify(token)["email"] == "user@example.com"
+
+    # ครั้งที่ 2 มาจาก cache (ไม่ตรวจลายเซ็น / ไม่โหลด JWKS ซ้ำ)
+    assert verifier.token_cache.stats()["hits"] == 1
+    assert key_set.fetches == 1
+
+    # access token ใช้ client_id แทน aud
+    access = key_set.sign("key-1", token_use="access", aud=None, client_id=CLIENT_ID)
+    assert verifier.verify(access)["sub"] == "user-1"
+
+
+@pytest.mark.parametrize(
+    "overrides, message",
+    [
+        ({"exp": NOW - 3600}, "expired"),
+        ({"nbf": NOW + 3600}, "not yet valid"),
+        ({"iss": "https://evil.example.com"}, "issuer"),
+        ({"aud": "other-client"}, "audience"),
+        ({"token_use": "refresh"}, "token_use"),
+    ],
+)
+def test_verify_rejects_bad_claims(verifier, key_set, overrides, message):
+    with pytest.raises(InvalidToken, match=message):
+        verifier.verify(key_set.sign("key-1", **overrides))
+
+
+def test_verify_rejects_tampered_and_unsigned_tokens(verifier, key_set):
+    header, payload, signature = key_set.sign("key-1").split(".")
+    forged = b64url(json.dumps({"sub": "admin", "exp": NOW + 60}).encode())
+    with pytest.raises(InvalidToken, match="signature"):
+        verifier.verify(f"{header}.{forged}.{signature}")
+
+    none_header = b64url(json.dumps({"kid": "key-1", "alg": "none"}).encode())
+    with pytest.raises(InvalidToken, match="algorithm"):
+        verifier.verify(f"{none_header}.{payload}.")
+
+    with pytest.raises(InvalidToken, match="Malformed"):
+        verifier.verify("not-a-jwt")
+
+
+def test_cached_token_expires(key_set):
+    now = [NOW]
+    jwks = JWKSCache(key_set.jwks)
+    verifier = JWTVerifier(ISSUER, [CLIENT_ID], jwks, clock=lambda: now[0])
+    token = key_set.sign("key-1", exp=NOW + 60)
+    verifier.verify(token)
+
+    now[0] = NOW + 3600
+    with pytest.raises(InvalidToken, match="expired"):
+        verifier.verify(token)
+
+
+def test_jwks_refresh_on_rotation_and_interval(key_set):
+    now = [0.0]
+    jwks = JWKSCache(
+        key_set.jwks,
+        refresh_seconds=3600,
+        min_refresh_interval=60,
+        clock=lambda: now[0],
+    )
+    verifier = JWTVerifier(ISSUER, [CLIENT_ID], jwks, clock=lambda: NOW)
+    verifier.verify(key_set.sign("key-1"))
+    assert key_set.fetches == 1
+
+    # Cognito หมุน key: kid ใหม่ภายใน min_refresh_interval -> ยังไม่โหลดใหม่
+    key_set.add_key("key-2")
+    with pytest.raises(InvalidToken, match="Unknown signing key"):
+        verifier.verify(key_set.sign("key-2"))
+    assert key_set.fetches == 1
+
+    # พ้น min_refresh_interval -> โหลดใหม่แล้วเจอ key ใหม่
+    now[0] = 61
+    assert verifier.verify(key_set.sign("key-2", sub="user-2"))["sub"] == "user-2"
+    assert key_set.fetches == 2
+
+    # ครบ refresh_seconds -> โหลดใหม่เองแม้ kid จะรู้จักอยู่แล้ว
+    now[0] = 61 + 3600
+    verifier.verify(key_set.sign("key-1", sub="user-3"))
+    assert key_set.fetches == 3
+
+
+def test_request_claims_with_local_authenticator(verifier, key_set):
+    """เทส dependency แบบเดียวกับใน Service: เปลี่ยน authenticator เป็นตรวจ JWT เอง"""
+    app = FastAPI()
+
+    def current_user_id(request: Request) -> str:
+        try:
+            return get_request_claims(request)["sub"]
+        except (InvalidToken, KeyError):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+    @app.get("/me")
+    def me(user_id: str = Depends(current_user_id)):
+        return {"UserID": user_id}
+
+    set_authenticator(LocalJWTAuthenticator(verifier))
+    try:
+        client = TestClient(app)
+        token = key_set.sign("key-1")
+        response = client.get("/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.json() == {"UserID": "user-1"}
+        assert client.get("/me").status_code == 401
+        assert (
+            client.get("/me", headers={"Authorization": "Bearer x.y.z"}).status_code
+            == 401
+        )
+    finally:
+        set_authenticator(None)
+
+
+def test_authenticator_from_env(monkeypatch):
+    monkeypatch.delenv("AUTH_MODE", raising=False)
+    assert auth.authenticator_from_env() is auth.api_gateway_claims
+
+    monkeypatch.setenv("AUTH_MODE", "jwt")
+    monkeypatch.setenv("COGNITO_ISSUER", ISSUER + "/")
+    monkeypatch.setenv("COGNITO_AUDIENCE", f"{CLIENT_ID}, other-client")
+    authenticator = auth.authenticator_from_env()
+    assert authenticator.verifier.issuer == ISSUER
+    assert authenticator.verifier.audience == {CLIENT_ID, "other-client"}
+
+    monkeypatch.setenv("AUTH_MODE", "basic")
+    with pytest.raises(ValueError):
+        auth.authenticator_from_env()
+
+
+def test_protect_requires_token_except_public_paths(verifier, key_set, monkeypatch):
+    """เทส protect(): โหมด jwt ทุก Route ต้องมี token (ยกเว้น public_paths)"""
+    monkeypatch.setenv("AUTH_MODE", "jwt")
+    app = FastAPI()
+    auth.protect(app, public_paths=("/public",))
+
+    @app.get("/public")
+    def public():
+        return {"ok": True}
+
+    @app.get("/private")
+    def private(request: Request):
+        return {"UserID": get_request_claims(request)["sub"]}
+
+    set_authenticator(LocalJWTAuthenticator(verifier))
+    try:
+        client = TestClient(app)
+        assert client.get("/public").status_code == 200
+        response = client.get("/private")
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+        token = key_set.sign("key-1")
+        response = client.get("/private", headers={"Authorization": f"Bearer {token}"})
+        assert response.json() == {"UserID": "user-1"}
+    finally:
+        set_authenticator(None)
+
+    # โหมด apigateway (ค่าเริ่มต้น) -> ไม่เพิ่ม middleware
+    monkeypatch.delenv("AUTH_MODE")
+    other = FastAPI()
+    auth.protect(other)
+    assert other.user_middleware == []
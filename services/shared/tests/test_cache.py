@@ -0,0 +1,18 @@
+from ecom_shared.cache import MISSING, TTLCache
+
+
+def test_ttl_cache_lru_and_expiry():
+    """เทส TTLCache: ทิ้งตัวที่ใช้นานสุดเมื่อเต็ม และหมดอายุตาม TTL"""
+    now = [0.0]
+    cache = TTLCache(max_items=2, ttl_seconds=10, clock=lambda: now[0])
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" ถูกใช้ล่าสุด
+    cache.set("c", 3)  # เต็ม -> ต้องทิ้ง "b"
+    assert cache.get("b") is MISSING
+    assert cache.stats()["evictions"] == 1
+
+    now[0] = 11.0  # เลย TTL
+    assert cache.get("a") is MISSING
+    assert cache.stats()["expirations"] == 1
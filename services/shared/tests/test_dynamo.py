@@ -0,0 +1,205 @@
+from decimal import Decimal
+
+import pytest
+from botocore.exceptions import ClientError
+
+from ecom_shared.dynamo import deserialize, serialize
+
+
+def test_serialize_round_trip():
+    """แปลงไป-กลับแล้วต้องได้ค่าเดิม (ตัวเลขเป็น Decimal เหมือน boto3)"""
+    value = {
+        "Name": "Mouse",
+        "Price": Decimal("19.99"),
+        "Stock": 3,
+        "Active": True,
+        "Note": None,
+        "Tags": {"a", "b"},
+        "Items": [{"Qty": 1}],
+    }
+    typed = serialize(value)
+
+    assert typed["M"]["Active"] == {"BOOL": True}  # bool ต้องไม่กลายเป็น N
+    assert typed["M"]["Stock"] == {"N": "3"}
+    assert deserialize(typed) == {**value, "Stock": Decimal(3)}
+
+
+def test_serialize_rejects_float():
+    with pytest.raises(TypeError):
+        serialize(1.5)
+
+
+def test_table_crud_and_query(mock_dynamodb_table):
+    table = mock_dynamodb_table
+    for i in range(3):
+        table.put_item(Item={"PK": "U1", "SK": f"O{i}", "Total": Decimal(i)})
+
+    item = table.get_item(Key={"PK": "U1", "SK": "O1"})["Item"]
+    assert item == {"PK": "U1", "SK": "O1", "Total": Decimal(1)}
+
+    response = table.query(
+        KeyConditionExpression="PK = :pk",
+        ExpressionAttributeValues={":pk": "U1"},
+        ScanIndexForward=False,
+        Limit=2,
+    )
+    assert [i["SK"] for i in response["Items"]] == ["O2", "O1"]
+    assert response["LastEvaluatedKey"] == {"PK": "U1", "SK": "O1"}
+
+    updated = table.update_item(
+        Key={"PK": "U1", "SK": "O0"},
+        UpdateExpression="ADD #total :one",
+        ExpressionAttributeNames={"#total": "Total"},  # Total เป็น reserved word
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="ALL_NEW",
+    )
+    assert updated["Attributes"]["Total"] == 1
+
+
+def test_conditional_write_raises_client_error(mock_dynamodb_table):
+    mock_dynamodb_table.put_item(Item={"PK": "U1", "SK": "O1"})
+
+    with pytest.raises(ClientError) as exc_info:
+        mock_dynamodb_table.put_item(
+            Item={"PK": "U1", "SK": "O1"},
+            ConditionExpression="attribute_not_exists(PK)",
+        )
+    assert exc_info.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def test_batch_writer_dedupes_and_flushes(mock_dynamodb_table):
+    """เขียนเกิน 25 ชิ้น (หลาย batch) และ Key ซ้ำใน buffer เอาตัวหลังสุด"""
+    with mock_dynamodb_table.batch_writer(overwrite_by_pkeys=["PK", "SK"]) as batch:
+        for i in range(30):
+            batch.put_item(Item={"PK": "U1", "SK": f"O{i:02d}", "V": 1})
+        batch.put_item(Item={"PK": "U1", "SK": "O29", "V": 2})
+
+    assert mock_dynamodb_table.scan()["Count"] == 30
+    last = mock_dynamodb_table.get_item(Key={"PK": "U1", "SK": "O29"})["Item"]
+    assert last["V"] == 2
+
+
+def test_batch_get_item_deserializes_responses(mock_dynamodb_table):
+    table = mock_dynamodb_table
+    table.put_item(Item={"PK": "U1", "SK": "O1", "Total": Decimal("5")})
+
+    response = table.client.batch_get_item(
+        RequestItems={
+            table.name: {
+                "Keys": [{"PK": "U1", "SK": "O1"}, {"PK": "U1", "SK": "missing"}]
+            }
+        }
+    )
+    assert response["Responses"][table.name] == [
+        {"PK": "U1", "SK": "O1", "Total": Decimal("5")}
+    ]
+
+
+def test_batch_get_items_retries_unprocessed_keys(monkeypatch):
+    """เทส batch_get_items: ต้อง retry UnprocessedKeys จนได้ครบ"""
+    from ecom_shared import dynamo
+
+    monkeypatch.setattr(dynamo.time, "sleep", lambda seconds: None)
+
+    class FakeClient:
+        def __init__(self):
+            self.calls = []
+
+        def batch_get_item(self, RequestItems):
+            keys = RequestItems["Products"]["Keys"]
+            self.calls.append(keys)
+            # ครั้งแรกตอบแค่ตัวแรก ที่เหลือเป็น UnprocessedKeys
+            return {
+                "Responses": {"Products": [dict(keys[0])]},
+                "UnprocessedKeys": (
+                    {"Products": {"Keys": keys[1:]}} if len(keys) > 1 else {}
+                ),
+            }
+
+    class FakeTable:
+        name = "Products"
+
+        def __init__(self):
+            self.client = FakeClient()
+
+    table = FakeTable()
+    keys = [{"ProductID": "A"}, {"ProductID": "B"}, {"ProductID": "C"}]
+    items = dynamo.batch_get_items(table, keys)
+
+    assert [i["ProductID"] for i in items] == ["A", "B", "C"]
+    assert len(table.client.calls) == 3
+
+
+def test_batch_get_items_raises_throttled_when_retries_run_out(monkeypatch):
+    from ecom_shared import dynamo
+    from ecom_shared.errors import Throttled
+
+    monkeypatch.setattr(dynamo.time, "sleep", lambda seconds: None)
+
+    class AlwaysThrottledClient:
+        def batch_get_item(self, RequestItems):
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+
+    class FakeTable:
+        name = "Products"
+        client = AlwaysThrottledClient()
+
+    with pytest.raises(Throttled):
+        dynamo.batch_get_items(FakeTable(), [{"ProductID": "A"}])
+
+
+def test_build_update_uses_placeholders_and_caches_template():
+    from ecom_shared.dynamo import _update_template, build_update
+
+    _update_template.cache_clear()
+    expression, names, values = build_update({"Name": "A"}, {"Version": 1})
+
+    assert expression == "SET #s0 = :s0 ADD #a0 :a0"
+    assert names == {"#s0": "Name", "#a0": "Version"}
+    assert values == {":s0": "A", ":a0": 1}
+
+    # ชุด Attribute เดิม (ค่าต่างกัน) -> ใช้โครงเดิมจาก cache
+    build_update({"Name": "B"}, {"Version": 1})
+    assert _update_template.cache_info().hits == 1
+
+
+def test_client_errors_are_typed(mock_dynamodb_table):
+    from ecom_shared.errors import ConditionalCheckFailed, TransactionCanceled
+
+    table = mock_dynamodb_table
+    table.put_item(Item={"PK": "U1", "SK": "O1", "V": 1})
+
+    with pytest.raises(ConditionalCheckFailed) as exc_info:
+        table.delete_item(
+            Key={"PK": "U1", "SK": "O1"},
+            ConditionExpression="V = :v",
+            ExpressionAttributeValues={":v": 2},
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+    assert exc_info.value.item == {"PK": "U1", "SK": "O1", "V": 1}
+
+    with pytest.raises(TransactionCanceled) as exc_info:
+        table.client.transact_write_items(
+            TransactItems=[
+                {
+                    "ConditionCheck": {
+                        "TableName": table.name,
+                        "Key": {"PK": "U1", "SK": "O1"},
+                        "ConditionExpression": "attribute_not_exists(PK)",
+                    }
+                }
+            ]
+        )
+    assert exc_info.value.reasons == ["ConditionalCheckFailed"]
+
+
+def test_client_config_reads_environment(monkeypatch):
+    from ecom_shared.dynamo import client_config
+
+    monkeypatch.setenv("DYNAMO_MAX_POOL_CONNECTIONS", "64")
+    monkeypatch.setenv("DYNAMO_RETRY_MODE", "standard")
+    config = client_config()
+
+    assert config.max_pool_connections == 64
+    assert config.retries["mode"] == "standard"
+    assert config.tcp_keepalive is True
@@ -0,0 +1,107 @@
+import json
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from ecom_shared.aio import AsyncDynamoTable
+from ecom_shared.metrics import RequestMetrics
+from ecom_shared.web import instrument
+
+
+class ItemInput(BaseModel):
+    PK: str
+    SK: str
+
+
+def build_app(table: AsyncDynamoTable) -> FastAPI:
+    app = FastAPI()
+    instrument(app, "test_service")
+
+    def get_table():
+        return table
+
+    @app.post("/items", status_code=201)
+    async def create_item(item: ItemInput, table=Depends(get_table)):
+        await table.put_item(Item=item.model_dump())
+        return item
+
+    @app.get("/items/{pk}/{sk}")
+    async def get_item(pk: str, sk: str, table=Depends(get_table)):
+        return (await table.get_item(Key={"PK": pk, "SK": sk}))["Item"]
+
+    return app
+
+
+def emf_lines(capsys) -> list[dict]:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_emits_emf_line_per_request(mock_dynamodb_table, capsys):
+    """1 request -> log EMF 1 บรรทัด (Route เป็น template, แยก RCU/WCU ต่อ Table)"""
+    client = TestClient(build_app(AsyncDynamoTable.from_sync(mock_dynamodb_table)))
+
+    assert client.post("/items", json={"PK": "U1", "SK": "O1"}).status_code == 201
+    assert client.get("/items/U1/O1").status_code == 200
+
+    write, read = emf_lines(capsys)
+    assert write["Route"] == "POST /items"
+    assert write["StatusCode"] == 201
+    assert write["DynamoCalls"] == 1
+    assert write["ConsumedWCU"] > 0 and write["ConsumedRCU"] == 0
+    assert read["Route"] == "GET /items/{pk}/{sk}"
+    assert read["ConsumedCapacity"]["TestShared"]["RCU"] > 0
+
+    directive = read["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Service", "Route"]]
+    # ทุก Metric ที่ประกาศต้องมีค่าอยู่ใน log บรรทัดเดียวกัน
+    assert all(metric["Name"] in read for metric in directive["Metrics"])
+    assert read["Latency"] >= read["ValidationTime"] + read["SerializationTime"]
+
+
+def test_validation_error_is_logged_without_dynamo_calls(mock_dynamodb_table, capsys):
+    """Body ไม่ผ่าน validation -> ไม่ได้เข้า endpoint, เวลาทั้งหมดนับเป็น validation"""
+    client = TestClient(build_app(AsyncDynamoTable.from_sync(mock_dynamodb_table)))
+
+    assert client.post("/items", json={"PK": "U1"}).status_code == 422
+
+    (line,) = emf_lines(capsys)
+    assert line["StatusCode"] == 422
+    assert line["DynamoCalls"] == 0
+    assert line["ValidationTime"] == line["Latency"]
+
+
+def test_no_consumed_capacity_requested_outside_requests(mock_dynamodb_table):
+    """นอก request (เช่นสคริปต์) -> ไม่ขอ ConsumedCapacity"""
+    response = mock_dynamodb_table.put_item(Item={"PK": "U1", "SK": "O1"})
+    assert "ConsumedCapacity" not in response
+
+
+def test_capacity_split_by_operation():
+    """ConsumedCapacity แบบ TOTAL ไม่มี Read/Write แยก -> ดูจากชนิดของ operation"""
+    metrics = RequestMetrics()
+    metrics.record_dynamo_call(
+        "batch_get_item",
+        0.01,
+        {"ConsumedCapacity": [{"TableName": "T", "CapacityUnits": 1.5}]},
+    )
+    metrics.record_dynamo_call(
+        "transact_write_items",
+        0.02,
+        {
+            "ConsumedCapacity": [
+                {"TableName": "T", "CapacityUnits": 2.0},
+                {"TableName": "U", "CapacityUnits": 4.0},
+            ]
+        },
+    )
+    metrics.record_dynamo_call("update_item", 0.01, None)  # Error -> ไม่มี response
+
+    assert metrics.dynamo_calls == 3
+    assert metrics.capacity == {
+        "T": {"RCU": 1.5, "WCU": 2.0},
+        "U": {"RCU": 0.0, "WCU": 4.0},
+    }
+    emf = metrics.to_emf("svc", "GET /x", 200)
+    assert (emf["ConsumedRCU"], emf["ConsumedWCU"]) == (1.5, 6.0)
+    assert emf["DynamoTime"] == 40.0
@@ -0,0 +1,56 @@
+import json
+from decimal import Decimal
+from typing import Optional, Union
+
+import pytest
+from pydantic import BaseModel, TypeAdapter
+
+from ecom_shared import responses
+from ecom_shared.responses import FastSerializer
+
+
+class LineResponse(BaseModel):
+    SKU: str
+    Quantity: int
+    Price: float
+
+
+class CartResponse(BaseModel):
+    CartID: str
+    Note: Optional[str] = None
+    Lines: list[LineResponse]
+    Total: float
+    Paid: bool = False
+
+
+CART = {
+    "CartID": "C1",
+    "Lines": [
+        {"SKU": "A", "Quantity": Decimal("2"), "Price": Decimal("19.99")},
+        {"SKU": "ข", "Quantity": Decimal("1"), "Price": Decimal("5")},
+    ],
+    "Total": Decimal("44.98"),
+    "Secret": "ไม่ได้อยู่ใน Model -> ต้องไม่หลุดออกไป",
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_serializer_matches_pydantic(monkeypatch, use_orjson):
+    """JSON ต้องเหมือน validate + dump_json ของ pydantic ทุก byte (มี/ไม่มี orjson)"""
+    if not use_orjson:
+        monkeypatch.setattr(responses, "orjson", None)
+    adapter = TypeAdapter(list[CartResponse])
+
+    expected = adapter.dump_json(adapter.validate_python([CART, CART]))
+    assert FastSerializer(CartResponse).dump_json_many([CART, CART]) == expected
+    assert "Secret" not in json.loads(expected)[0]
+
+
+def test_fast_serializer_rejects_ambiguous_union():
+    """Union หลาย Model เลือกไม่ได้ตอน compile -> ให้ endpoint เลือก Model เอง"""
+
+    class Listing(BaseModel):
+        Entry: Union[LineResponse, CartResponse]
+
+    with pytest.raises(TypeError):
+        FastSerializer(Listing)
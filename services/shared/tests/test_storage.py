@@ -0,0 +1,43 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from ecom_shared.storage import LocalObjectStore, PreconditionFailed, S3ObjectStore
+
+
+@pytest.fixture(params=["local", "s3"])
+def store(request, tmp_path, aws_credentials):
+    """ทั้งสอง backend ต้องทำงานเหมือนกัน"""
+    if request.param == "local":
+        yield LocalObjectStore(str(tmp_path))
+        return
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(
+            Bucket="ecom-test-objects",
+            CreateBucketConfiguration={"LocationConstraint": "ap-southeast-1"},
+        )
+        yield S3ObjectStore("ecom-test-objects", client)
+
+
+def test_conditional_writes(store):
+    """If-None-Match: ห้ามทับของที่มีอยู่ / If-Match: ต้องเป็น version ที่อ่านมา"""
+    assert store.get("catalog/a.json") is None
+
+    etag = store.put("catalog/a.json", b"v1", if_none_match=True)
+    with pytest.raises(PreconditionFailed):
+        store.put("catalog/a.json", b"again", if_none_match=True)
+
+    stored = store.get("catalog/a.json")
+    assert (stored.data, stored.etag) == (b"v1", etag)
+
+    new_etag = store.put("catalog/a.json", b"v2", if_match=etag)
+    with pytest.raises(PreconditionFailed):
+        store.put("catalog/a.json", b"stale", if_match=etag)  # version เก่าแล้ว
+    assert store.get("catalog/a.json").data == b"v2"
+    assert new_etag != etag
+
+
+def test_local_store_rejects_keys_outside_root(tmp_path):
+    with pytest.raises(ValueError):
+        LocalObjectStore(str(tmp_path)).get("../secret")
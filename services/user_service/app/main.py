@@ -1,19 +1,24 @@
 import os
-import boto3
 from decimal import Decimal
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response
 from pydantic import BaseModel, Field
 from mangum import Mangum
 from datetime import datetime, timezone
 from typing import Optional
 
-# (Boto3 type hint - เหมือนเดิม)
-from typing import TYPE_CHECKING
-
-if TYPE_CHECKING:
-    from mypy_boto3_dynamodb.service_resource import Table
-else:
-    Table = object
+# DynamoDB แบบเบา (botocore client สร้างตอนใช้ครั้งแรก) จาก Shared Layer
+# endpoint เป็น async -> ใช้ Table แบบ async (ดู ecom_shared/aio.py)
+from ecom_shared.aio import AsyncDynamoTable as Table, lifespan
+from ecom_shared.auth import InvalidToken, get_request_claims, protect
+from ecom_shared.cache import MISSING, TTLCache
+from ecom_shared.dynamo import build_update
+from ecom_shared.web import (
+    build_write_condition,
+    format_etag,
+    instrument,
+    parse_if_match,
+    to_http_exception,
+)
 
 
 # --- 1. Models ---
@@ -31,14 +36,21 @@ class UserProfileResponse(UserProfileInput):
     UserID: str  # PK (จาก Cognito 'sub')
     Email: str  # (จาก Cognito 'email')
     UpdatedAt: str
+    Version: Optional[int] = None  # เลข version สำหรับ Optimistic Concurrency (ETag)
 
 
 # --- 2. AWS Setup & Dependency Injection ---
-app = FastAPI(title="UserService")
+app = FastAPI(title="UserService", lifespan=lifespan)
+# log เวลา + Capacity ของ DynamoDB ต่อ request (EMF) -> ต้องอยู่ก่อนประกาศ route
+instrument(app, "user_service")
+# AUTH_MODE=jwt (container): ตรวจ token เองทุก Route แทน API Gateway
+protect(app)
 
-TABLE_NAME = os.environ.get("DYNAMO_TABLE_NAME", "EcomPoc-UsersTable")
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(TABLE_NAME)
+# USERS_TABLE_NAME มาก่อน (ตอนรวมทุก Service ไว้ใน process เดียว DYNAMO_TABLE_NAME ใช้ร่วมกันไม่ได้)
+TABLE_NAME = os.environ.get(
+    "USERS_TABLE_NAME", os.environ.get("DYNAMO_TABLE_NAME", "EcomPoc-UsersTable")
+)
+table = Table(TABLE_NAME)  # (Connection จริงสร้างตอนใช้งานครั้งแรก)
 
 
 def get_db_table() -> Table:
@@ -46,6 +58,22 @@ def get_db_table() -> Table:
     return table
 
 
+# --- Profile Cache ---
+# โปรไฟล์แทบไม่เปลี่ยน -> เก็บไว้ใน container (warm Lambda อ่านซ้ำไม่ต้องไป DynamoDB)
+# update_my_profile เขียนทับ cache ทันที (write-through)
+# หมายเหตุ: แก้ผ่าน container อื่น -> container นี้เห็นช้าได้ไม่เกิน TTL
+# ตั้ง PROFILE_CACHE_MAX_ITEMS=0 เพื่อปิด cache
+profile_cache = TTLCache(
+    max_items=int(os.environ.get("PROFILE_CACHE_MAX_ITEMS", "1024")),
+    ttl_seconds=float(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "300")),
+)
+
+
+def get_profile_cache() -> TTLCache:
+    """Dependency function ที่จะส่งต่อ global cache"""
+    return profile_cache
+
+
 # --- 3. (ใหม่!) Dependency ที่ดึง "ทั้ง" ID และ Email ---
 class UserClaims(BaseModel):
     UserID: str
@@ -54,16 +82,16 @@ class UserClaims(BaseModel):
 
 def get_current_user_claims(request: Request) -> UserClaims:
     """
-    ดึง UserID (sub) และ Email ออกมาจาก Cognito Authorizer
+    ดึง UserID (sub) และ Email ออกมาจาก Token
+    (Cognito Authorizer ของ API Gateway หรือตรวจเองใน process - ดู ecom_shared/auth.py)
     """
     try:
-        lambda_event = request.scope["aws.event"]
-        claims = lambda_event["requestContext"]["authorizer"]["jwt"]["claims"]
+        claims = get_request_claims(request)
         user_id = claims["sub"]
-        email = claims.get("email", "")  # Email อาจจะไม่มี
+        email = claims.get("email", "")  # Email อาจจะไม่มี (เช่น access token)
 
         return UserClaims(UserID=user_id, Email=email)
-    except KeyError:
+    except (InvalidToken, KeyError):
         raise HTTPException(
             status_code=401, detail="Could not extract User claims from token"
         )
@@ -71,53 +99,72 @@ def get_current_user_claims(request: Request) -> UserClaims:
 
 # --- 4. Endpoints ---
 @app.get("/profile", response_model=UserProfileResponse)
-def get_my_profile(
+async def get_my_profile(
+    response: Response,
     table: Table = Depends(get_db_table),
+    cache: TTLCache = Depends(get_profile_cache),
     user: UserClaims = Depends(get_current_user_claims),  # <-- "ฉีด" Claims
 ):
     """
     ดึงโปรไฟล์ของ User ที่ล็อกอินอยู่
     ถ้าไม่เจอ (User ล็อกอินครั้งแรก) ให้สร้างโปรไฟล์ "ว่าง" ให้
     """
-    try:
-        response = table.get_item(Key={"UserID": user.UserID})
-        item = response.get("Item")
-
-        if not item:
-            # User ล็อกอินครั้งแรก, สร้างโปรไฟล์ "โครงกระดูก" (Skeleton) ให้
-            print(f"User {user.UserID} not found. Creating skeleton profile.")
-            timestamp = datetime.now(timezone.utc).isoformat()
-
-            # แปลง Decimal เป็น float สำหรับ Response Model (ถ้ามี)
-            # (ในที่นี้ยังไม่มี Decimal)
-
-            item = {
-                "UserID": user.UserID,
-                "Email": user.Email,
-                "UpdatedAt": timestamp,
-                # FirstName, LastName ฯลฯ จะเป็น None
-            }
-
-            # บันทึก skeleton profile ลง DB
-            table.put_item(Item=item)
+    # 1. ดูใน cache ก่อน
+    item = cache.get(user.UserID)
+    if item is not MISSING:
+        response.headers["ETag"] = format_etag(item)
+        return item
 
-        # แปลง Decimal (ถ้ามี) เป็น float สำหรับ Response Model
-        # (เช่น ถ้าเราเก็บ Credit balance)
+    try:
+        # 2. อ่าน + สร้างโปรไฟล์ "โครงกระดูก" (Skeleton) ใน update_item ครั้งเดียว
+        # if_not_exists: มีอยู่แล้วไม่แก้อะไร / ยังไม่มี (ล็อกอินครั้งแรก) ใส่ค่าเริ่มต้น
+        # -> request แรกพร้อมกันหลายตัวก็ไม่ทับกัน และไม่ต้อง get_item ก่อน
+        db_response = await table.update_item(
+            Key={"UserID": user.UserID},
+            UpdateExpression=(
+                "SET Email = if_not_exists(Email, :email),"
+                " UpdatedAt = if_not_exists(UpdatedAt, :now),"
+                " Version = if_not_exists(Version, :one)"
+            ),
+            ExpressionAttributeValues={
+                ":email": user.Email,
+                ":now": datetime.now(timezone.utc).isoformat(),
+                ":one": 1,
+            },
+            ReturnValues="ALL_NEW",  # คืนโปรไฟล์ทั้งก้อน (ที่มีอยู่ หรือที่เพิ่งสร้าง)
+        )
+        item = db_response["Attributes"]
 
+        cache.set(user.UserID, item)
+        response.headers["ETag"] = format_etag(item)
         return item  # คืนค่า (ที่เพิ่งสร้าง หรือที่ดึงมา)
 
     except Exception as e:
-        print(f"!!! UNEXPECTED ERROR (get_profile): {repr(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        raise to_http_exception(e, "get_profile")
 
 
 @app.put("/profile", response_model=UserProfileResponse)
-def update_my_profile(
+async def update_my_profile(
     profile_in: UserProfileInput,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     table: Table = Depends(get_db_table),
+    cache: TTLCache = Depends(get_profile_cache),
     user: UserClaims = Depends(get_current_user_claims),  # <-- "ฉีด" Claims
 ):
-    """อัปเดตโปรไฟล์ของ User ที่ล็อกอินอยู่"""
+    """
+    อัปเดตโปรไฟล์ของ User ที่ล็อกอินอยู่
+    ถ้าส่ง If-Match มา จะเขียนได้เฉพาะเมื่อ Version ยังตรงกัน (ไม่งั้น 412)
+    """
+    versions = parse_if_match(if_match)
+    update_kwargs, condition_names, condition_values = {}, {}, {}
+    if versions is not None:
+        # Optimistic Concurrency: ต้องมีโปรไฟล์อยู่ และ Version ตรงกับ If-Match
+        condition, condition_names, condition_values = build_write_condition(
+            "UserID", versions
+        )
+        update_kwargs["ConditionExpression"] = condition
+        update_kwargs["ReturnValuesOnConditionCheckFailure"] = "ALL_OLD"
 
     try:
         # 1. สร้าง Expression (ใช้ Pattern จาก ProductService ที่แก้บั๊ก 'Name' แล้ว)
@@ -128,37 +175,38 @@ def update_my_profile(
         # (แก้บั๊ก float vs Decimal - ถ้ามี)
         # (ในที่นี้ยังไม่มี Decimal)
 
-        # (แก้บั๊ก Reserved Keywords - ใช้ Pattern นี้เสมอ)
-        expression_attr_values = {}
-        expression_attr_names = {}
-        update_expression_parts = []
-
-        for i, (key, value) in enumerate(update_data.items()):
-            val_placeholder = f":val{i}"
-            key_placeholder = f"#key{i}"
-
-            expression_attr_values[val_placeholder] = value
-            expression_attr_names[key_placeholder] = key
-            update_expression_parts.append(f"{key_placeholder} = {val_placeholder}")
-
-        update_expression = "SET " + ", ".join(update_expression_parts)
+        # (แก้บั๊ก Reserved Keywords - placeholder ทุกตัวผ่าน build_update)
+        # ทุกการเขียน +1 ให้ Version
+        update_expression, expression_attr_names, expression_attr_values = build_update(
+            update_data, {"Version": 1}
+        )
+        expression_attr_names.update(condition_names)
+        expression_attr_values.update(condition_values)
 
         # 2. สั่งอัปเดต
         # (ใช้ 'get_item' ก่อนก็ได้ แต่ 'update_item' ก็ปลอดภัยเพราะใช้ UserID จาก Token)
-        response = table.update_item(
+        db_response = await table.update_item(
             Key={"UserID": user.UserID},  # <-- อัปเดตที่ UserID ของเราเท่านั้น
             UpdateExpression=update_expression,
             ExpressionAttributeValues=expression_attr_values,
             ExpressionAttributeNames=expression_attr_names,
             ReturnValues="ALL_NEW",  # สั่งให้คืนค่า "ใหม่" กลับมา
+            **update_kwargs,
         )
 
-        return response.get("Attributes")  # คืนค่าที่อัปเดตแล้ว
+        item = db_response.get("Attributes")
+        cache.set(user.UserID, item)  # write-through: อ่านครั้งหน้าได้ค่าใหม่ทันที
+        response.headers["ETag"] = format_etag(item)
+        return item  # คืนค่าที่อัปเดตแล้ว
 
     except Exception as e:
-        print(f"!!! UNEXPECTED ERROR (update_profile): {repr(e)}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+        # เขียนไม่ผ่าน (เช่น Version ไม่ตรง) -> ค่าใน cache อาจเก่าแล้ว อ่านใหม่ครั้งหน้า
+        cache.invalidate(user.UserID)
+        # มีโปรไฟล์แต่ Version ไม่ตรง -> 412, ไม่มีโปรไฟล์เลย -> 404
+        raise to_http_exception(e, "update_profile", "Profile not found")
 
 
 # ตัวแปลง Lambda
-handler = Mangum(app)
+# lifespan="off": Mangum รัน lifespan รอบทุก invocation -> จะปิด connection pool ทุก request
+# (บน Lambda ไม่มี shutdown ให้รออยู่แล้ว / lifespan ใช้ตอนรันด้วย uvicorn)
+handler = Mangum(app, lifespan="off")
@@ -9,6 +9,10 @@ PROJECT_ROOT = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "..", "..")
 )
 sys.path.insert(0, PROJECT_ROOT)
+# Shared Layer (ตอน deploy จะอยู่ที่ /opt/python ของ Lambda)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "services", "shared"))
+
+from ecom_shared.dynamo import DynamoClient, DynamoTable  # noqa: E402
 
 
 @pytest.fixture(scope="function")
@@ -32,4 +36,4 @@ def mock_dynamodb_table(aws_credentials):
             AttributeDefinitions=[{"AttributeName": "UserID", "AttributeType": "S"}],
             ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
         )
-        yield dynamodb.Table("TestUsers")
+        yield DynamoTable("TestUsers", DynamoClient(boto3.client("dynamodb")))
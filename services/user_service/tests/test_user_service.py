@@ -1,6 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from ecom_shared.aio import AsyncDynamoTable
+
 
 # --- Fixture (ที่ Mock 2 อย่าง) ---
 @pytest.fixture
@@ -11,12 +13,13 @@ def test_client(mock_dynamodb_table):
         app,
         get_db_table,
         get_current_user_claims,
+        profile_cache,
     )
     from services.user_service.app.main import UserClaims
 
     # --- Mock 1: Database ---
     def get_mock_table():
-        return mock_dynamodb_table
+        return AsyncDynamoTable.from_sync(mock_dynamodb_table)
 
     app.dependency_overrides[get_db_table] = get_mock_table
 
@@ -29,12 +32,16 @@ def test_client(mock_dynamodb_table):
 
     app.dependency_overrides[get_current_user_claims] = get_mock_user_claims
 
+    # --- Mock 3: Cache (เริ่มว่างทุกเทส) ---
+    profile_cache.clear()
+
     client = TestClient(app)
 
     # ส่ง MOCK_USER_ID กลับไปด้วย
     yield client, MOCK_USER_ID
 
     app.dependency_overrides = {}  # ล้าง mock
+    profile_cache.clear()
 
 
 # --- Test Cases ---
@@ -75,3 +82,88 @@ def test_get_and_update_profile(test_client, mock_dynamodb_table):
     data_2 = response_get_2.json()
     assert data_2["FirstName"] == "Test"
     assert data_2["ShippingAddress"] == "123 Main St"
+
+
+def test_update_profile_with_if_match(test_client):
+    """เทส ETag/If-Match ของโปรไฟล์: ETag เก่าต้องได้ 412 (ไม่ทับข้อมูลใหม่)"""
+    client, _ = test_client
+
+    etag = client.get("/profile").headers["ETag"]
+    assert etag == '"1"'
+
+    response = client.put(
+        "/profile", json={"FirstName": "A"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+
+    stale = client.put("/profile", json={"FirstName": "B"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert client.get("/profile").json()["FirstName"] == "A"
+
+
+def test_update_missing_profile_with_if_match(test_client):
+    """เทส If-Match กับโปรไฟล์ที่ยังไม่มี -> 404"""
+    client, _ = test_client
+
+    response = client.put(
+        "/profile", json={"FirstName": "A"}, headers={"If-Match": '"1"'}
+    )
+    assert response.status_code == 404
+
+
+def test_get_profile_creates_skeleton_once(test_client, mock_dynamodb_table):
+    """เทส GET ครั้งแรก: สร้าง Skeleton ใน update_item เดียว และไม่ทับโปรไฟล์ที่มีอยู่"""
+    from services.user_service.app.main import profile_cache
+
+    client, MOCK_USER_ID = test_client
+    mock_dynamodb_table.put_item(
+        Item={
+            "UserID": MOCK_USER_ID,
+            "Email": "old@example.com",
+            "FirstName": "Existing",
+            "UpdatedAt": "2024-01-01T00:00:00+00:00",
+            "Version": 7,
+        }
+    )
+
+    response = client.get("/profile")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"7"'
+    data = response.json()
+    assert data["FirstName"] == "Existing"
+    assert data["Email"] == "old@example.com"
+    assert data["UpdatedAt"] == "2024-01-01T00:00:00+00:00"
+
+    # ไม่มีโปรไฟล์ (เช่น ถูกลบ) + ไม่มีใน cache -> สร้าง Skeleton ใหม่
+    mock_dynamodb_table.delete_item(Key={"UserID": MOCK_USER_ID})
+    profile_cache.clear()
+    assert client.get("/profile").json()["Version"] == 1
+    assert (
+        mock_dynamodb_table.get_item(Key={"UserID": MOCK_USER_ID})["Item"]["Email"]
+        == "test@example.com"
+    )
+
+
+def test_profile_cache_read_and_write_through(test_client, mock_dynamodb_table):
+    """เทส cache: GET ซ้ำไม่อ่าน DynamoDB, PUT เขียนทับ cache ทันที"""
+    from services.user_service.app.main import profile_cache
+
+    client, MOCK_USER_ID = test_client
+    client.get("/profile")
+
+    # แก้ใน Table ตรงๆ (เหมือน container อื่นเขียน) -> container นี้ยังเห็นค่าใน cache
+    mock_dynamodb_table.update_item(
+        Key={"UserID": MOCK_USER_ID},
+        UpdateExpression="SET FirstName = :name",
+        ExpressionAttributeValues={":name": "Elsewhere"},
+    )
+    assert client.get("/profile").json()["FirstName"] is None
+    assert profile_cache.stats()["hits"] == 1
+
+    # PUT -> cache ได้ค่าใหม่ทันที (ไม่ต้องรอ TTL)
+    client.put("/profile", json={"LastName": "Local"})
+    data = client.get("/profile").json()
+    assert data["LastName"] == "Local"
+    assert data["FirstName"] == "Elsewhere"
+    assert profile_cache.stats()["hits"] == 2